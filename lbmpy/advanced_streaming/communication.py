@@ -1,5 +1,9 @@
 import itertools
-from pystencils import CreateKernelConfig, Field, Assignment, AssignmentCollection
+
+import numpy as np
+
+from pystencils import CreateKernelConfig, Field, Assignment, AssignmentCollection, TypedSymbol, create_kernel
+from pystencils.field import FieldType
 from pystencils.slicing import shift_slice, get_slice_before_ghost_layer, normalize_slice
 from lbmpy.advanced_streaming.utility import is_inplace, get_accessor, numeric_index,\
     Timestep, get_timesteps, numeric_offsets
@@ -12,10 +16,16 @@ class LBMPeriodicityHandling:
 
     def __init__(self, stencil, data_handling, pdf_field_name,
                  streaming_pattern='pull', ghost_layers=1,
-                 cupy_direct_copy=True):
+                 cupy_direct_copy=True, cpu_compiled_copy=True, cpu_openmp=False):
         """
             Periodicity Handling for Lattice Boltzmann Streaming.
 
+            **On the usage with CPU:**
+            - By default, all slices of a time step are copied by a single compiled kernel, that runs over a list
+            of memory offsets, see `offset_copy_kernel`. This avoids one numpy copy per slice, which dominates
+            the time step for small domains and large stencils. Set `cpu_openmp` to parallelize the kernel.
+            With `cpu_compiled_copy=False`, or if the pdf array is not contiguous, the slices are copied with numpy.
+
             **On the usage with cuda:**
             - cupy allows the copying of sliced arrays within device memory using the numpy syntax,
             e.g. `dst[:,0] = src[:,-1]`. In this implementation, this is the default for periodicity
@@ -23,10 +33,14 @@ class LBMPeriodicityHandling:
             compiled. The compiled kernels are almost twice as fast in execution as cupy array copying,
             but especially for large stencils like D3Q27, their compilation can take up to 20 seconds.
             Choose your weapon depending on your use case.
-        """
-        if not isinstance(data_handling, SerialDataHandling):
-            raise ValueError('Only serial data handling is supported!')
 
+            **On the usage with multiple blocks:**
+            - For data handlings with several blocks, like the parallel data handling, the same stencil-restricted
+            and timestep-aware slices are copied between neighboring blocks, periodic neighbors included, with the
+            compiled kernel if the block arrays are contiguous. If neighbors of a block are on other processes, the
+            'pull' pattern uses the stencil-restricted communication scheme of the data handling. In-place patterns
+            exchange these slices by MPI messages, see `RemoteBlockExchange`, which requires mpi4py and the CPU.
+        """
         self.stencil = stencil
         self.dim = stencil.D
         self.dh = data_handling
@@ -41,6 +55,10 @@ class LBMPeriodicityHandling:
 
         self.cpu = self.target == Target.CPU
         self.cupy_direct_copy = self.target == Target.GPU and cupy_direct_copy
+        self.cpu_compiled_copy = self.cpu and cpu_compiled_copy
+        self.cpu_openmp = cpu_openmp
+        self._cpu_copy_kernel = None
+        self._cpu_copy_offsets = dict()
 
         def is_copy_direction(direction):
             s = 0
@@ -51,9 +69,15 @@ class LBMPeriodicityHandling:
 
             return s != 0
 
+        # between blocks data is exchanged in all directions, the periodicity is handled by the block neighborhood
+        self.serial = isinstance(data_handling, SerialDataHandling)
         full_stencil = itertools.product(*([-1, 0, 1] for _ in range(self.dim)))
-        copy_directions = tuple(filter(is_copy_direction, full_stencil))
+        if self.serial:
+            copy_directions = tuple(filter(is_copy_direction, full_stencil))
+        else:
+            copy_directions = tuple(d for d in full_stencil if any(d))
         self.comm_slices = []
+        self.comm_slices_per_dir = []
         timesteps = get_timesteps(streaming_pattern)
         for timestep in timesteps:
             slices_per_comm_dir = get_communication_slices(stencil=stencil,
@@ -62,6 +86,34 @@ class LBMPeriodicityHandling:
                                                            prev_timestep=timestep,
                                                            ghost_layers=ghost_layers)
             self.comm_slices.append(list(chain.from_iterable(v for k, v in slices_per_comm_dir.items())))
+            self.comm_slices_per_dir.append(slices_per_comm_dir)
+
+        self._blocks = None
+        self._block_neighbors = None
+        self._remote_exchange = None
+        self._sync_function = None
+        if not self.serial:
+            self._blocks = list(data_handling.iterate(ghost_layers=ghost_layers, gpu=not self.cpu))
+            block_neighbors = get_block_neighbors(self._blocks, data_handling.shape, self.periodicity,
+                                                  copy_directions, ghost_layers)
+            remote_neighbors = [(i, d) for i, j, d in block_neighbors if j is None]
+            if remote_neighbors and not self.inplace_pattern:
+                self._sync_function = data_handling.synchronization_function([pdf_field_name], stencil=stencil.name,
+                                                                             target=self.target,
+                                                                             stencil_restricted=True)
+            else:
+                if remote_neighbors:
+                    if not self.cpu:
+                        raise NotImplementedError(f"The streaming pattern '{streaming_pattern}' requires all "
+                                                  f"neighbors of a block to be on the same process on GPUs")
+                    self._remote_exchange = RemoteBlockExchange(self._blocks, remote_neighbors, data_handling.shape,
+                                                                self.periodicity, ghost_layers)
+                # all directions between the same two blocks are copied by one kernel call
+                directions_per_pair = dict()
+                for i, j, d in block_neighbors:
+                    if j is not None and j != NON_PERIODIC_BORDER:
+                        directions_per_pair.setdefault((i, j), []).append(d)
+                self._block_neighbors = [(i, j, tuple(d)) for (i, j), d in directions_per_pair.items()]
 
         if self.target == Target.GPU and not cupy_direct_copy:
             self.device_copy_kernels = list()
@@ -69,7 +121,9 @@ class LBMPeriodicityHandling:
                 self.device_copy_kernels.append(self._compile_copy_kernels(timestep))
 
     def __call__(self, prev_timestep=Timestep.BOTH):
-        if self.cpu:
+        if not self.serial:
+            self._periodicity_handling_blocks(prev_timestep)
+        elif self.cpu:
             self._periodicity_handling_cpu(prev_timestep)
         else:
             self._periodicity_handling_gpu(prev_timestep)
@@ -77,8 +131,56 @@ class LBMPeriodicityHandling:
     def _periodicity_handling_cpu(self, prev_timestep):
         arr = self.dh.cpu_arrays[self.pdf_field_name]
         comm_slices = self.comm_slices[prev_timestep.idx]
-        for src, dst in comm_slices:
-            arr[dst] = arr[src]
+        if not comm_slices:
+            return
+        flat_arr = _flat_view(arr) if self.cpu_compiled_copy else None
+        if flat_arr is None:
+            for src, dst in comm_slices:
+                arr[dst] = arr[src]
+        else:
+            if self._cpu_copy_kernel is None:
+                self._cpu_copy_kernel = offset_copy_kernel(arr.dtype, cpu_openmp=self.cpu_openmp)
+            self._cpu_copy_kernel(src=flat_arr, dst=flat_arr, offsets=self._copy_offsets(arr, prev_timestep))
+
+    def _copy_offsets(self, arr, prev_timestep):
+        """Memory offsets of the sources and destinations of all slices, the arrays swapped by the data
+        handling share shape and strides"""
+        key = (prev_timestep.idx, arr.shape, arr.strides)
+        if key not in self._cpu_copy_offsets:
+            self._cpu_copy_offsets[key] = copy_offsets(arr, self.comm_slices[prev_timestep.idx])
+        return self._cpu_copy_offsets[key]
+
+    def _periodicity_handling_blocks(self, prev_timestep):
+        if self._sync_function is not None:
+            self._sync_function()
+            return
+        arrays = [b[self.pdf_field_name] for b in self._blocks]
+        slices_per_comm_dir = self.comm_slices_per_dir[prev_timestep.idx]
+        if self._remote_exchange is not None:
+            self._remote_exchange.start(arrays, slices_per_comm_dir)
+        flat_arrays = [_flat_view(arr) for arr in arrays] if self.cpu_compiled_copy else [None]
+        if any(flat_arr is None for flat_arr in flat_arrays):
+            for i, j, comm_dirs in self._block_neighbors:
+                for comm_dir in comm_dirs:
+                    for src, dst in slices_per_comm_dir[comm_dir]:
+                        arrays[j][dst] = arrays[i][src]
+        else:
+            if self._cpu_copy_kernel is None:
+                self._cpu_copy_kernel = offset_copy_kernel(arrays[0].dtype, cpu_openmp=self.cpu_openmp)
+            for i, j, comm_dirs in self._block_neighbors:
+                offsets = self._block_copy_offsets(arrays[i], prev_timestep, comm_dirs)
+                self._cpu_copy_kernel(src=flat_arrays[i], dst=flat_arrays[j], offsets=offsets)
+        if self._remote_exchange is not None:
+            self._remote_exchange.finish(arrays, slices_per_comm_dir)
+
+    def _block_copy_offsets(self, arr, prev_timestep, comm_dirs):
+        """Memory offsets of the slices of the given communication directions, all blocks share shape and strides"""
+        key = (prev_timestep.idx, comm_dirs, arr.shape, arr.strides)
+        if key not in self._cpu_copy_offsets:
+            slices_per_comm_dir = self.comm_slices_per_dir[prev_timestep.idx]
+            slices = list(chain.from_iterable(slices_per_comm_dir[d] for d in comm_dirs))
+            self._cpu_copy_offsets[key] = copy_offsets(arr, slices)
+        return self._cpu_copy_offsets[key]
 
     def _compile_copy_kernels(self, timestep):
         pdf_field = self.dh.fields[self.pdf_field_name]
@@ -152,6 +254,121 @@ def get_communication_slices(
     return slices_per_comm_direction
 
 
+NON_PERIODIC_BORDER = -1
+
+
+def get_block_neighbors(blocks, domain_shape, periodicity, comm_directions, ghost_layers=1):
+    """
+    Finds the neighbor of every block in every communication direction, for uniform blocks as yielded by
+    `DataHandling.iterate` with the given number of ghost layers.
+
+    :param blocks: list of blocks, their offsets include the ghost layers
+    :param domain_shape: global domain size without ghost layers
+    :param periodicity: periodicity of the domain in each dimension
+    :param comm_directions: the communication directions
+    :param ghost_layers: number of ghost layers of the blocks
+
+    :return: list of tuples (block index, neighbor index, communication direction). The neighbor index is
+             `NON_PERIODIC_BORDER` at non-periodic domain borders and None if the neighbor is not in `blocks`,
+             e.g. because it belongs to another process.
+    """
+    block_indices = {_interior_offset(b, ghost_layers): i for i, b in enumerate(blocks)}
+    result = []
+    for i, block in enumerate(blocks):
+        for comm_dir in comm_directions:
+            neighbor_offset = _neighbor_offset(block, comm_dir, domain_shape, periodicity, ghost_layers)
+            if neighbor_offset is None:
+                result.append((i, NON_PERIODIC_BORDER, comm_dir))
+            else:
+                result.append((i, block_indices.get(neighbor_offset), comm_dir))
+    return result
+
+
+def exchange_between_blocks(blocks, block_neighbors, pdf_field_name, slices_per_comm_dir):
+    """
+    Copies the communication slices of each block to its neighbors.
+
+    :param blocks: list of blocks, including the ghost layers
+    :param block_neighbors: tuples (block index, neighbor index, communication direction) of `get_block_neighbors`
+    :param pdf_field_name: name of the pdf array of the blocks
+    :param slices_per_comm_dir: slices of `get_communication_slices` for the time step
+    """
+    arrays = [b[pdf_field_name] for b in blocks]
+    for i, j, comm_dir in block_neighbors:
+        src_arr, dst_arr = arrays[i], arrays[j]
+        for src, dst in slices_per_comm_dir[comm_dir]:
+            dst_arr[dst] = src_arr[src]
+
+
+class RemoteBlockExchange:
+    """
+    Exchanges the communication slices between local blocks and their neighbors on other processes, by MPI
+    point-to-point messages of mpi4py. The data handling's communication schemes only copy the interior border
+    to the ghost layers of the neighbors, while in-place streaming patterns also move pdfs written into the ghost
+    layers back to the interior of the neighbors.
+
+    :param blocks: list of the local blocks, including the ghost layers
+    :param remote_neighbors: tuples (block index, communication direction) of the neighbors that are not in `blocks`
+    :param domain_shape: global domain size without ghost layers
+    :param periodicity: periodicity of the domain in each dimension
+    :param ghost_layers: number of ghost layers of the blocks
+    """
+
+    def __init__(self, blocks, remote_neighbors, domain_shape, periodicity, ghost_layers=1):
+        try:
+            from mpi4py import MPI
+        except ImportError:
+            raise ImportError("Communication of in-place streaming patterns with blocks on other processes failed. "
+                              "Required package 'mpi4py' is missing")
+        self._mpi = MPI
+        self._comm = MPI.COMM_WORLD
+        offsets = [_interior_offset(b, ghost_layers) for b in blocks]
+        rank_of_offset = {o: rank for rank, rank_offsets in enumerate(self._comm.allgather(offsets))
+                          for o in rank_offsets}
+
+        # neighbors are mutual, the neighbor in a direction sends its slices of the inverse direction. Messages
+        # between two processes with the same tag are matched in the order they are posted, so both sides order
+        # them by the offset of the receiving block.
+        self._sends = []
+        self._receives = []
+        for i, comm_dir in remote_neighbors:
+            neighbor_offset = _neighbor_offset(blocks[i], comm_dir, domain_shape, periodicity, ghost_layers)
+            rank = rank_of_offset[neighbor_offset]
+            inverse_dir = tuple(-d for d in comm_dir)
+            self._sends.append((neighbor_offset, comm_dir, rank, i))
+            self._receives.append((offsets[i], inverse_dir, rank, i))
+        self._sends.sort()
+        self._receives.sort()
+        self._requests = []
+        self._receive_buffers = []
+
+    def start(self, arrays, slices_per_comm_dir):
+        """Posts all messages for the local block arrays `arrays`"""
+        self._receive_buffers = []
+        for _, comm_dir, rank, i in self._receives:
+            size = sum(np.size(arrays[i][dst]) for _, dst in slices_per_comm_dir[comm_dir])
+            buffer = np.empty(size, dtype=arrays[i].dtype)
+            self._requests.append(self._comm.Irecv(buffer, source=rank, tag=_direction_tag(comm_dir)))
+            self._receive_buffers.append(buffer)
+        for _, comm_dir, rank, i in self._sends:
+            slices = slices_per_comm_dir[comm_dir]
+            buffer = np.concatenate([np.ravel(arrays[i][src]) for src, _ in slices])
+            self._requests.append(self._comm.Isend(buffer, dest=rank, tag=_direction_tag(comm_dir)))
+
+    def finish(self, arrays, slices_per_comm_dir):
+        """Waits for all messages and copies the received slices into the local block arrays"""
+        self._mpi.Request.Waitall(self._requests)
+        self._requests = []
+        for (_, comm_dir, _, i), buffer in zip(self._receives, self._receive_buffers):
+            start = 0
+            for _, dst in slices_per_comm_dir[comm_dir]:
+                dst_shape = np.shape(arrays[i][dst])
+                size = int(np.prod(dst_shape))
+                arrays[i][dst] = buffer[start:start + size].reshape(dst_shape)
+                start += size
+        self._receive_buffers = []
+
+
 def periodic_pdf_copy_kernel(pdf_field, src_slice, dst_slice,
                              domain_size=None, target=Target.GPU):
     """Copies a rectangular array slice onto another non-overlapping array slice"""
@@ -189,6 +406,71 @@ def periodic_pdf_copy_kernel(pdf_field, src_slice, dst_slice,
         raise ValueError('Invalid target:', target)
 
 
+def copy_offsets(arr, slices):
+    """Returns an int64 array of shape (N, 2) with the memory offsets, in elements, of the sources and destinations
+    of the (src, dst) slice pairs in the contiguous array `arr`, for :func:`offset_copy_kernel`"""
+    memory_offsets = np.lib.stride_tricks.as_strided(np.arange(arr.size, dtype=np.int64), shape=arr.shape,
+                                                     strides=tuple(s // arr.itemsize * 8 for s in arr.strides))
+    offsets = np.empty((sum(memory_offsets[dst].size for _, dst in slices), 2), dtype=np.int64)
+    start = 0
+    for src, dst in slices:
+        end = start + memory_offsets[dst].size
+        offsets[start:end, 0] = memory_offsets[src].ravel()
+        offsets[start:end, 1] = memory_offsets[dst].ravel()
+        start = end
+    return offsets
+
+
+def offset_copy_kernel(dtype, cpu_openmp=False):
+    """Compiles a CPU kernel that copies entries between two flat arrays, given by a list of (source, destination)
+    memory offsets as created by :func:`copy_offsets`. Copying all slices of the periodicity handling with one
+    kernel call replaces many small numpy copies.
+
+    The kernel is called with the arguments `src` and `dst`, the flat arrays, which may be the same, and `offsets`."""
+    src = Field.create_generic('src', spatial_dimensions=1, dtype=dtype, field_type=FieldType.CUSTOM)
+    dst = Field.create_generic('dst', spatial_dimensions=1, dtype=dtype, field_type=FieldType.CUSTOM)
+    offsets = Field.create_generic('offsets', spatial_dimensions=1, index_shape=(2,), dtype=np.int64)
+    src_offset, dst_offset = TypedSymbol('src_offset', np.int64), TypedSymbol('dst_offset', np.int64)
+    copy_eqs = [Assignment(src_offset, offsets(0)), Assignment(dst_offset, offsets(1)),
+                Assignment(dst.absolute_access((dst_offset,), ()), src.absolute_access((src_offset,), ()))]
+    config = CreateKernelConfig(ghost_layers=0, cpu_openmp=cpu_openmp, skip_independence_check=True)
+    return create_kernel(copy_eqs, config=config).compile()
+
+
+def _flat_view(arr):
+    """One-dimensional view of all elements of arr in memory order, or None if arr is not contiguous"""
+    order = sorted(range(arr.ndim), key=lambda i: arr.strides[i])
+    expected_stride = arr.itemsize
+    for i in order:
+        if arr.strides[i] != expected_stride and arr.shape[i] != 1:
+            return None
+        expected_stride *= arr.shape[i]
+    return np.lib.stride_tricks.as_strided(arr, shape=(arr.size,), strides=(arr.itemsize,))
+
+
+def _interior_offset(block, ghost_layers):
+    return tuple(o + ghost_layers for o in block.offset)
+
+
+def _neighbor_offset(block, comm_dir, domain_shape, periodicity, ghost_layers):
+    """Interior offset of the neighbor of a uniform block, None at non-periodic domain borders"""
+    interior_shape = tuple(s - 2 * ghost_layers for s in block.shape)
+    neighbor_offset = []
+    for o, s, d, domain_size, periodic in zip(_interior_offset(block, ghost_layers), interior_shape, comm_dir,
+                                              domain_shape, periodicity):
+        o += d * s
+        if periodic:
+            o %= domain_size
+        elif not 0 <= o < domain_size:
+            return None
+        neighbor_offset.append(o)
+    return tuple(neighbor_offset)
+
+
+def _direction_tag(direction):
+    return sum((d + 1) * 3 ** i for i, d in enumerate(direction))
+
+
 def _extend_dir(direction):
     if len(direction) == 0:
         yield tuple()
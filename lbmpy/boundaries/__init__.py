@@ -1,8 +1,11 @@
 from lbmpy.boundaries.boundaryconditions import (
     UBB, FixedDensity, DiffusionDirichlet, SimpleExtrapolationOutflow,
-    ExtrapolationOutflow, NeumannFlux, NeumannByCopy, NoSlip, StreamInConstant, FreeSlip)
-from lbmpy.boundaries.boundaryhandling import LatticeBoltzmannBoundaryHandling
+    ExtrapolationOutflow, NeumannFlux, NeumannByCopy, NoSlip, NoSlipLinearBouzidi, UBBLinearBouzidi,
+    StreamInConstant, FreeSlip)
+from lbmpy.boundaries.boundaryhandling import (
+    LatticeBoltzmannBoundaryHandling, TIME_STEP_SYMBOL, LINK_POSITION_SYMBOLS)
 
-__all__ = ['NoSlip', 'FreeSlip', 'UBB', 'SimpleExtrapolationOutflow', 'ExtrapolationOutflow',
+__all__ = ['NoSlip', 'NoSlipLinearBouzidi', 'FreeSlip', 'UBB', 'UBBLinearBouzidi',
+           'SimpleExtrapolationOutflow', 'ExtrapolationOutflow',
            'FixedDensity', 'DiffusionDirichlet', 'NeumannFlux', 'NeumannByCopy',
-           'LatticeBoltzmannBoundaryHandling', 'StreamInConstant']
+           'LatticeBoltzmannBoundaryHandling', 'StreamInConstant', 'TIME_STEP_SYMBOL', 'LINK_POSITION_SYMBOLS']
@@ -3,8 +3,11 @@ import sympy as sp
 from lbmpy.boundaries.boundaryhandling import LbmWeightInfo
 from lbmpy.advanced_streaming.indexing import BetweenTimestepsIndexing
 from lbmpy.advanced_streaming.utility import Timestep, get_accessor
-from pystencils.boundaries.boundaryhandling import BoundaryOffsetInfo
+from pystencils.boundaries.boundaryhandling import BoundaryOffsetInfo, DEFAULT_FLAG_TYPE
 from pystencils.assignment import Assignment
+from pystencils.field import Field
+from pystencils.integer_functions import bitwise_and
+from pystencils.typing import TypedSymbol, create_type
 from pystencils.astnodes import Block, Conditional, LoopOverCoordinate, SympyAssignment
 from pystencils.simp.assignment_collection import AssignmentCollection
 from pystencils.simp.simplifications import sympy_cse_on_assignment_list
@@ -107,3 +110,85 @@ def update_rule_with_push_boundaries(collision_rule, field, boundary_spec,
         result.simplification_hints['split_groups'] = new_split_groups
 
     return result
+
+
+def update_rule_with_flag_boundaries(collision_rule, src_field, dst_field, flag_field, boundaries):
+    """Creates a stream-pull-collide update rule that applies boundary conditions inline, depending on a flag field.
+
+    When a PDF is pulled from a neighbor cell that is marked in the flag field as boundary, the value given by the
+    boundary condition is used instead. Thus, no index lists are needed and the geometry can be changed by just
+    modifying the flag field, which is beneficial if it changes frequently. For static geometries the index list
+    based :class:`lbmpy.boundaries.LatticeBoltzmannBoundaryHandling` is usually faster, since the flag field has to
+    be read for all neighbors of every cell. Boundary cells keep their PDF values.
+
+    Only boundaries that need no additional data per link can be used, like :class:`lbmpy.boundaries.NoSlip`,
+    :class:`lbmpy.boundaries.UBB` with constant or time-dependent velocity, or
+    :class:`lbmpy.boundaries.FixedDensity` with constant density.
+
+    Args:
+        collision_rule: instance of LbmCollisionRule, defining the collision step
+        src_field: field the post-collision PDFs of the previous time step are read from
+        dst_field: field the PDFs are written to
+        flag_field: integer field with (at least) one ghost layer, marking the boundary cells
+        boundaries: dict mapping flag values to boundary objects. The flag values can be integers, or names
+                    of kernel parameters holding the flag, like in
+                    :func:`pystencils.boundaries.inkernel.add_neumann_boundary`
+
+    Returns:
+        LbmCollisionRule where pre- and post collision symbols have been replaced
+    """
+    method = collision_rule.method
+    stencil = method.stencil
+    indexing = BetweenTimestepsIndexing(src_field, stencil, Timestep.BOTH, 'pull')
+    f_out, f_in = indexing.proxy_fields
+    inv_dir = indexing.inverse_dir_symbol
+    post_collision_values = {f_out(i): src_field.center(i) for i in range(stencil.Q)}
+
+    flags = {}
+    for flag, boundary in boundaries.items():
+        if boundary.additional_data:
+            raise ValueError(f"Boundary {boundary.name} stores data per link and can not be used with flag "
+                             f"field based boundary handling")
+        if isinstance(flag, str):
+            flag = TypedSymbol(flag, dtype=create_type(DEFAULT_FLAG_TYPE))
+        flags[flag] = boundary
+
+    loads = []
+    for q, offset in enumerate(stencil):
+        neighbor = tuple(-c_i for c_i in offset)
+        if all(c_i == 0 for c_i in offset):
+            loads.append(Assignment(method.pre_collision_pdf_symbols[q], src_field.center(q)))
+            continue
+        wall_direction = stencil.index(neighbor)
+        cases = []
+        for flag, boundary in flags.items():
+            rule = boundary(f_out, f_in, wall_direction, inv_dir, method, index_field=None)
+            if isinstance(rule, AssignmentCollection):
+                rule = rule.all_assignments
+            elif isinstance(rule, Assignment):
+                rule = [rule]
+            main_assignments = [a for a in rule if isinstance(a.lhs, Field.Access)]
+            subexpressions = [a for a in rule if not isinstance(a.lhs, Field.Access)]
+            assert len(main_assignments) == 1
+            rule = AssignmentCollection(main_assignments, subexpressions).new_without_subexpressions()
+            value = fast_subs(rule.main_assignments[0].rhs, post_collision_values)
+            cases.append((value, sp.Ne(bitwise_and(flag_field[neighbor], flag), 0)))
+        cases.append((src_field[neighbor](q), True))
+        loads.append(Assignment(method.pre_collision_pdf_symbols[q], sp.Piecewise(*cases)))
+
+    boundary_mask = sum(flags.keys())
+    is_boundary = sp.Ne(bitwise_and(flag_field.center, boundary_mask), 0)
+    post_collision_symbols = method.post_collision_pdf_symbols
+    main_assignments = []
+    for assignment in collision_rule.main_assignments:
+        if assignment.lhs in post_collision_symbols:
+            q = post_collision_symbols.index(assignment.lhs)
+            rhs = sp.Piecewise((src_field.center(q), is_boundary), (assignment.rhs, True))
+            main_assignments.append(Assignment(dst_field.center(q), rhs))
+        else:
+            main_assignments.append(assignment)
+
+    result = collision_rule.copy(main_assignments)
+    result.subexpressions = loads + result.subexpressions
+    result.simplification_hints.pop('split_groups', None)
+    return result
@@ -4,7 +4,7 @@ from warnings import warn
 from lbmpy.advanced_streaming.utility import AccessPdfValues, Timestep
 from pystencils.simp.assignment_collection import AssignmentCollection
 from pystencils import Assignment, Field
-from lbmpy.boundaries.boundaryhandling import LbmWeightInfo
+from lbmpy.boundaries.boundaryhandling import LbmWeightInfo, LINK_POSITION_SYMBOLS, BLOCK_ORIGIN_SYMBOLS
 from pystencils.typing import create_type
 from pystencils.sympyextensions import get_symmetric_part
 from lbmpy.simplificationfactory import create_simplification_strategy
@@ -71,6 +71,24 @@ class LbBoundary(abc.ABC):
         """
         return []
 
+    @property
+    def merge_key(self):
+        """Boundaries with the same merge key can be handled by a single kernel over a combined index list,
+        see the merge_boundaries option of :class:`lbmpy.boundaries.LatticeBoltzmannBoundaryHandling`.
+        None means that the boundary can not be merged with others."""
+        return None
+
+    def merged_boundary(self):
+        """Return the boundary which generates the common kernel for all boundaries with the same merge key.
+        All parameters that differ between these boundaries have to be read from the index array by it."""
+        return self
+
+    @property
+    def merged_data_init_callback(self):
+        """Return a callback initialising the additional data of the merged boundary for the index array entries
+        that belong to this boundary"""
+        return self.additional_data_init_callback
+
     @property
     def name(self):
         if self._name:
@@ -107,6 +125,13 @@ class NoSlip(LbBoundary):
         """Set an optional name here, to mark boundaries, for example for force evaluations"""
         super(NoSlip, self).__init__(name)
 
+    @property
+    def merge_key(self):
+        return (type(self),)
+
+    def merged_boundary(self):
+        return type(self)("merged " + type(self).__name__)
+
     def __call__(self, f_out, f_in, dir_symbol, inv_dir, lb_method, index_field):
         return Assignment(f_in(inv_dir[dir_symbol]), f_out(dir_symbol))
 
@@ -248,7 +273,11 @@ class UBB(LbBoundary):
     Args:
         velocity: can either be a constant, an access into a field, or a callback function.
                   The callback functions gets a numpy record array with members, 'x','y','z', 'dir' (direction)
-                  and 'velocity' which has to be set to the desired velocity of the corresponding link
+                  and 'velocity' which has to be set to the desired velocity of the corresponding link.
+                  Constant velocities may also be symbolic expressions of the time step
+                  :data:`lbmpy.boundaries.boundaryhandling.TIME_STEP_SYMBOL` and the link midpoint coordinates
+                  :data:`lbmpy.boundaries.boundaryhandling.LINK_POSITION_SYMBOLS`. These are evaluated inside the
+                  boundary kernel, where the time step is a scalar kernel parameter ``t``.
         adapt_velocity_to_force: adapts the velocity to the correct equilibrium when the lattice Boltzmann method holds
                                  a forcing term. If no forcing term is set and adapt_velocity_to_force is set to True
                                  it has no effect.
@@ -285,6 +314,29 @@ class UBB(LbBoundary):
         if callable(self._velocity):
             return self._velocity
 
+    @property
+    def merge_key(self):
+        """UBBs with constant numeric velocities or velocity callbacks can be merged. The velocity is then
+        stored for each link in the index array."""
+        if not self.velocity_is_callable and not all(sp.sympify(v_i).is_Number for v_i in self._velocity):
+            return None
+        return type(self), self.dim, self._adaptVelocityToForce, self.data_type
+
+    def merged_boundary(self):
+        return type(self)(self.merged_data_init_callback, adapt_velocity_to_force=self._adaptVelocityToForce,
+                          dim=self.dim, name="merged " + type(self).__name__, data_type=self.data_type)
+
+    @property
+    def merged_data_init_callback(self):
+        if self.velocity_is_callable:
+            return self._velocity
+
+        def set_constant_velocity(boundary_data, **_):
+            for i, v_i in enumerate(self._velocity):
+                boundary_data[f'vel_{i}'] = float(v_i)
+
+        return set_constant_velocity
+
     def get_additional_code_nodes(self, lb_method):
         """Return a list of code nodes that will be added in the generated code before the index field loop.
 
@@ -316,6 +368,13 @@ class UBB(LbBoundary):
                          else v_i
                          for v_i in vel)
 
+        velocity = tuple(sp.sympify(v_i) for v_i in velocity)
+        if any(x_i in v_i.free_symbols for v_i in velocity for x_i in LINK_POSITION_SYMBOLS):
+            link_positions = {x_i: index_field(coordinate) + origin_i + sp.Rational(1, 2) + sp.Rational(1, 2) * c_i
+                              for x_i, coordinate, origin_i, c_i in zip(LINK_POSITION_SYMBOLS, ('x', 'y', 'z'),
+                                                                        BLOCK_ORIGIN_SYMBOLS, neighbor_offset)}
+            velocity = tuple(v_i.subs(link_positions) for v_i in velocity)
+
         if self._adaptVelocityToForce:
             cqc = lb_method.conserved_quantity_computation
             shifted_vel_eqs = cqc.equilibrium_input_equations_from_init_values(velocity=velocity)
@@ -349,6 +408,140 @@ class UBB(LbBoundary):
 # end class UBB
 
 
+class NoSlipLinearBouzidi(LbBoundary):
+    """
+    No-Slip boundary condition with linear interpolation of the wall position :cite:`BouzidiBC`. In contrast to
+    :class:`NoSlip` the wall does not have to be located halfway between fluid and boundary cell. For each link the
+    fraction :math:`q \\in (0, 1]` of the link length between the fluid cell and the wall is stored in the index
+    array. It has to be initialised by a Python callback, see for example
+    :func:`lbmpy.geometry.wall_distance_from_sdf`. Links with :math:`q \\leq 0` fall back to simple bounce back.
+    This should be used if the second fluid cell away from the wall, which is needed for :math:`q < 1/2`,
+    is not available.
+
+    Args:
+        name: optional name of the boundary.
+        init_wall_distance: callback function getting the boundary data setter and setting the wall distance 'q'
+                            for each link. If None, q = 0.5 is used which equals a simple bounce back.
+        data_type: data type of the wall distance q
+    """
+
+    def __init__(self, name=None, init_wall_distance=None, data_type='double'):
+        self.init_wall_distance = init_wall_distance
+        self.data_type = data_type
+
+        super(NoSlipLinearBouzidi, self).__init__(name)
+
+    @property
+    def additional_data(self):
+        """Used internally only. For the Bouzidi boundaries the distance to the wall for each link is needed.
+        This information is stored in the index vector."""
+        return [('q', create_type(self.data_type))]
+
+    @property
+    def additional_data_init_callback(self):
+        def default_callback(boundary_data, **_):
+            boundary_data['q'] = 0.5
+
+        return self.init_wall_distance if self.init_wall_distance else default_callback
+
+    @property
+    def merge_key(self):
+        return type(self), self.data_type
+
+    def merged_boundary(self):
+        return NoSlipLinearBouzidi(name="merged " + type(self).__name__, data_type=self.data_type)
+
+    def wall_term(self, f_out, dir_symbol, lb_method):
+        """Returns the subexpressions and the term which is subtracted from the reflected PDF because of the wall
+        movement. Resting walls have no such term."""
+        return [], sp.Integer(0)
+
+    def __call__(self, f_out, f_in, dir_symbol, inv_dir, lb_method, index_field):
+        f_xf = sp.Symbol("f_xf")
+        f_xf_inv = sp.Symbol("f_xf_inv")
+        f_x2f = sp.Symbol("f_x2f")
+        q = sp.Symbol("q")
+        one = sp.Float(1.0)
+        two = sp.Float(2.0)
+
+        subexpressions, wall_term = self.wall_term(f_out, dir_symbol, lb_method)
+        #   f_in(dir_symbol) is the post collision PDF that will stream into the fluid cell from the next fluid cell
+        #   away from the wall, i.e. it is f_out(dir_symbol) at x_f - c_dir
+        subexpressions += [Assignment(f_xf, f_out(dir_symbol)),
+                           Assignment(f_xf_inv, f_out(inv_dir[dir_symbol])),
+                           Assignment(f_x2f, f_in(dir_symbol)),
+                           Assignment(q, index_field[0]('q'))]
+
+        wall_far = (f_xf + (two * q - one) * f_xf_inv - wall_term) / (two * q)
+        wall_near = two * q * f_xf + (one - two * q) * f_x2f - wall_term
+        bounce_back = f_xf - wall_term
+
+        rhs = sp.Piecewise((wall_far, sp.Ge(q, 0.5)),
+                           (wall_near, sp.Gt(q, 0)),
+                           (bounce_back, True))
+
+        return AssignmentCollection([Assignment(f_in(inv_dir[dir_symbol]), rhs)], subexpressions=subexpressions)
+
+
+# end class NoSlipLinearBouzidi
+
+
+class UBBLinearBouzidi(NoSlipLinearBouzidi):
+    """Velocity bounce back boundary condition with linear interpolation of the wall position :cite:`BouzidiBC`.
+    The wall fraction q of each link is handled as in :class:`NoSlipLinearBouzidi`, the momentum transferred by
+    the moving wall is added as for the :class:`UBB` boundary.
+
+    Args:
+        velocity: constant wall velocity
+        name: optional name of the boundary.
+        init_wall_distance: callback function getting the boundary data setter and setting the wall distance 'q'
+                            for each link. If None, q = 0.5 is used which equals the :class:`UBB` boundary.
+        data_type: data type of the wall distance q
+    """
+
+    def __init__(self, velocity, name=None, init_wall_distance=None, data_type='double'):
+        self.velocity = tuple(velocity)
+        self.dim = len(velocity)
+
+        super(UBBLinearBouzidi, self).__init__(name, init_wall_distance, data_type)
+
+    @property
+    def merge_key(self):
+        return None
+
+    def get_additional_code_nodes(self, lb_method):
+        """Return a list of code nodes that will be added in the generated code before the index field loop.
+
+        Args:
+            lb_method: Lattice Boltzmann method. See :func:`lbmpy.creationfunctions.create_lb_method`
+
+        Returns:
+            list containing LbmWeightInfo and NeighbourOffsetArrays
+        """
+        return [LbmWeightInfo(lb_method, self.data_type), NeighbourOffsetArrays(lb_method.stencil)]
+
+    def wall_term(self, f_out, dir_symbol, lb_method):
+        assert self.dim == lb_method.dim, \
+            f"Dimension of UBBLinearBouzidi ({self.dim}) does not match dimension of method ({lb_method.dim})"
+
+        neighbor_offset = NeighbourOffsetArrays.neighbour_offset(dir_symbol, lb_method.stencil)
+        c_s_sq = sp.Rational(1, 3)
+        weight_info = LbmWeightInfo(lb_method, data_type=self.data_type)
+        vel_term = 2 / c_s_sq * sum([d_i * v_i for d_i, v_i in zip(neighbor_offset, self.velocity)]) \
+            * weight_info.weight_of_direction(dir_symbol, lb_method)
+
+        cqc = lb_method.conserved_quantity_computation
+        if cqc.compressible:
+            pdf_field_accesses = [f_out(i) for i in range(len(lb_method.stencil))]
+            density_equations = cqc.output_equations_from_pdfs(pdf_field_accesses, {'density': sp.Symbol("rho")})
+            return density_equations.all_assignments, vel_term * cqc.density_symbol
+        else:
+            return [], vel_term
+
+
+# end class UBBLinearBouzidi
+
+
 class SimpleExtrapolationOutflow(LbBoundary):
     r"""
     Simple Outflow boundary condition :cite:`geier2015`, equation F.1 (listed below).
@@ -553,17 +746,60 @@ class FixedDensity(LbBoundary):
     """Boundary condition that fixes the density/pressure at the obstacle.
 
     Args:
-        density: value of the density which should be set.
+        density: value of the density which should be set. Can also be a callback function, which gets the
+                 boundary data setter and has to set the 'density' of each link.
         name: optional name of the boundary.
+        data_type: data type of the density if it is stored in the index array
     """
 
-    def __init__(self, density, name=None):
+    def __init__(self, density, name=None, data_type='double'):
         if name is None:
-            name = "Fixed Density " + str(density)
+            name = "Fixed Density" if callable(density) else "Fixed Density " + str(density)
         self.density = density
+        self.data_type = data_type
 
         super(FixedDensity, self).__init__(name)
 
+    @property
+    def density_is_callable(self):
+        """Returns True if the density is initialised for each link via a callback function"""
+        return callable(self.density)
+
+    @property
+    def additional_data(self):
+        """If the density is given by a callback, it is stored for each link in the index vector."""
+        if self.density_is_callable:
+            return [('density', create_type(self.data_type))]
+        else:
+            return []
+
+    @property
+    def additional_data_init_callback(self):
+        if self.density_is_callable:
+            return self.density
+
+    @property
+    def merge_key(self):
+        """Fixed density boundaries with constant numeric densities or density callbacks can be merged.
+        The density is then stored for each link in the index array."""
+        if not self.density_is_callable and not sp.sympify(self.density).is_Number:
+            return None
+        return type(self), self.data_type
+
+    def merged_boundary(self):
+        return type(self)(self.merged_data_init_callback, name="merged " + type(self).__name__,
+                          data_type=self.data_type)
+
+    @property
+    def merged_data_init_callback(self):
+        if self.density_is_callable:
+            return self.density
+
+        def set_constant_density(boundary_data, **_):
+            boundary_data['density'] = float(self.density)
+
+        return set_constant_density
+
     def __call__(self, f_out, f_in, dir_symbol, inv_dir, lb_method, index_field):
         def remove_asymmetric_part_of_main_assignments(assignment_collection, degrees_of_freedom):
             new_main_assignments = [Assignment(a.lhs, get_symmetric_part(a.rhs, degrees_of_freedom))
@@ -580,7 +816,7 @@ class FixedDensity(LbBoundary):
         simplification = create_simplification_strategy(lb_method)
         symmetric_eq = simplification(symmetric_eq)
 
-        density = self.density
+        density = index_field[0]('density') if self.density_is_callable else self.density
         equilibrium_input = cqc.equilibrium_input_equations_from_init_values(density=density)
         equilibrium_input = equilibrium_input.new_without_subexpressions()
         equilibrium_input = equilibrium_input.main_assignments_dict
@@ -1,28 +1,59 @@
 import numpy as np
 import sympy as sp
+from lbmpy.cell_ordering import cell_order
 from lbmpy.advanced_streaming.indexing import BetweenTimestepsIndexing
 from lbmpy.advanced_streaming.utility import is_inplace, Timestep, AccessPdfValues
 from pystencils import Field, Assignment, TypedSymbol, create_kernel
 from pystencils.stencil import inverse_direction
 from pystencils import CreateKernelConfig, Target
 from pystencils.boundaries import BoundaryHandling
-from pystencils.boundaries.createindexlist import numpy_data_type_for_boundary_object
+from pystencils.boundaries.boundaryhandling import BoundaryDataSetter
+from pystencils.boundaries.createindexlist import (
+    create_boundary_index_list, numpy_data_type_for_boundary_object)
+from pystencils.typing.typed_sympy import FieldPointerSymbol
 from pystencils.backends.cbackend import CustomCodeNode
 
+#: Symbol for the current time step, that can be used in boundary conditions like the velocity of a UBB. It is a
+#: scalar kernel parameter of the boundary kernels and passed as keyword argument ``t`` to the boundary handling.
+TIME_STEP_SYMBOL = sp.Symbol("t")
+#: Symbols for the coordinates of the midpoint of a boundary link, in a coordinate system where the
+#: first interior cell of the domain spans the unit cube. They are evaluated inside the boundary kernels.
+LINK_POSITION_SYMBOLS = sp.symbols("x_link, y_link, z_link")
+#: Position of the array index zero of a block in the global coordinate system, passed by the boundary handling
+BLOCK_ORIGIN_SYMBOLS = tuple(TypedSymbol(f"block_origin_{i}", np.int64) for i in range(3))
+
 
 class LatticeBoltzmannBoundaryHandling(BoundaryHandling):
     """
     Enables boundary handling for LBM simulations with advanced streaming patterns. 
     For the in-place patterns AA and EsoTwist, two kernels are generated for a boundary 
     object and the right one selected depending on the time step.
+
+    If merge_boundaries is set, all boundary objects with the same merge key (see
+    :attr:`lbmpy.boundaries.boundaryconditions.LbBoundary.merge_key`) are handled by a single kernel over a combined
+    index list. The parameters in which these boundaries differ, like the velocity of UBBs, are then stored for
+    each link in the index list. This reduces the number of kernel calls per time step, which is beneficial if
+    many boundary objects are set.
+
+    The entries of the index lists are emitted in the order of the index list creation. With index_array_order
+    set to 'linear', 'morton' or 'hilbert' they are sorted by the linear cell index or along the respective space
+    filling curve instead, see :func:`lbmpy.cell_ordering.cell_order`, which improves the locality of the PDF
+    accesses for large boundaries. If compact_index_arrays is set, the cell coordinates are stored as 16 bit
+    integers, if the domain is small enough, and the direction as an 8 bit integer, which reduces the bytes read
+    per boundary link.
     """
 
     def __init__(self, lb_method, data_handling, pdf_field_name, streaming_pattern='pull',
-                 name="boundary_handling", flag_interface=None, target=Target.CPU, openmp=False):
+                 name="boundary_handling", flag_interface=None, target=Target.CPU, openmp=False,
+                 merge_boundaries=False, index_array_order=None, compact_index_arrays=False):
         self._lb_method = lb_method
         self._streaming_pattern = streaming_pattern
         self._inplace = is_inplace(streaming_pattern)
         self._prev_timestep = None
+        self._merge_boundaries = merge_boundaries
+        self._index_array_order = index_array_order
+        self._compact_index_arrays = compact_index_arrays
+        self._merge_key_to_boundary_info = {}
         super(LatticeBoltzmannBoundaryHandling, self).__init__(data_handling, pdf_field_name, lb_method.stencil,
                                                                name, flag_interface, target, openmp)
 
@@ -34,35 +65,179 @@ class LatticeBoltzmannBoundaryHandling(BoundaryHandling):
 
     def __call__(self, prev_timestep=Timestep.BOTH, **kwargs):
         self._prev_timestep = prev_timestep
-        super(LatticeBoltzmannBoundaryHandling, self).__call__(**kwargs)
+        if self._dirty:
+            self.prepare()
+
+        for b in self._data_handling.iterate(gpu=self._target in self._data_handling._GPU_LIKE_TARGETS):
+            for b_obj, idx_arr in b[self._index_array_name].boundary_object_to_index_list.items():
+                kernel = self._kernel_of(b_obj)
+                kwargs[self._field_name] = b[self._field_name]
+                kwargs['indexField'] = idx_arr
+                data_used_in_kernel = (p.fields[0].name for p in kernel.parameters
+                                       if isinstance(p.symbol, FieldPointerSymbol) and p.fields[0].name not in kwargs)
+                kwargs.update({name: b[name] for name in data_used_in_kernel})
+                kwargs.update(self._block_origin_arguments(b, kernel))
+                kernel(**kwargs)
+
         self._prev_timestep = None
 
     def add_fixed_steps(self, fixed_loop, **kwargs):
+        """Adds the boundary kernels to a fixed time loop and returns the argument dicts of the added calls. Kernel
+        parameters that change between time steps, like the time step ``t``, can be updated in these dicts."""
         if self._inplace:  # Fixed Loop can't do timestep selection
             raise NotImplementedError("Adding to fixed loop is currently not supported for inplace kernels")
-        super(LatticeBoltzmannBoundaryHandling, self).add_fixed_steps(fixed_loop, **kwargs)
+        if self._dirty:
+            self.prepare()
+
+        added_arguments = []
+        for b in self._data_handling.iterate(gpu=self._target in self._data_handling._GPU_LIKE_TARGETS):
+            for b_obj, idx_arr in b[self._index_array_name].boundary_object_to_index_list.items():
+                kernel = self._kernel_of(b_obj)
+                arguments = kwargs.copy()
+                arguments[self._field_name] = b[self._field_name]
+                arguments['indexField'] = idx_arr
+                data_used_in_kernel = (p.fields[0].name for p in kernel.parameters
+                                       if isinstance(p.symbol, FieldPointerSymbol) and p.field_name not in arguments)
+                arguments.update({name: b[name] for name in data_used_in_kernel if name not in arguments})
+                arguments.update(self._block_origin_arguments(b, kernel))
+                fixed_loop.add_call(kernel, arguments)
+                added_arguments.append(arguments)
+        return added_arguments
+
+    @property
+    def time_dependent(self):
+        """True if one of the boundary kernels depends on the :data:`TIME_STEP_SYMBOL`. Then the current time step has
+        to be passed as keyword argument ``t`` when the boundary handling is called."""
+        boundary_infos = list(self._boundary_object_to_boundary_info.values())
+        boundary_infos += list(self._merge_key_to_boundary_info.values())
+        kernels = []
+        for b_info in boundary_infos:
+            if isinstance(b_info, self.InplaceStreamingBoundaryInfo):
+                kernels += b_info._kernels
+            elif b_info.kernel is not None:
+                kernels.append(b_info.kernel)
+        return any(p.symbol.name == TIME_STEP_SYMBOL.name for k in kernels for p in k.parameters)
+
+    def _block_origin_arguments(self, block, kernel):
+        block_origin = block[self._index_array_name].block_origin
+        origin_names = {s.name: i for i, s in enumerate(BLOCK_ORIGIN_SYMBOLS)}
+        return {p.symbol.name: block_origin[origin_names[p.symbol.name]]
+                for p in kernel.parameters if p.symbol.name in origin_names}
 
     def _add_boundary(self, boundary_obj, flag=None):
-        if self._inplace:
-            return self._add_inplace_boundary(boundary_obj, flag)
-        else:
-            return super(LatticeBoltzmannBoundaryHandling, self)._add_boundary(boundary_obj, flag)
+        if boundary_obj in self._boundary_object_to_boundary_info:
+            return self._boundary_object_to_boundary_info[boundary_obj].flag
 
-    def _add_inplace_boundary(self, boundary_obj, flag=None):
-        if boundary_obj not in self._boundary_object_to_boundary_info:
-            sym_index_field = Field.create_generic('indexField', spatial_dimensions=1,
-                                                   dtype=numpy_data_type_for_boundary_object(boundary_obj, self.dim))
+        if flag is None:
+            flag = self.flag_interface.reserve_next_flag()
 
-            ast_even = self._create_boundary_kernel(self._data_handling.fields[self._field_name], sym_index_field,
-                                                    boundary_obj, Timestep.EVEN)
-            ast_odd = self._create_boundary_kernel(self._data_handling.fields[self._field_name], sym_index_field,
-                                                   boundary_obj, Timestep.ODD)
+        merge_key = boundary_obj.merge_key if self._merge_boundaries else None
+        if merge_key is None:
+            boundary_info = self._compile_boundary_info(boundary_obj, flag)
+        else:
+            if merge_key not in self._merge_key_to_boundary_info:
+                merged_boundary = boundary_obj.merged_boundary()
+                self._merge_key_to_boundary_info[merge_key] = self._compile_boundary_info(merged_boundary, None)
+            boundary_info = self.BoundaryInfo(boundary_obj, flag=flag, kernel=None)
+
+        self._boundary_object_to_boundary_info[boundary_obj] = boundary_info
+        return flag
+
+    def _compile_boundary_info(self, boundary_obj, flag):
+        sym_index_field = Field.create_generic('indexField', spatial_dimensions=1,
+                                               dtype=self._index_array_data_type(boundary_obj))
+        symbolic_field = self._data_handling.fields[self._field_name]
+        if self._inplace:
+            ast_even = self._create_boundary_kernel(symbolic_field, sym_index_field, boundary_obj, Timestep.EVEN)
+            ast_odd = self._create_boundary_kernel(symbolic_field, sym_index_field, boundary_obj, Timestep.ODD)
             kernels = [ast_even.compile(), ast_odd.compile()]
-            if flag is None:
-                flag = self.flag_interface.reserve_next_flag()
-            boundary_info = self.InplaceStreamingBoundaryInfo(self, boundary_obj, flag, kernels)
-            self._boundary_object_to_boundary_info[boundary_obj] = boundary_info
-        return self._boundary_object_to_boundary_info[boundary_obj].flag
+            return self.InplaceStreamingBoundaryInfo(self, boundary_obj, flag, kernels)
+        else:
+            ast = self._create_boundary_kernel(symbolic_field, sym_index_field, boundary_obj)
+            return self.BoundaryInfo(boundary_obj, flag=flag, kernel=ast.compile())
+
+    def _kernel_of(self, boundary_obj):
+        if boundary_obj in self._boundary_object_to_boundary_info:
+            return self._boundary_object_to_boundary_info[boundary_obj].kernel
+        return self._merged_boundary_info_of(boundary_obj).kernel
+
+    def _merged_boundary_info_of(self, merged_boundary):
+        for boundary_info in self._merge_key_to_boundary_info.values():
+            if boundary_info.boundary_object is merged_boundary:
+                return boundary_info
+        raise KeyError(f"No kernel registered for boundary {merged_boundary.name}")
+
+    def _create_index_fields(self):
+        groups = dict()
+        for b_info in self._boundary_object_to_boundary_info.values():
+            merge_key = b_info.boundary_object.merge_key if self._merge_boundaries else None
+            if merge_key is None:
+                groups[b_info.boundary_object] = (b_info.boundary_object, [b_info])
+            else:
+                merged_boundary = self._merge_key_to_boundary_info[merge_key].boundary_object
+                groups.setdefault(merge_key, (merged_boundary, []))[1].append(b_info)
+
+        dh = self._data_handling
+        ff_ghost_layers = dh.ghost_layers_of_field(self.flag_interface.flag_field_name)
+        for b in dh.iterate(ghost_layers=ff_ghost_layers):
+            flag_arr = b[self.flag_interface.flag_field_name]
+            pdf_arr = b[self._field_name]
+            index_array_bd = b[self._index_array_name]
+            index_array_bd.clear()
+            # position of the array index zero, used to evaluate the link position symbols inside the kernels
+            index_array_bd.block_origin = tuple(int(o) for o in b.offset)
+            for kernel_boundary, b_infos in groups.values():
+                idx_arrays = [self._create_index_array(flag_arr, b_info.flag, kernel_boundary, ff_ghost_layers)
+                              for b_info in b_infos]
+                idx_arr = np.concatenate(idx_arrays)
+                if idx_arr.size == 0:
+                    continue
+                index_array_bd.boundary_object_to_index_list[kernel_boundary] = idx_arr
+
+                # every boundary object initialises its own part of the (combined) index list via a view
+                start = 0
+                for b_info, size in zip(b_infos, (a.size for a in idx_arrays)):
+                    if size == 0:
+                        continue
+                    idx_arr_view = idx_arr[start:start + size]
+                    start += size
+                    boundary_data_setter = BoundaryDataSetter(idx_arr_view, b.offset, self.stencil,
+                                                              ff_ghost_layers, pdf_arr)
+                    index_array_bd.boundary_object_to_data_setter[b_info.boundary_object] = boundary_data_setter
+                    self._boundary_data_initialization(b_info.boundary_object, boundary_data_setter)
+
+    def _index_array_data_type(self, boundary_obj):
+        if not self._compact_index_arrays:
+            return numpy_data_type_for_boundary_object(boundary_obj, self.dim)
+
+        ghost_layers = self._data_handling.ghost_layers_of_field(self._field_name)
+        max_extent = max(self._data_handling.shape) + 2 * ghost_layers
+        coordinate_type = np.int16 if max_extent <= np.iinfo(np.int16).max else np.int32
+        return np.dtype([(name, coordinate_type) for name in ['x', 'y', 'z'][:self.dim]]
+                        + [('dir', np.uint8)]
+                        + [(name, data_type.numpy_dtype) for name, data_type in boundary_obj.additional_data],
+                        align=True)
+
+    def _create_index_array(self, flag_arr, flag, boundary_obj, ghost_layers):
+        idx_arr = create_boundary_index_list(flag_arr, self.stencil, flag, self.flag_interface.domain_flag,
+                                             ghost_layers, boundary_obj.inner_or_boundary, boundary_obj.single_link)
+        result = np.zeros(len(idx_arr), dtype=self._index_array_data_type(boundary_obj))
+        if self._index_array_order is not None and len(idx_arr) > 0:
+            coordinates = [idx_arr[name] for name in ['x', 'y', 'z'][:self.dim]]
+            idx_arr = idx_arr[cell_order(coordinates, self._index_array_order, flag_arr.shape)]
+        for name in idx_arr.dtype.names:
+            result[name] = idx_arr[name]
+        return result
+
+    def _boundary_data_initialization(self, boundary_obj, boundary_data_setter, **kwargs):
+        if self._merge_boundaries and boundary_obj.merge_key is not None:
+            if boundary_obj.merged_data_init_callback:
+                boundary_obj.merged_data_init_callback(boundary_data_setter, **kwargs)
+            if self._target in self._data_handling._GPU_LIKE_TARGETS:
+                self._data_handling.to_gpu(self._index_array_name)
+        else:
+            super(LatticeBoltzmannBoundaryHandling, self)._boundary_data_initialization(boundary_obj,
+                                                                                        boundary_data_setter, **kwargs)
 
     def _create_boundary_kernel(self, symbolic_field, symbolic_index_field, boundary_obj, prev_timestep=Timestep.BOTH):
         return create_lattice_boltzmann_boundary_kernel(
@@ -107,10 +282,10 @@ class LatticeBoltzmannBoundaryHandling(BoundaryHandling):
         result = np.zeros(self.dim)
 
         for b in dh.iterate(ghost_layers=ff_ghost_layers):
-            obj_to_ind_list = b[self._index_array_name].boundary_object_to_index_list
+            obj_to_data_setter = b[self._index_array_name].boundary_object_to_data_setter
             pdf_array = b[self._field_name]
-            if boundary_obj in obj_to_ind_list:
-                ind_arr = obj_to_ind_list[boundary_obj]
+            if boundary_obj in obj_to_data_setter:
+                ind_arr = obj_to_data_setter[boundary_obj].index_array
                 acc = AccessPdfValues(self._lb_method.stencil,
                                       streaming_pattern=self._streaming_pattern, timestep=prev_timestep,
                                       streaming_dir='out')
@@ -129,10 +304,10 @@ class LatticeBoltzmannBoundaryHandling(BoundaryHandling):
         result = np.zeros(self.dim)
 
         for b in dh.iterate(ghost_layers=ff_ghost_layers):
-            obj_to_ind_list = b[self._index_array_name].boundary_object_to_index_list
+            obj_to_data_setter = b[self._index_array_name].boundary_object_to_data_setter
             pdf_array = b[self._field_name]
-            if boundary_obj in obj_to_ind_list:
-                ind_arr = obj_to_ind_list[boundary_obj]
+            if boundary_obj in obj_to_data_setter:
+                ind_arr = obj_to_data_setter[boundary_obj].index_array
                 inverse_ind_arr = ind_arr.copy()
                 inverse_ind_arr['dir'] = inv_direction[inverse_ind_arr['dir']]
                 acc_out = AccessPdfValues(self._lb_method.stencil,
@@ -0,0 +1,285 @@
+"""
+Tiered cache for symbolic derivations, like discrete moments and cumulants, that are repeated across processes.
+
+The first tier is an in-memory LRU cache, the second tier a directory of pickled results, keyed by a hash of a
+canonical serialization of the function arguments. Stencils and nested sequences are serialized by their entries,
+sympy expressions by :func:`sympy.srepr`. Only expressions built from plain symbols and numbers are stored on disk,
+arguments containing other atoms, e.g. field accesses, are cached in memory only.
+
+The caches are configured by the environment variables ``LBMPY_CACHE_SIZE`` (entries per function in memory),
+``LBMPY_CACHE_DIR`` (defaults to a subdirectory of the pystencils cache directory) and ``LBMPY_DISK_CACHE``
+(set to 0 to disable the disk tier), or at runtime by :func:`configure_cache`.
+
+Functions that are called with equal inputs in different forms canonicalize their arguments with
+:func:`stencil_key`, :func:`moment_key`, :func:`moment_set_key` and :func:`symbols_key` before calling a cached
+function. Related functions may share one namespace, i.e. one directory of the disk tier.
+
+>>> import sympy as sp
+>>> @tiered_cache
+... def square(x):
+...     return x ** 2
+>>> square(sp.Symbol("a")), square(sp.Symbol("a"))
+(a**2, a**2)
+>>> square.cache_info().memory_hits
+1
+"""
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict, namedtuple
+from functools import partial, wraps
+
+import sympy as sp
+
+from pystencils.cache import cache_dir as pystencils_cache_dir
+
+CacheInfo = namedtuple('CacheInfo', ['memory_hits', 'disk_hits', 'misses', 'size', 'maxsize'])
+
+_CACHE_FORMAT_VERSION = 1
+
+_config = {
+    'maxsize': int(os.environ.get('LBMPY_CACHE_SIZE', 4096)),
+    'directory': os.environ.get('LBMPY_CACHE_DIR', os.path.join(pystencils_cache_dir, 'lbmpy')),
+    'use_disk': os.environ.get('LBMPY_DISK_CACHE', '1') != '0',
+}
+_registered_caches = {}
+
+
+class _NotCanonical(Exception):
+    pass
+
+
+def configure_cache(maxsize=None, directory=None, use_disk=None):
+    """Changes the configuration of all tiered caches, arguments left to None keep their current value.
+
+    Args:
+        maxsize: number of entries per function in the in-memory tier, shrinking evicts the least recently used ones
+        directory: directory of the disk tier
+        use_disk: enables or disables the disk tier
+    """
+    if maxsize is not None:
+        _config['maxsize'] = maxsize
+        for cache in _registered_caches.values():
+            cache.shrink()
+    if directory is not None:
+        _config['directory'] = str(directory)
+    if use_disk is not None:
+        _config['use_disk'] = use_disk
+
+
+def cache_statistics():
+    """Returns a dict mapping the name of every function with a tiered cache to its :class:`CacheInfo`"""
+    return {name: cache.info() for name, cache in _registered_caches.items()}
+
+
+def clear_caches(memory=True, disk=False):
+    """Clears the in-memory tiers and statistics of all tiered caches, and optionally the disk tier."""
+    for cache in _registered_caches.values():
+        cache.clear(memory=memory, disk=disk)
+
+
+def canonical_serialization(obj):
+    """Canonical string representation of a function argument, raises ValueError if there is none.
+
+    >>> import sympy as sp
+    >>> canonical_serialization(((1, 0), sp.Symbol("x") ** 2))
+    "((1,0),Pow(Symbol('x'), Integer(2)))"
+    """
+    try:
+        return _canonical(obj)
+    except _NotCanonical as e:
+        raise ValueError(f"No canonical serialization for {obj!r}") from e
+
+
+def _canonical(obj):
+    if isinstance(obj, sp.Basic):
+        if any(type(atom) is not sp.Symbol and not isinstance(atom, (sp.Number, sp.NumberSymbol))
+               for atom in obj.atoms()):
+            raise _NotCanonical()
+        return _CanonicalReprPrinter().doprint(obj)
+    if obj is None or isinstance(obj, (bool, str)):
+        return repr(obj)
+    if isinstance(obj, int) or hasattr(obj, '__index__'):
+        return repr(int(obj))
+    if isinstance(obj, (tuple, list)) or hasattr(obj, 'Q'):
+        return '(' + ','.join(_canonical(e) for e in obj) + ')'
+    raise _NotCanonical()
+
+
+def stencil_key(stencil):
+    """Canonical form of a stencil, equal for an :class:`lbmpy.stencils.LBStencil` and the tuple of its directions.
+
+    The order of the directions is kept, since results like discrete equilibria are given per direction.
+    """
+    return tuple(tuple(int(c) for c in direction) for direction in stencil)
+
+
+def moment_key(moment):
+    """Canonical form of a moment, the expanded polynomial in :data:`lbmpy.moments.MOMENT_SYMBOLS`.
+
+    >>> x, y = sp.symbols("x y")
+    >>> moment_key((2, 1)) == moment_key(x * (x * y)), moment_key((0, 0, 0))
+    (True, 1)
+    """
+    if isinstance(moment, tuple):
+        from lbmpy.moments import exponent_to_polynomial_representation
+        moment = exponent_to_polynomial_representation(moment)
+    return sp.expand(moment)
+
+
+def moment_set_key(moments):
+    """Canonical form of a set of moments, for results that do not depend on the order of the moments"""
+    return tuple(sorted((moment_key(m) for m in moments), key=sp.default_sort_key))
+
+
+def symbols_key(symbols, length=None):
+    """Canonical form of a sequence of symbols or values, e.g. a velocity, optionally cut to its first entries"""
+    return tuple(sp.sympify(s) for s in symbols)[:length]
+
+
+class _CanonicalReprPrinter(sp.printing.repr.ReprPrinter):
+    """Prints symbols with their full set of assumptions, independent of how the cached instance was created"""
+
+    def _print_Symbol(self, expr):
+        assumptions = [f"{k}={v}" for k, v in sorted(expr.assumptions0.items()) if (k, v) != ('commutative', True)]
+        return f"{expr.__class__.__name__}({', '.join([repr(expr.name)] + assumptions)})"
+
+
+class _TieredCache:
+
+    def __init__(self, func, key=None, namespace=None):
+        self._func = func
+        self._key = key
+        self.name = f"{func.__module__}.{func.__qualname__}"
+        #   functions sharing a namespace store their entries in one directory, prefixed by the function name
+        self._directory = namespace or self.name
+        self._file_prefix = f"{func.__qualname__}-" if namespace else ''
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+    def __call__(self, *args, **kwargs):
+        key_args, key_kwargs = args, kwargs
+        if self._key is not None:
+            key_args, key_kwargs = (self._key(*args, **kwargs),), {}
+            if key_args[0] is None:
+                return self._func(*args, **kwargs)
+
+        memory_key = (key_args, tuple(sorted(key_kwargs.items())))
+        if not _is_hashable(memory_key):
+            memory_key = None
+        else:
+            with self._lock:
+                if memory_key in self._memory:
+                    self._memory.move_to_end(memory_key)
+                    self._memory_hits += 1
+                    return self._memory[memory_key]
+
+        disk_path = self._disk_path(key_args, key_kwargs) if _config['use_disk'] else None
+        result = self._load(disk_path)
+        from_disk = result is not None
+        if from_disk:
+            result = result[0]
+        else:
+            result = self._func(*args, **kwargs)
+            self._store(disk_path, result)
+
+        with self._lock:
+            if from_disk:
+                self._disk_hits += 1
+            else:
+                self._misses += 1
+            if memory_key is not None:
+                self._memory[memory_key] = result
+                self._shrink_locked()
+        return result
+
+    def info(self):
+        return CacheInfo(self._memory_hits, self._disk_hits, self._misses, len(self._memory), _config['maxsize'])
+
+    def shrink(self):
+        with self._lock:
+            self._shrink_locked()
+
+    def clear(self, memory=True, disk=False):
+        with self._lock:
+            if memory:
+                self._memory.clear()
+                self._memory_hits = self._disk_hits = self._misses = 0
+        if disk:
+            directory = os.path.join(_config['directory'], self._directory)
+            if os.path.isdir(directory):
+                for file_name in os.listdir(directory):
+                    if file_name.startswith(self._file_prefix):
+                        os.remove(os.path.join(directory, file_name))
+
+    def _shrink_locked(self):
+        while len(self._memory) > max(_config['maxsize'], 0):
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, args, kwargs):
+        try:
+            serialized = _canonical(args) + _canonical(sorted(kwargs.items()))
+        except _NotCanonical:
+            return None
+        key = f"{_CACHE_FORMAT_VERSION}|{sp.__version__}|{self.name}|{serialized}"
+        file_name = self._file_prefix + hashlib.sha256(key.encode()).hexdigest() + '.pickle'
+        return os.path.join(_config['directory'], self._directory, file_name)
+
+    @staticmethod
+    def _load(path):
+        """Returns a one-tuple with the stored result, or None if there is no readable entry"""
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return (pickle.load(f),)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+
+    @staticmethod
+    def _store(path, result):
+        if path is None:
+            return
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def _is_hashable(obj):
+    try:
+        hash(obj)
+    except TypeError:
+        return False
+    return True
+
+
+def tiered_cache(func=None, *, key=None, namespace=None):
+    """Decorator caching the results of a function in memory and on disk, see module documentation.
+
+    If given, ``key`` is called with the arguments of the function and returns the object identifying the result in
+    both tiers instead of the arguments. Calls for which it returns None are not cached.
+    Functions with the same ``namespace`` share one directory of the disk tier.
+    The decorated function gets the methods ``cache_info()`` and ``cache_clear(memory=True, disk=False)``.
+    """
+    if func is None:
+        return partial(tiered_cache, key=key, namespace=namespace)
+    cache = _TieredCache(func, key, namespace)
+    _registered_caches[cache.name] = cache
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return cache(*args, **kwargs)
+
+    wrapper.cache_info = cache.info
+    wrapper.cache_clear = cache.clear
+    return wrapper
@@ -0,0 +1,166 @@
+import numpy as np
+
+
+def linear_index(coordinates, shape):
+    """Returns the linear index of cells in an array of the given shape, where the first coordinate is the fastest
+    running one.
+
+    Args:
+        coordinates: integer array of shape (dim, number of cells)
+        shape: shape of the array the cells are located in
+
+    Examples:
+        >>> linear_index([[0, 1, 0], [0, 0, 2]], shape=(4, 3))
+        array([0, 1, 8])
+    """
+    coordinates = np.asarray(coordinates, dtype=np.int64)
+    result = np.zeros(coordinates.shape[1:], dtype=np.int64)
+    for coordinate, extent in zip(coordinates[::-1], shape[::-1]):
+        result = result * extent + coordinate
+    return result
+
+
+def morton_index(coordinates):
+    """Returns the position of cells on the Morton (Z-order) curve, obtained by interleaving the bits of the
+    coordinates. The first coordinate occupies the lowest bit.
+
+    Args:
+        coordinates: non-negative integer array of shape (dim, number of cells)
+
+    Examples:
+        >>> morton_index([[0, 1, 0, 1, 2], [0, 0, 1, 1, 0]])
+        array([0, 1, 2, 3, 4], dtype=uint64)
+    """
+    coordinates = np.asarray(coordinates, dtype=np.uint64)
+    dim = coordinates.shape[0]
+    result = np.zeros(coordinates.shape[1:], dtype=np.uint64)
+    for bit in range(64 // dim):
+        for d in range(dim):
+            bit_value = (coordinates[d] >> np.uint64(bit)) & np.uint64(1)
+            result |= bit_value << np.uint64(bit * dim + d)
+    return result
+
+
+def hilbert_index(coordinates):
+    """Returns the position of cells on the Hilbert curve. In contrast to the Morton curve, consecutive cells on
+    the Hilbert curve are face neighbors if the cells fill a cube with a power of two edge length. For other
+    domains, e.g. non-power-of-two sizes or only the fluid cells of a domain, the curve skips the missing cells and
+    consecutive cells can be far apart.
+
+    Uses the transposed index representation of J. Skilling, "Programming the Hilbert curve" (2004).
+
+    Args:
+        coordinates: non-negative integer array of shape (dim, number of cells)
+
+    Examples:
+        >>> hilbert_index([[0, 0, 1, 1], [0, 1, 1, 0]])
+        array([0, 1, 2, 3], dtype=uint64)
+    """
+    x = np.array(coordinates, dtype=np.uint64, ndmin=2)
+    dim = x.shape[0]
+    bits = max(int(x.max()).bit_length() if x.size else 1, 1)
+    assert bits * dim <= 64, "Coordinates too large for 64 bit Hilbert index"
+    highest_bit = np.uint64(1 << (bits - 1))
+
+    # inverse undo of the excess work
+    q = highest_bit
+    while q > 1:
+        p = q - np.uint64(1)
+        for i in range(dim):
+            is_set = (x[i] & q) != 0
+            x[0, is_set] ^= p
+            t = (x[0] ^ x[i]) & p
+            t[is_set] = 0
+            x[0] ^= t
+            x[i] ^= t
+        q >>= np.uint64(1)
+
+    # gray encode
+    for i in range(1, dim):
+        x[i] ^= x[i - 1]
+    t = np.zeros(x.shape[1:], dtype=np.uint64)
+    q = highest_bit
+    while q > 1:
+        t[(x[dim - 1] & q) != 0] ^= q - np.uint64(1)
+        q >>= np.uint64(1)
+    x ^= t
+
+    result = np.zeros(x.shape[1:], dtype=np.uint64)
+    for bit in range(bits - 1, -1, -1):
+        for i in range(dim):
+            result = (result << np.uint64(1)) | ((x[i] >> np.uint64(bit)) & np.uint64(1))
+    return result
+
+
+def reverse_cuthill_mckee_order(coordinates, directions=None):
+    """Returns the reverse Cuthill-McKee permutation of the neighborhood graph of the given cells, which reduces
+    the distance of neighboring cells in the resulting order. Requires scipy.
+
+    Args:
+        coordinates: non-negative integer array of shape (dim, number of cells)
+        directions: offsets of the cells that are connected to a cell, by default its face neighbors
+    """
+    try:
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import reverse_cuthill_mckee
+    except ImportError:
+        raise ImportError("Reverse Cuthill-McKee cell ordering failed. Required package 'scipy' is missing")
+
+    coordinates = np.asarray(coordinates, dtype=np.int64)
+    dim, num_cells = coordinates.shape
+    if directions is None:
+        directions = [tuple(sign * int(i == d) for i in range(dim)) for d in range(dim) for sign in (-1, 1)]
+
+    shape = tuple(int(c.max()) + 3 if c.size else 3 for c in coordinates)
+    cell_lookup = np.full(shape, -1, dtype=np.int64)
+    cell_lookup[tuple(coordinates + 1)] = np.arange(num_cells)
+
+    rows, columns = [], []
+    for direction in directions:
+        if all(d_i == 0 for d_i in direction):
+            continue
+        neighbors = coordinates + 1 + np.array(direction, dtype=np.int64)[:, np.newaxis]
+        in_bounds = np.all((neighbors >= 0) & (neighbors < np.array(shape)[:, np.newaxis]), axis=0)
+        neighbor_idx = np.full(num_cells, -1, dtype=np.int64)
+        neighbor_idx[in_bounds] = cell_lookup[tuple(neighbors[:, in_bounds])]
+        is_connected = neighbor_idx >= 0
+        rows.append(np.flatnonzero(is_connected))
+        columns.append(neighbor_idx[is_connected])
+
+    rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+    columns = np.concatenate(columns) if columns else np.empty(0, dtype=np.int64)
+    graph = coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, columns)), shape=(num_cells, num_cells)).tocsr()
+    return reverse_cuthill_mckee(graph, symmetric_mode=True).astype(np.int64)
+
+
+def cell_order(coordinates, order, shape=None, directions=None):
+    """Returns the permutation that sorts the given cells in the requested order.
+
+    Args:
+        coordinates: non-negative integer array of shape (dim, number of cells)
+        order: one of
+
+               - 'linear': linear index of the cells, with the first coordinate running fastest
+               - 'morton': position on the Morton (Z-order) space filling curve
+               - 'hilbert': position on the Hilbert space filling curve
+               - 'rcm': reverse Cuthill-McKee ordering of the neighborhood graph, requires scipy
+        shape: shape of the array the cells are located in, required for linear ordering
+        directions: neighbor offsets defining the neighborhood graph for 'rcm' ordering, e.g. the stencil
+
+    Returns:
+        index array that can be used to reorder the cells
+    """
+    coordinates = np.asarray(coordinates)
+    if order == 'linear':
+        if shape is None:
+            shape = tuple(int(c.max()) + 1 if c.size else 1 for c in coordinates)
+        key = linear_index(coordinates, shape)
+    elif order == 'morton':
+        key = morton_index(coordinates)
+    elif order == 'hilbert':
+        key = hilbert_index(coordinates)
+    elif order == 'rcm':
+        return reverse_cuthill_mckee_order(coordinates, directions)
+    else:
+        raise ValueError(f"Unknown cell order '{order}'. Use 'linear', 'morton', 'hilbert' or 'rcm'")
+    return np.argsort(key, kind='stable')
@@ -1,12 +1,15 @@
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 import sympy as sp
 from sympy.core.cache import cacheit
 
+from lbmpy.cache import tiered_cache
 from lbmpy.chapman_enskog.derivative import (
     chapman_enskog_derivative_expansion, chapman_enskog_derivative_recombination)
 from lbmpy.moments import (
-    discrete_moment, get_moment_indices, moment_matrix, non_aliased_moment,
+    discrete_moment, get_moment_indices, inverse_moment_matrix, non_aliased_moment,
     polynomial_to_exponent_representation)
 from pystencils.cache import disk_cache
 from pystencils.fd import (
@@ -16,11 +19,21 @@ from pystencils.sympyextensions import normalize_product, symmetric_product
 
 
 class ChapmanEnskogAnalysis:
+    """Chapman-Enskog analysis of a moment-based method, matching its macroscopic equations to Navier-Stokes.
 
-    def __init__(self, method, constants=None):
+    Args:
+        method: moment-based lattice Boltzmann method
+        constants: symbols that are treated as constants in derivatives, the symbolic relaxation rates are added
+        processes: number of worker processes taking the moments of the epsilon hierarchy in parallel,
+                   sequential if None or 1
+
+    The moment equations of the epsilon hierarchy are cached in memory and on disk by :mod:`lbmpy.cache`, keyed by
+    a fingerprint of the method, i.e. its stencil, moments, equilibrium values and relaxation rates.
+    """
+
+    def __init__(self, method, constants=None, processes=None):
         cqc = method.conserved_quantity_computation
         self._method = method
-        self._moment_cache = LbMethodEqMoments(method)
         self.rho = cqc.density_symbol
         self.u = cqc.velocity_symbols
         self.t = sp.Symbol("t")
@@ -29,11 +42,6 @@ class ChapmanEnskogAnalysis:
         taylored_lb_eq = get_taylor_expanded_lb_equation(dim=self._method.dim)
         self.equations_by_order = chapman_enskog_ansatz(taylored_lb_eq)
 
-        # Taking moments
-        c = sp.Matrix([expanded_symbol("c", subscript=i) for i in range(self._method.dim)])
-        moments_until_order1 = [1] + list(c)
-        moments_order2 = [c_i * c_j for c_i, c_j in symmetric_product(c, c)]
-
         symbolic_relaxation_rates = [rr for rr in method.relaxation_rates if isinstance(rr, sp.Symbol)]
         if constants is None:
             constants = set(symbolic_relaxation_rates)
@@ -42,18 +50,15 @@ class ChapmanEnskogAnalysis:
 
         self.constants = constants
 
-        o_eps_moments1 = [expand_diff_linear(self._take_and_insert_moments(self.equations_by_order[1] * moment),
-                                             constants=constants)
-                          for moment in moments_until_order1]
-        o_eps_moments2 = [expand_diff_linear(self._take_and_insert_moments(self.equations_by_order[1] * moment),
-                                             constants=constants)
-                          for moment in moments_order2]
-        o_eps_sq_moments1 = [expand_diff_linear(self._take_and_insert_moments(self.equations_by_order[2] * moment),
-                                                constants=constants)
-                             for moment in moments_until_order1]
+        # Taking moments
+        o_eps_moments1, o_eps_moments2, o_eps_sq_moments1 = _epsilon_moment_equations(
+            method, self.equations_by_order[1], self.equations_by_order[2], constants, processes,
+            fingerprint=_method_fingerprint(method, constants))
 
-        self._equationsWithHigherOrderMoments = [self._ce_recombine(ord1 * self.epsilon + ord2 * self.epsilon ** 2)
-                                                 for ord1, ord2 in zip(o_eps_moments1, o_eps_sq_moments1)]
+        recombine = partial(_ce_recombine, t=self.t, dim=self._method.dim)
+        self._equationsWithHigherOrderMoments = _parallel_map(
+            recombine, [ord1 * self.epsilon + ord2 * self.epsilon ** 2
+                        for ord1, ord2 in zip(o_eps_moments1, o_eps_sq_moments1)], processes)
 
         self.higher_order_moments = compute_higher_order_moment_subs_dict(tuple(o_eps_moments1 + o_eps_moments2))
 
@@ -62,7 +67,8 @@ class ChapmanEnskogAnalysis:
         self.compressible = compressible
         self.pressure_equation = pressure
         self._sigmaWithHigherOrderMoments = sigma
-        self._sigma = sigma.subs(self.higher_order_moments).expand().applyfunc(self._ce_recombine)
+        sigma = sigma.subs(self.higher_order_moments).expand()
+        self._sigma = sp.Matrix(*sigma.shape, _parallel_map(recombine, list(sigma), processes))
         self._sigmaWithoutErrorTerms = remove_error_terms(self._sigma)
 
     def get_macroscopic_equations(self, substitute_higher_order_moments=False):
@@ -78,17 +84,6 @@ class ChapmanEnskogAnalysis:
         else:
             return self._sigmaWithHigherOrderMoments
 
-    def _take_and_insert_moments(self, eq):
-        eq = take_moments(eq)
-        eq = substitute_collision_operator_moments(eq, self._moment_cache)
-        return insert_moments(eq, self._moment_cache).expand()
-
-    def _ce_recombine(self, expr):
-        expr = chapman_enskog_derivative_recombination(expr, self.t, stop_order=3)
-        for l in range(self._method.dim):
-            expr = chapman_enskog_derivative_recombination(expr, l, stop_order=2)
-        return expr
-
     def get_dynamic_viscosity(self):
         candidates = self.get_shear_viscosity_candidates()
         if len(candidates) != 1:
@@ -172,6 +167,78 @@ class ChapmanEnskogAnalysis:
         return solve_res[0]
 
 
+# ------------------------------------------- Epsilon Hierarchy --------------------------------------------------------
+
+
+def _method_fingerprint(method, constants):
+    """Identifies the moment equations of the epsilon hierarchy of a method in the tiered cache"""
+    cqc = method.conserved_quantity_computation
+    force_model = getattr(method, 'force_model', None)
+    force_model = None if force_model is None else type(force_model).__name__
+    relaxation_info = tuple((moment, info.equilibrium_value, info.relaxation_rate)
+                            for moment, info in method.relaxation_info_dict.items())
+    return ('chapman_enskog', type(method).__name__, method.stencil, relaxation_info, cqc.compressible,
+            cqc.zero_centered_pdfs, force_model, cqc.density_symbol, tuple(cqc.velocity_symbols),
+            tuple(sorted(constants, key=str)))
+
+
+def _hierarchy_key(*args, fingerprint=None):
+    return fingerprint
+
+
+@tiered_cache(key=_hierarchy_key)
+def _epsilon_moment_equations(method, eps_equation, eps_sq_equation, constants, processes, fingerprint=None):
+    """Moment equations of first and second order in epsilon, see :class:`ChapmanEnskogAnalysis`"""
+    c = sp.Matrix([expanded_symbol("c", subscript=i) for i in range(method.dim)])
+    moments_until_order1 = [1] + list(c)
+    moments_order2 = [c_i * c_j for c_i, c_j in symmetric_product(c, c)]
+
+    equations = [eps_equation * moment for moment in moments_until_order1 + moments_order2]
+    equations += [eps_sq_equation * moment for moment in moments_until_order1]
+    moment_equation = partial(_moment_equation, moment_computation=LbMethodEqMoments(method), constants=constants)
+    results = _parallel_map(moment_equation, equations, processes)
+
+    n1, n2 = len(moments_until_order1), len(moments_order2)
+    return results[:n1], results[n1:n1 + n2], results[n1 + n2:]
+
+
+def _moment_equation(eq, moment_computation, constants):
+    eq = take_moments(eq)
+    eq = substitute_collision_operator_moments(eq, moment_computation)
+    eq = insert_moments(eq, moment_computation).expand()
+    return expand_diff_linear(eq, constants=constants)
+
+
+def _ce_recombine(expr, t, dim):
+    expr = chapman_enskog_derivative_recombination(expr, t, stop_order=3)
+    for l in range(dim):
+        expr = chapman_enskog_derivative_recombination(expr, l, stop_order=2)
+    return expr
+
+
+def _parallel_map(function, arguments, processes):
+    """Applies a picklable function to all arguments, in a pool of `processes` worker processes if more than one.
+
+    The function, which usually carries the method, is sent once to every worker instead of once per argument."""
+    if not processes or processes <= 1 or len(arguments) <= 1:
+        return [function(a) for a in arguments]
+    with ProcessPoolExecutor(max_workers=min(processes, len(arguments)),
+                             initializer=_set_worker_function, initargs=(function,)) as executor:
+        return list(executor.map(_call_worker_function, arguments))
+
+
+_worker_function = None
+
+
+def _set_worker_function(function):
+    global _worker_function
+    _worker_function = function
+
+
+def _call_worker_function(argument):
+    return _worker_function(argument)
+
+
 # --------------------------------------------- Helper Functions -------------------------------------------------------
 
 
@@ -218,6 +285,9 @@ class CeMoment(sp.Symbol):
     def __getnewargs__(self):
         return self.name, self.moment_tuple, self.superscript
 
+    def __getnewargs_ex__(self):
+        return self.__getnewargs__(), {}
+
     def _latex(self, *_):
         coord_str = []
         for i, comp in enumerate(self.moment_tuple):
@@ -243,7 +313,7 @@ class LbMethodEqMoments:
         self._momentCache = dict()
         self._postCollisionMomentCache = dict()
         self._stencil = lb_method.stencil
-        self._inverseMomentMatrix = moment_matrix(lb_method.moments, lb_method.stencil).inv()
+        self._inverseMomentMatrix = inverse_moment_matrix(lb_method.moments, lb_method.stencil)
         self._method = lb_method
 
     def __call__(self, ce_moment):
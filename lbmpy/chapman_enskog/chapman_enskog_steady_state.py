@@ -1,19 +1,33 @@
 import functools
+from functools import partial
 
 import numpy as np
 import sympy as sp
 
+from lbmpy.cache import tiered_cache
 from lbmpy.chapman_enskog.chapman_enskog import (
     CeMoment, LbMethodEqMoments, chapman_enskog_ansatz, expanded_symbol, insert_moments,
-    remove_higher_order_u, take_moments)
+    remove_higher_order_u, take_moments, _hierarchy_key, _method_fingerprint, _parallel_map)
 from pystencils.fd import (
     Diff, DiffOperator, collect_diffs, expand_diff_linear, normalize_diff_order)
 from pystencils.sympyextensions import kronecker_delta, multidimensional_sum, normalize_product
 
 
 class SteadyStateChapmanEnskogAnalysis:
+    """Steady state Chapman-Enskog analysis of a moment-based method, optionally with a force model.
 
-    def __init__(self, method, force_model_class=None, order=4):
+    Args:
+        method: moment-based lattice Boltzmann method
+        force_model_class: force model class, constructed with symbolic accelerations
+        order: order of the Taylor expansion
+        processes: number of worker processes computing the continuity and momentum equations in parallel,
+                   sequential if None or 1
+
+    The pdf hierarchy, the continuity and the momentum equations are cached in memory and on disk by
+    :mod:`lbmpy.cache`, keyed by a fingerprint of the method, the force model class and the order.
+    """
+
+    def __init__(self, method, force_model_class=None, order=4, processes=None):
         self.method = method
         self.dim = method.dim
         self.order = order
@@ -35,16 +49,11 @@ class SteadyStateChapmanEnskogAnalysis:
             self.F_q = self.force_model(self.method)
 
         # Perform the analysis
-        self.taylored_equation = self._create_taylor_expanded_equation()
-        inserted_hierarchy, raw_hierarchy = self._create_pdf_hierarchy(self.taylored_equation)
-        self.pdf_hierarchy = inserted_hierarchy
-        self.pdf_hierarchy_raw = raw_hierarchy
-        self.recombined_eq = self._recombine_pdfs(self.pdf_hierarchy)
-
-        symbols_to_values = self._get_symbols_to_values_dict()
-        self.continuity_equation = self._compute_continuity_equation(self.recombined_eq, symbols_to_values)
-        self.momentum_equations = [self._compute_momentum_equation(self.recombined_eq, symbols_to_values, h)
-                                   for h in range(self.dim)]
+        force_model_name = None if force_model_class is None else force_model_class.__name__
+        fingerprint = _method_fingerprint(method, ()) + ('steady_state_analysis', force_model_name, order)
+        (self.taylored_equation, self.pdf_hierarchy, self.pdf_hierarchy_raw, self.recombined_eq,
+         self.continuity_equation, self.momentum_equations) = _steady_state_analysis(self, processes,
+                                                                                     fingerprint=fingerprint)
 
     def get_pdf_hierarchy(self, order, collision_operator_symbol=sp.Symbol("omega")):
         def substitute_non_commuting_symbols(eq):
@@ -171,6 +180,26 @@ class SteadyStateChapmanEnskogAnalysis:
         return normalize_diff_order(expand_diff_linear(sp.Add(*new_products), functions=self.physical_variables))
 
 
+@tiered_cache(key=_hierarchy_key)
+def _steady_state_analysis(analysis, processes, fingerprint=None):
+    """Taylor expanded equation, pdf hierarchy, recombined equation, continuity equation and momentum equations,
+    see :class:`SteadyStateChapmanEnskogAnalysis`"""
+    taylored_equation = analysis._create_taylor_expanded_equation()
+    pdf_hierarchy, pdf_hierarchy_raw = analysis._create_pdf_hierarchy(taylored_equation)
+    recombined_eq = analysis._recombine_pdfs(pdf_hierarchy)
+
+    compute = partial(_steady_state_moment_equation, analysis=analysis, recombined_eq=recombined_eq,
+                      symbols_to_values=analysis._get_symbols_to_values_dict())
+    continuity_equation, *momentum_equations = _parallel_map(compute, [None] + list(range(analysis.dim)), processes)
+    return taylored_equation, pdf_hierarchy, pdf_hierarchy_raw, recombined_eq, continuity_equation, momentum_equations
+
+
+def _steady_state_moment_equation(coordinate, analysis, recombined_eq, symbols_to_values):
+    if coordinate is None:
+        return analysis._compute_continuity_equation(recombined_eq, symbols_to_values)
+    return analysis._compute_momentum_equation(recombined_eq, symbols_to_values, coordinate)
+
+
 # ----------------------------------------------------------------------------------------------------------------------
 
 
@@ -53,7 +53,7 @@ For example, to modify the AST one can run::
 
 """
 from dataclasses import dataclass, field, replace
-from typing import Union, List, Tuple, Any, Type, Iterable
+from typing import Union, List, Tuple, Any, Type, Iterable, Optional
 from warnings import warn, filterwarnings
 
 import lbmpy.moment_transforms
@@ -73,7 +73,8 @@ from lbmpy.methods.creationfunctions import (
     create_with_monomial_cumulants, create_cumulant, create_with_default_polynomial_cumulants)
 from lbmpy.methods.momentbased.entropic import add_entropy_condition, add_iterative_entropy_condition
 from lbmpy.relaxationrates import relaxation_rate_from_magic_number
-from lbmpy.simplificationfactory import create_simplification_strategy
+from lbmpy.simplificationfactory import (
+    create_simplification_strategy, bounded_simplification_strategy, bounded_simplification_step)
 from lbmpy.stencils import LBStencil
 from lbmpy.turbulence_models import add_smagorinsky_model
 from lbmpy.updatekernels import create_lbm_kernel, create_stream_pull_with_output_kernel
@@ -468,6 +469,20 @@ class LBMOptimisation:
     Simplifications applied during the derivation of the collision rule for cumulant LBMs.
     For details see :mod:`lbmpy.moment_transforms`.
     """
+    simplification_time_limit: Optional[float] = None
+    """
+    Maximum run-time in seconds of every step of the simplification strategy and of the common subexpression
+    eliminations. A step exceeding it is interrupted and replaced by a cheaper variant or skipped, issuing a
+    :class:`lbmpy.simplificationfactory.SimplificationBudgetWarning`. Steps can only be interrupted in the main thread
+    on POSIX systems; see :func:`lbmpy.simplificationfactory.bounded_simplification_step`.
+    """
+    simplification_size_limit: Optional[int] = None
+    """
+    Maximum size, in nodes of the expression trees, of the collision rule produced by a simplification step. Steps
+    growing the collision rule beyond it, e.g. by expansion, are replaced by a cheaper variant or skipped, issuing a
+    :class:`lbmpy.simplificationfactory.SimplificationBudgetWarning`. Expansions are checked before they are carried
+    out, bounding the memory of the derivation.
+    """
     split: bool = False
     """
     Split innermost loop, to handle only two directions per loop. This reduces the number of parallel
@@ -681,6 +696,9 @@ def create_lb_collision_rule(lb_method=None, lbm_config=None, lbm_optimisation=N
         simplification = lbm_optimisation.simplification
     else:
         simplification = SimplificationStrategy()
+    budget = lbm_optimisation.simplification_time_limit, lbm_optimisation.simplification_size_limit
+    if budget != (None, None):
+        simplification = bounded_simplification_strategy(simplification, *budget)
     collision_rule = simplification(collision_rule)
 
     if isinstance(collision_rule.method, CumulantBasedLbMethod):
@@ -692,9 +710,9 @@ def create_lb_collision_rule(lb_method=None, lbm_config=None, lbm_optimisation=N
 
     if lbm_optimisation.cse_pdfs:
         from lbmpy.methods.momentbased.momentbasedsimplifications import cse_in_opposing_directions
-        collision_rule = cse_in_opposing_directions(collision_rule)
+        collision_rule = bounded_simplification_step(cse_in_opposing_directions, *budget)(collision_rule)
     if lbm_optimisation.cse_global:
-        collision_rule = sympy_cse(collision_rule)
+        collision_rule = bounded_simplification_step(sympy_cse, *budget)(collision_rule)
 
     lbm_config.collision_rule = collision_rule
     return collision_rule
@@ -798,7 +816,8 @@ def update_with_default_parameters(params, opt_params=None, lbm_config=None, lbm
                 raise KeyError(f'{v} is not a valid kwarg. Please look in CreateKernelConfig for valid settings')
         config = replace(config, **config_params)
 
-    lbm_opt_params = ['cse_pdfs', 'cse_global', 'simplification', 'pre_simplification', 'split', 'field_size',
+    lbm_opt_params = ['cse_pdfs', 'cse_global', 'simplification', 'pre_simplification',
+                      'simplification_time_limit', 'simplification_size_limit', 'split', 'field_size',
                       'field_layout', 'symbolic_field', 'symbolic_temporary_field', 'builtin_periodicity']
 
     if opt_params is not None:
@@ -5,9 +5,9 @@ Additionally functions are provided to compute cumulants from moments and vice v
 
 import sympy as sp
 
+from lbmpy.cache import tiered_cache
 from lbmpy.continuous_distribution_measures import multi_differentiation
 from lbmpy.moments import moments_up_to_component_order
-from pystencils.cache import memorycache
 from pystencils.sympyextensions import fast_subs, scalar_product
 
 
@@ -100,7 +100,7 @@ def __cumulant_raw_moment_transform(index, dependent_var_dict, outer_function, d
     return fast_subs(result, subs_dict)
 
 
-@memorycache(maxsize=16)
+@tiered_cache
 def __get_discrete_cumulant_generating_function(func, stencil, wave_numbers):
     assert stencil.Q == len(func)
 
@@ -111,7 +111,7 @@ def __get_discrete_cumulant_generating_function(func, stencil, wave_numbers):
 # ------------------------------------------- Public Functions ---------------------------------------------------------
 
 
-@memorycache(maxsize=64)
+@tiered_cache
 def discrete_cumulant(func, cumulant, stencil):
     """Computes cumulant of discrete function.
 
@@ -140,7 +140,7 @@ def discrete_cumulant(func, cumulant, stencil):
         return result
 
 
-@memorycache(maxsize=8)
+@tiered_cache
 def cumulants_from_pdfs(stencil, cumulant_indices=None, pdf_symbols=None):
     """Transformation of pdfs (or other discrete function on a stencil) to cumulant space.
 
@@ -2,7 +2,7 @@ import sympy as sp
 
 from .abstract_equilibrium import AbstractEquilibrium
 
-from lbmpy.moments import discrete_moment, moment_matrix
+from lbmpy.moments import discrete_moment, inverse_moment_matrix
 from lbmpy.cumulants import discrete_cumulant
 
 
@@ -12,9 +12,8 @@ def discrete_equilibrium_from_matching_moments(stencil, moment_constraints,
                                                deviation_only=False):
     assert len(moment_constraints) == stencil.Q
     moments = tuple(moment_constraints.keys())
-    mm = moment_matrix(moments, stencil)
     try:
-        pdfs = mm.inv() * sp.Matrix(list(moment_constraints.values()))
+        pdfs = inverse_moment_matrix(moments, stencil) * sp.Matrix(list(moment_constraints.values()))
         pdfs = pdfs.expand()
         return GenericDiscreteEquilibrium(stencil, pdfs, zeroth_order_moment_symbol,
                                           first_order_moment_symbols, deviation_only=deviation_only)
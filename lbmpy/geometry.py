@@ -33,6 +33,60 @@ def add_sphere(boundary_handling, midpoint, radius, boundary=NoSlip(), replace=T
     return boundary_handling.set_boundary(boundary, mask_callback=set_sphere, replace=replace)
 
 
+def wall_distance_from_sdf(sdf, bisection_steps=32):
+    """Creates a callback for the interpolated bounce back boundaries, e.g. NoSlipLinearBouzidi, which computes the
+    wall fraction q of every boundary link from a signed distance function.
+
+    The wall position is located on each link between the midpoint of the fluid cell and the midpoint of the
+    boundary cell by bisection. Links for which the second fluid cell away from the wall lies inside the obstacle
+    while q < 1/2 are marked with q = -1, which makes the boundary fall back to simple bounce back for them.
+
+    Args:
+        sdf: signed distance function getting x, y (z) coordinate arrays and returning an array of the same shape,
+             which is negative inside the obstacle and positive in the fluid
+        bisection_steps: number of bisection steps used to locate the wall on each link
+
+    Returns:
+        callback that can be passed as init_wall_distance to the interpolated bounce back boundaries
+
+    Examples:
+        >>> from lbmpy.boundaries import NoSlipLinearBouzidi
+        >>> from lbmpy.lbstep import LatticeBoltzmannStep
+        >>> step = LatticeBoltzmannStep(domain_size=(32, 16), relaxation_rate=1.8)
+        >>> def cylinder(x, y):
+        ...     return np.sqrt((x - 10.2) ** 2 + (y - 8.1) ** 2) - 3.7
+        >>> bouzidi = NoSlipLinearBouzidi(init_wall_distance=wall_distance_from_sdf(cylinder))
+        >>> flag = step.boundary_handling.set_boundary(bouzidi, mask_callback=lambda x, y: cylinder(x, y) < 0)
+    """
+    def callback(boundary_data, **_):
+        dim = boundary_data.dim
+        # the block offset already accounts for the ghost layers, thus the midpoints computed here are the same
+        # as the ones passed to the mask callbacks of the boundary handling
+        fluid_cell = np.array([boundary_data.index_array[name] + boundary_data.offset[i] + 0.5
+                               for i, name in enumerate(['x', 'y', 'z'][:dim])])
+        link = boundary_data.link_offsets().T
+
+        def sdf_on_link(t):
+            return np.asarray(sdf(*(fluid_cell + t * link)), dtype=np.float64)
+
+        lower = np.zeros(fluid_cell.shape[1])
+        upper = np.ones(fluid_cell.shape[1])
+        inside_at_upper = sdf_on_link(upper) < 0
+        for _ in range(bisection_steps):
+            mid = 0.5 * (lower + upper)
+            inside = sdf_on_link(mid) < 0
+            upper = np.where(inside, mid, upper)
+            lower = np.where(inside, lower, mid)
+
+        # links that do not cross the zero level set are treated as if the wall was halfway
+        q = np.where(inside_at_upper, 0.5 * (lower + upper), 0.5)
+        second_fluid_cell_missing = sdf_on_link(-np.ones_like(q)) < 0
+        q = np.where((q < 0.5) & second_fluid_cell_missing, -1, q)
+        boundary_data['q'] = q
+
+    return callback
+
+
 def add_pipe_inflow_boundary(boundary_handling, u_max, slice_obj, flow_direction=0, diameter=None):
     """Adds velocity inflow UBB boundary for pipe flow.
 
@@ -3,7 +3,7 @@ from dataclasses import replace
 
 import numpy as np
 
-from lbmpy.boundaries.boundaryhandling import LatticeBoltzmannBoundaryHandling
+from lbmpy.boundaries.boundaryhandling import LatticeBoltzmannBoundaryHandling, TIME_STEP_SYMBOL
 from lbmpy.creationfunctions import (create_lb_function, update_with_default_parameters)
 from lbmpy.enums import Stencil
 from lbmpy.macroscopic_value_kernels import (
@@ -23,7 +23,7 @@ class LatticeBoltzmannStep:
                  compute_velocity_in_every_step=False, compute_density_in_every_step=False,
                  velocity_input_array_name=None, time_step_order='stream_collide', flag_interface=None,
                  alignment_if_vectorized=64, fixed_loop_sizes=True,
-                 timeloop_creation_function=TimeLoop,
+                 timeloop_creation_function=TimeLoop, overlap_communication=False,
                  lbm_config=None, lbm_optimisation=None, config=None, **method_parameters):
 
         if optimization is None:
@@ -156,6 +156,22 @@ class LatticeBoltzmannStep:
         self._lbm_optimisation = lbm_optimisation
         self._config = config
 
+        # -- Overlap of communication and computation
+        # The ghost layer exchange runs in the background while the cells that do not read from the ghost layers
+        # are updated, the frontier cells next to the ghost layers are updated after the exchange completed.
+        # Synchronization functions that block, like the periodicity copies of the serial data handling, can not
+        # overlap with the kernels, they keep the regular schedule.
+        if overlap_communication and (self._gpu or len(self._lbmKernels) != 1):
+            raise ValueError("overlap_communication is only supported for stream-collide kernels on CPU")
+        self._overlap_communication = (overlap_communication
+                                       and AsynchronousSynchronization.is_non_blocking(self._sync_src)
+                                       and AsynchronousSynchronization.is_non_blocking(self._sync_tmp))
+        self._ghost_boundary_masks = None
+        if self._overlap_communication:
+            self._interior_kernel, self._frontier_kernels = self._create_overlap_kernels()
+            self._async_sync_src = AsynchronousSynchronization(self._sync_src)
+            self._async_sync_tmp = AsynchronousSynchronization(self._sync_tmp)
+
         # -- Macroscopic Value Kernels
         self._getterKernel, self._setterKernel = self._compile_macroscopic_setter_and_getter()
 
@@ -167,6 +183,7 @@ class LatticeBoltzmannStep:
         # -- VTK output
         self._vtk_writer = None
         self.time_steps_run = 0
+        self._boundary_time_step = 0
 
         self._velocity_init_kernel = None
         self._velocity_init_vel_backup = None
@@ -255,6 +272,9 @@ class LatticeBoltzmannStep:
         return SlicedGetter(self.density_slice)
 
     def pre_run(self):
+        self._boundary_time_step = self.time_steps_run
+        if self._overlap_communication:
+            self._ghost_boundary_masks = self._create_ghost_boundary_masks()
         if self._gpu:
             self._data_handling.to_gpu(self._pdf_arr_name)
             if self._data_handling.is_on_gpu(self.velocity_data_name):
@@ -269,15 +289,52 @@ class LatticeBoltzmannStep:
         if len(self._lbmKernels) == 2:  # collide stream
             self._data_handling.run_kernel(self._lbmKernels[0], **self.kernel_params)
             self._sync_src()
-            self._boundary_handling(**self.kernel_params)
+            self._run_boundary_handling()
             self._data_handling.run_kernel(self._lbmKernels[1], **self.kernel_params)
+        elif self._overlap_communication:
+            if self._ghost_boundary_masks is None:
+                self._ghost_boundary_masks = self._create_ghost_boundary_masks()
+            self._run_boundary_handling()
+            ghost_boundary_values = self._save_ghost_boundary_values(self._pdf_arr_name)
+            self._async_sync_src.start()
+            self._data_handling.run_kernel(self._interior_kernel, **self.kernel_params)
+            self._async_sync_src.wait()
+            ghost_boundary_values()
+            for kernel in self._frontier_kernels:
+                self._data_handling.run_kernel(kernel, **self.kernel_params)
         else:  # stream collide
             self._sync_src()
-            self._boundary_handling(**self.kernel_params)
+            self._run_boundary_handling()
             self._data_handling.run_kernel(self._lbmKernels[0], **self.kernel_params)
 
         self._data_handling.swap(self._pdf_arr_name, self._tmp_arr_name, self._gpu)
 
+    def _run_boundary_handling(self, advance_time_step=True):
+        """Runs the boundary handling, passing the current time step if one of the boundaries depends on it"""
+        if self._boundary_handling.time_dependent:
+            self._boundary_handling(**{**self.kernel_params, TIME_STEP_SYMBOL.name: self._boundary_time_step})
+        else:
+            self._boundary_handling(**self.kernel_params)
+        if advance_time_step:
+            self._boundary_time_step += 1
+
+    def _add_boundary_handling_to_fixed_loop(self, fixed_loop):
+        if not self._boundary_handling.time_dependent:
+            self._boundary_handling.add_fixed_steps(fixed_loop, **self.kernel_params)
+            return
+
+        # the time step is written into the argument dicts of the boundary kernels before they are called
+        boundary_arguments = []
+
+        def set_boundary_time_step():
+            for arguments in boundary_arguments:
+                arguments[TIME_STEP_SYMBOL.name] = self._boundary_time_step
+            self._boundary_time_step += 1
+
+        fixed_loop.add_call(set_boundary_time_step, {})
+        boundary_arguments += self._boundary_handling.add_fixed_steps(
+            fixed_loop, **{**self.kernel_params, TIME_STEP_SYMBOL.name: self._boundary_time_step})
+
     def get_time_loop(self):
         self.pre_run()  # make sure GPU arrays are allocated
 
@@ -292,19 +349,90 @@ class LatticeBoltzmannStep:
                 fixed_loop.add_call(self._lbmKernels[0], collide_args)
 
                 fixed_loop.add_call(self._sync_src if t == 0 else self._sync_tmp, {})
-                self._boundary_handling.add_fixed_steps(fixed_loop, **self.kernel_params)
+                self._add_boundary_handling_to_fixed_loop(fixed_loop)
 
                 stream_args = self._data_handling.get_kernel_kwargs(self._lbmKernels[1], **self.kernel_params)
                 fixed_loop.add_call(self._lbmKernels[1], stream_args)
+            elif self._overlap_communication:
+                self._add_boundary_handling_to_fixed_loop(fixed_loop)
+                self._add_overlapping_step_to_fixed_loop(fixed_loop, self._async_sync_src if t == 0 else
+                                                         self._async_sync_tmp,
+                                                         self._pdf_arr_name if t == 0 else self._tmp_arr_name)
             else:  # stream collide
                 fixed_loop.add_call(self._sync_src if t == 0 else self._sync_tmp, {})
-                self._boundary_handling.add_fixed_steps(fixed_loop, **self.kernel_params)
+                self._add_boundary_handling_to_fixed_loop(fixed_loop)
                 stream_collide_args = self._data_handling.get_kernel_kwargs(self._lbmKernels[0], **self.kernel_params)
                 fixed_loop.add_call(self._lbmKernels[0], stream_collide_args)
 
             self._data_handling.swap(self._pdf_arr_name, self._tmp_arr_name, self._gpu)
         return fixed_loop
 
+    def _add_overlapping_step_to_fixed_loop(self, fixed_loop, async_sync, src_arr_name):
+        restore_ghost_boundary_values = []
+
+        def start_synchronization():
+            restore_ghost_boundary_values.append(self._save_ghost_boundary_values(src_arr_name))
+            async_sync.start()
+
+        def finish_synchronization():
+            async_sync.wait()
+            restore_ghost_boundary_values.pop()()
+
+        fixed_loop.add_call(start_synchronization, {})
+        fixed_loop.add_call(self._interior_kernel,
+                            self._data_handling.get_kernel_kwargs(self._interior_kernel, **self.kernel_params))
+        fixed_loop.add_call(finish_synchronization, {})
+        for kernel in self._frontier_kernels:
+            fixed_loop.add_call(kernel, self._data_handling.get_kernel_kwargs(kernel, **self.kernel_params))
+
+    def _create_overlap_kernels(self):
+        """Compiles the stream-collide kernel for the interior, that does not read from the ghost layers, and for
+        one frontier slab per side of the domain. The slabs of dimension d exclude the slabs of lower dimensions."""
+        update_rule = getattr(self._lbmKernels[0], 'update_rule', None)
+        if update_rule is None:
+            raise ValueError("overlap_communication requires a kernel created by create_lb_function")
+        spatial_shape = self._data_handling.fields[self._pdf_arr_name].spatial_shape
+        if any(isinstance(s, int) and s < 5 for s in spatial_shape):
+            raise ValueError("overlap_communication requires at least three cells per dimension")
+
+        lbm_config = replace(self._lbm_config, update_rule=update_rule, ast=None)
+
+        def create_kernel_for_slice(iteration_slice):
+            config = replace(self._config, iteration_slice=iteration_slice)
+            return create_lb_function(lbm_config=lbm_config, lbm_optimisation=self._lbm_optimisation, config=config)
+
+        interior_kernel = create_kernel_for_slice((slice(2, -2),) * self.dim)
+        frontier_kernels = []
+        for d in range(self.dim):
+            for side in (slice(1, 2), slice(-2, -1)):
+                iteration_slice = (slice(2, -2),) * d + (side,) + (slice(1, -1),) * (self.dim - d - 1)
+                frontier_kernels.append(create_kernel_for_slice(iteration_slice))
+        return interior_kernel, frontier_kernels
+
+    def _create_ghost_boundary_masks(self):
+        """Masks of the boundary cells in the ghost layers of every block. Their pdfs are written by the boundary
+        handling before the exchange starts, and restored after the exchange."""
+        flag_interface = self._boundary_handling.flag_interface
+        boundary_mask = ~np.array(flag_interface.domain_flag, dtype=flag_interface.dtype)
+        masks = []
+        for block in self._data_handling.iterate(ghost_layers=True):
+            flags = block[flag_interface.flag_field_name]
+            is_ghost = np.ones(flags.shape, dtype=bool)
+            is_ghost[(slice(1, -1),) * self.dim] = False
+            masks.append(is_ghost & ((flags & boundary_mask) != 0))
+        return masks
+
+    def _save_ghost_boundary_values(self, arr_name):
+        """Copies the pdfs of the boundary cells in the ghost layers, returns a function that restores them"""
+        saved = [(block[arr_name], mask, block[arr_name][mask])
+                 for block, mask in zip(self._data_handling.iterate(ghost_layers=True), self._ghost_boundary_masks)
+                 if np.any(mask)]
+
+        def restore():
+            for arr, mask, values in saved:
+                arr[mask] = values
+        return restore
+
     def post_run(self):
         if self._gpu:
             self._data_handling.to_cpu(self._pdf_arr_name)
@@ -409,7 +537,7 @@ class LatticeBoltzmannStep:
             for i in range(check_residuum_after):
                 steps_run += 1
                 self._sync_src()
-                self._boundary_handling(**self.kernel_params)
+                self._run_boundary_handling(advance_time_step=False)
                 self._data_handling.run_kernel(self._velocity_init_kernel, **self.kernel_params)
                 self._data_handling.swap(self._pdf_arr_name, self._tmp_arr_name, gpu=gpu)
             self._data_handling.all_to_cpu()
@@ -445,3 +573,23 @@ class LatticeBoltzmannStep:
         setter_eqs = create_simplification_strategy(lb_method)(setter_eqs)
         setter_kernel = create_kernel(setter_eqs, target=Target.CPU, cpu_openmp=self._config.cpu_openmp).compile()
         return getter_kernel, setter_kernel
+
+
+class AsynchronousSynchronization:
+    """Runs a non-blocking ghost layer synchronization function of a data handling in the background, like the
+    waLBerla communication schemes of the parallel data handling."""
+
+    def __init__(self, sync_function):
+        if not self.is_non_blocking(sync_function):
+            raise ValueError("The synchronization function does not communicate non-blocking")
+        self._sync_function = sync_function
+
+    @staticmethod
+    def is_non_blocking(sync_function):
+        return hasattr(sync_function, 'startCommunication') and hasattr(sync_function, 'wait')
+
+    def start(self):
+        self._sync_function.startCommunication()
+
+    def wait(self):
+        self._sync_function.wait()
@@ -3,6 +3,12 @@ This module contains a functional interface to the continuous Maxwell-Boltzmann
 polynomial approximation, often used to formulate lattice-Boltzmann methods for hydrodynamics.
 Additionally functions are provided to compute moments and cumulants of these distributions.
 
+All results are cached in memory and on disk, in the shared namespace ``lbmpy.maxwellian_equilibrium`` of the
+:mod:`lbmpy.cache`. The arguments are canonicalized before, such that a stencil given as :class:`LBStencil` or as
+tuple of directions, moments given as exponent tuples or as equivalent polynomials, and velocities given as list or
+tuple find the same entries. Moments and cumulants are cached one by one, independent of the order of the requested
+moment sequences.
+
 The functionality of this module has mostly been replaced by the :mod:`lbmpy.equilibrium` module.
 In particular, the continuous and discrete Maxwellians are now represented by 
 :class:`lbmpy.equilibrium.ContinuousHydrodynamicMaxwellian` and
@@ -14,9 +20,9 @@ import warnings
 import sympy as sp
 from sympy.core.numbers import Zero
 
-from pystencils.cache import disk_cache
 from pystencils.sympyextensions import remove_higher_order_terms
 
+from lbmpy.cache import moment_key, moment_set_key, stencil_key, symbols_key, tiered_cache
 from lbmpy.moments import MOMENT_SYMBOLS
 from lbmpy.continuous_distribution_measures import continuous_moment, continuous_central_moment, continuous_cumulant
 
@@ -59,8 +65,9 @@ get_weights.weights = {
     }
 }
 
+_CACHE_NAMESPACE = 'lbmpy.maxwellian_equilibrium'
+
 
-@disk_cache
 def discrete_maxwellian_equilibrium(stencil, rho=sp.Symbol("rho"), u=sp.symbols("u_:3"), order=2,
                                     c_s_sq=sp.Symbol("c_s") ** 2, compressible=True):
     """
@@ -74,11 +81,18 @@ def discrete_maxwellian_equilibrium(stencil, rho=sp.Symbol("rho"), u=sp.symbols(
         c_s_sq: square of speed of sound
         compressible: compressibility
     """
+    stencil = stencil_key(stencil)
+    return _discrete_maxwellian_equilibrium(stencil, sp.sympify(rho), symbols_key(u, len(stencil[0])), order,
+                                            sp.sympify(c_s_sq), bool(compressible))
+
+
+@tiered_cache(namespace=_CACHE_NAMESPACE)
+def _discrete_maxwellian_equilibrium(stencil, rho, u, order, c_s_sq, compressible):
+    from lbmpy.stencils import LBStencil
+    stencil = LBStencil(stencil)
     weights = get_weights(stencil, c_s_sq)
     assert stencil.Q == len(weights)
 
-    u = u[:stencil.D]
-
     rho_outside = rho if compressible else sp.Rational(1, 1)
     rho_inside = rho if not compressible else sp.Rational(1, 1)
 
@@ -110,7 +124,6 @@ def discrete_maxwellian_equilibrium(stencil, rho=sp.Symbol("rho"), u=sp.symbols(
     return tuple(res)
 
 
-@disk_cache
 def generate_equilibrium_by_matching_moments(stencil, moments, rho=sp.Symbol("rho"), u=sp.symbols("u_:3"),
                                              c_s_sq=sp.Symbol("c_s") ** 2, order=None):
     """
@@ -118,17 +131,26 @@ def generate_equilibrium_by_matching_moments(stencil, moments, rho=sp.Symbol("rh
     The number of moments has to match the number of directions in the stencil. For documentation of other parameters
     see :func:`get_equilibrium_values_of_maxwell_boltzmann_function`
     """
-    from lbmpy.moments import moment_matrix
-    assert len(moments) == stencil.Q, f"Moment count({len(moments)}) does not match stencil size({stencil.Q})"
+    stencil = stencil_key(stencil)
+    assert len(moments) == len(stencil), f"Moment count({len(moments)}) does not match stencil size({len(stencil)})"
+    #   the equilibrium does not depend on the order of the moments
+    return sp.Matrix(_equilibrium_by_matching_moments(stencil, moment_set_key(moments), sp.sympify(rho),
+                                                      symbols_key(u, len(stencil[0])), sp.sympify(c_s_sq), order))
+
+
+@tiered_cache(namespace=_CACHE_NAMESPACE)
+def _equilibrium_by_matching_moments(stencil, moments, rho, u, c_s_sq, order):
+    from lbmpy.moments import inverse_moment_matrix, moment_matrix
+    from lbmpy.stencils import LBStencil
+    stencil = LBStencil(stencil)
     continuous_moments_vector = get_equilibrium_values_of_maxwell_boltzmann_function(moments, stencil.D, rho, u, c_s_sq,
                                                                                      order, space="moment")
     continuous_moments_vector = sp.Matrix(continuous_moments_vector)
     M = moment_matrix(moments, stencil)
     assert M.rank() == stencil.Q, f"Rank of moment matrix ({M.rank()}) does not match stencil size ({stencil.Q})"
-    return M.inv() * continuous_moments_vector
+    return tuple(inverse_moment_matrix(moments, stencil) * continuous_moments_vector)
 
 
-@disk_cache
 def continuous_maxwellian_equilibrium(dim=3, rho=sp.Symbol("rho"),
                                       u=sp.symbols("u_:3"),
                                       v=sp.symbols("v_:3"),
@@ -143,15 +165,17 @@ def continuous_maxwellian_equilibrium(dim=3, rho=sp.Symbol("rho"),
         v: symbols for particle velocity
         c_s_sq: symbol for speed of sound squared, defaults to symbol c_s**2
     """
-    u = u[:dim]
-    v = v[:dim]
+    return _continuous_maxwellian_equilibrium(dim, sp.sympify(rho), symbols_key(u, dim), symbols_key(v, dim),
+                                              sp.sympify(c_s_sq))
+
 
+@tiered_cache(namespace=_CACHE_NAMESPACE)
+def _continuous_maxwellian_equilibrium(dim, rho, u, v, c_s_sq):
     vel_term = sum([(v_i - u_i) ** 2 for v_i, u_i in zip(v, u)])
     return rho / (2 * sp.pi * c_s_sq) ** (sp.Rational(dim, 2)) * sp.exp(- vel_term / (2 * c_s_sq))
 
 
 # -------------------------------- Equilibrium moments  ----------------------------------------------------------------
-@disk_cache
 def get_equilibrium_values_of_maxwell_boltzmann_function(moments, dim, rho=sp.Symbol("rho"),
                                                          u=sp.symbols("u_:3"),
                                                          c_s_sq=sp.Symbol("c_s") ** 2, order=None,
@@ -172,29 +196,32 @@ def get_equilibrium_values_of_maxwell_boltzmann_function(moments, dim, rho=sp.Sy
     >>> get_equilibrium_values_of_maxwell_boltzmann_function( ( (0,0,0), (1,0,0), (0,1,0), (0,0,1), (2,0,0) ), dim=3 )
     [rho, rho*u_0, rho*u_1, rho*u_2, rho*(c_s**2 + u_0**2)]
     """
+    if space not in ("moment", "central moment", "cumulant"):
+        raise ValueError("Only moment, central moment or cumulant space are supported")
+    rho, u, c_s_sq = sp.sympify(rho), symbols_key(u, dim), sp.sympify(c_s_sq)
+    return [_equilibrium_value(moment_key(moment), dim, rho, u, c_s_sq, order, space) for moment in moments]
+
+
+@tiered_cache(namespace=_CACHE_NAMESPACE)
+def _equilibrium_value(moment, dim, rho, u, c_s_sq, order, space):
     # trick to speed up sympy integration (otherwise it takes multiple minutes, or aborts):
     # use a positive, real symbol to represent c_s_sq -> then replace this symbol afterwards with the real c_s_sq
     c_s_sq_helper = sp.Symbol("csq_helper", positive=True, real=True)
     mb = continuous_maxwellian_equilibrium(dim, rho, u, MOMENT_SYMBOLS[:dim], c_s_sq_helper)
     if space == "moment":
-        result = [continuous_moment(mb, moment, MOMENT_SYMBOLS[:dim]).subs(c_s_sq_helper, c_s_sq)
-                  for moment in moments]
+        result = continuous_moment(mb, moment, MOMENT_SYMBOLS[:dim])
     elif space == "central moment":
-        result = [continuous_central_moment(mb, moment, MOMENT_SYMBOLS[:dim], velocity=u).subs(c_s_sq_helper, c_s_sq)
-                  for moment in moments]
-    elif space == "cumulant":
-        result = [continuous_cumulant(mb, moment, MOMENT_SYMBOLS[:dim]).subs(c_s_sq_helper, c_s_sq)
-                  for moment in moments]
+        result = continuous_central_moment(mb, moment, MOMENT_SYMBOLS[:dim], velocity=u)
     else:
-        raise ValueError("Only moment, central moment or cumulant space are supported")
+        result = continuous_cumulant(mb, moment, MOMENT_SYMBOLS[:dim])
+    result = result.subs(c_s_sq_helper, c_s_sq)
 
     if order is not None:
-        result = [remove_higher_order_terms(r, order=order, symbols=u) for r in result]
+        result = remove_higher_order_terms(result, order=order, symbols=u)
 
     return result
 
 
-@disk_cache
 def get_moments_of_discrete_maxwellian_equilibrium(stencil, moments,
                                                    rho=sp.Symbol("rho"), u=sp.symbols("u_:3"),
                                                    c_s_sq=sp.Symbol("c_s") ** 2, order=None, compressible=True):
@@ -209,11 +236,7 @@ def get_moments_of_discrete_maxwellian_equilibrium(stencil, moments,
         order: highest order of u terms
         compressible: compressible or incompressible form
     """
-    from lbmpy.moments import discrete_moment
-    if order is None:
-        order = 4
-    mb = discrete_maxwellian_equilibrium(stencil, rho, u, order, c_s_sq, compressible)
-    return tuple([discrete_moment(mb, moment, stencil).expand() for moment in moments])
+    return _discrete_equilibrium_measures("moment", stencil, moments, rho, u, c_s_sq, order, compressible)
 
 
 def compressible_to_incompressible_moment_value(term, rho, u):
@@ -256,12 +279,27 @@ def compressible_to_incompressible_moment_value(term, rho, u):
 # -------------------------------- Equilibrium cumulants ---------------------------------------------------------------
 
 
-@disk_cache
 def get_cumulants_of_discrete_maxwellian_equilibrium(stencil, cumulants,
                                                      rho=sp.Symbol("rho"), u=sp.symbols("u_:3"),
                                                      c_s_sq=sp.Symbol("c_s") ** 2, order=None, compressible=True):
+    return _discrete_equilibrium_measures("cumulant", stencil, cumulants, rho, u, c_s_sq, order, compressible)
+
+
+def _discrete_equilibrium_measures(measure, stencil, moments, rho, u, c_s_sq, order, compressible):
+    stencil = stencil_key(stencil)
+    rho, u, c_s_sq = sp.sympify(rho), symbols_key(u, len(stencil[0])), sp.sympify(c_s_sq)
+    order = 4 if order is None else order
+    return tuple([_discrete_equilibrium_measure(measure, stencil, moment_key(moment), rho, u, c_s_sq, order,
+                                                bool(compressible)) for moment in moments])
+
+
+@tiered_cache(namespace=_CACHE_NAMESPACE)
+def _discrete_equilibrium_measure(measure, stencil, moment, rho, u, c_s_sq, order, compressible):
     from lbmpy.cumulants import discrete_cumulant
-    if order is None:
-        order = 4
-    mb = discrete_maxwellian_equilibrium(stencil, rho, u, order, c_s_sq, compressible)
-    return tuple([discrete_cumulant(mb, cumulant, stencil).expand() for cumulant in cumulants])
+    from lbmpy.moments import discrete_moment
+    from lbmpy.stencils import LBStencil
+    stencil = LBStencil(stencil)
+    mb = _discrete_maxwellian_equilibrium(stencil_key(stencil), rho, u, order, c_s_sq, compressible)
+    if measure == "moment":
+        return discrete_moment(mb, moment, stencil).expand()
+    return discrete_cumulant(mb, moment, stencil).expand()
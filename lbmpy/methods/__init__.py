@@ -9,6 +9,7 @@ from .default_moment_sets import mrt_orthogonal_modes_literature, cascaded_momen
 
 from .abstractlbmethod import LbmCollisionRule, AbstractLbMethod, RelaxationInfo
 from .conservedquantitycomputation import AbstractConservedQuantityComputation, DensityVelocityComputation
+from .numeric_evaluation import NumericCollisionOperator, max_collision_rule_deviation, collision_rules_equivalent
 
 
 __all__ = ['CollisionSpaceInfo', 'RelaxationInfo', 
@@ -20,4 +21,5 @@ __all__ = ['CollisionSpaceInfo', 'RelaxationInfo',
            'create_from_equilibrium',
            'mrt_orthogonal_modes_literature', 'cascaded_moment_sets_literature',
            'create_cumulant', 'create_with_default_polynomial_cumulants',
-           'create_with_monomial_cumulants']
+           'create_with_monomial_cumulants',
+           'NumericCollisionOperator', 'max_collision_rule_deviation', 'collision_rules_equivalent']
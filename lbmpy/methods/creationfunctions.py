@@ -1,6 +1,6 @@
 from warnings import warn
 from dataclasses import dataclass
-from typing import Type
+from typing import Type, Union
 
 import itertools
 import operator
@@ -54,12 +54,15 @@ class CollisionSpaceInfo:
     :class:`lbmpy.moment_transforms.PdfsToMomentsByChimeraTransform`
     if `CollisionSpace.RAW_MOMENTS` is given, or `None` otherwise.
     """
-    central_moment_transform_class: Type[AbstractCentralMomentTransform] = None
+    central_moment_transform_class: Union[Type[AbstractCentralMomentTransform], str] = None
     """
     Python class that determines how PDFs are transformed to central moment space. If left as 'None', this parameter
     will be inferred from `collision_space`, defaulting to 
     :class:`lbmpy.moment_transforms.BinomialChimeraTransform`
     if `CollisionSpace.CENTRAL_MOMENTS` or `CollisionSpace.CUMULANTS` is given, or `None` otherwise.
+    If set to ``'auto'``, the transform with the fewest operations is selected when the collision rule is derived,
+    see :func:`lbmpy.moment_transforms.select_central_moment_transform`. The decision is cached per stencil,
+    moment set, compressibility and force model.
     """
     cumulant_transform_class: Type[AbstractMomentTransform] = None
     """
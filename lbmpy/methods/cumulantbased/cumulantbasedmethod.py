@@ -10,12 +10,13 @@ from pystencils.simp import apply_to_all_assignments
 from lbmpy.methods.abstractlbmethod import AbstractLbMethod, LbmCollisionRule, RelaxationInfo
 from lbmpy.methods.conservedquantitycomputation import AbstractConservedQuantityComputation
 
-from lbmpy.moments import moment_matrix, MOMENT_SYMBOLS, statistical_quantity_symbol
+from lbmpy.moments import (
+    inverse_moment_matrix, MOMENT_SYMBOLS, sparse_matrix_vector_product, sparse_rows, statistical_quantity_symbol)
 
 from lbmpy.moment_transforms import (
     PRE_COLLISION_MONOMIAL_CENTRAL_MOMENT, POST_COLLISION_MONOMIAL_CENTRAL_MOMENT,
     CentralMomentsToCumulantsByGeneratingFunc,
-    BinomialChimeraTransform)
+    BinomialChimeraTransform, cheapest_central_moment_transform_equations)
 
 
 class CumulantBasedLbMethod(AbstractLbMethod):
@@ -41,7 +42,9 @@ class CumulantBasedLbMethod(AbstractLbMethod):
         zero_centered: Determines the PDF storage format, regular or centered around the equilibrium's
                        background distribution.
         central_moment_transform_class: transformation class to transform PDFs to central moment space (subclass of 
-                                        :class:`lbmpy.moment_transforms.AbstractCentralMomentTransform`)
+                                        :class:`lbmpy.moment_transforms.AbstractCentralMomentTransform`), or
+                                        ``'auto'`` to select the transform with the fewest operations (see
+                                        :func:`lbmpy.moment_transforms.select_central_moment_transform`)
         cumulant_transform_class: transform class to get from the central moment space to the cumulant space
     """
 
@@ -93,9 +96,15 @@ class CumulantBasedLbMethod(AbstractLbMethod):
     @property
     def central_moment_transform_class(self):
         """The transform class (subclass of :class:`lbmpy.moment_transforms.AbstractCentralMomentTransform` defining the
-        transformation of populations to central moment space."""
+        transformation of populations to central moment space, or ``'auto'``."""
         return self._central_moment_transform_class
 
+    def _transform_selection_key(self, pre_simplification):
+        """Identifies the choice of the central moment transform for ``central_moment_transform_class='auto'``"""
+        force_model = None if self._force_model is None else type(self._force_model).__name__
+        return (type(self).__name__, self.stencil, tuple(self._relaxation_dict.keys()), self._cqc.compressible,
+                self._zero_centered, force_model, pre_simplification)
+
     @property
     def cumulant_transform_class(self):
         """The transform class defining the transform from central moment to cumulant space."""
@@ -284,7 +293,7 @@ class CumulantBasedLbMethod(AbstractLbMethod):
         else:
             #   or, if those are not available, by moment matching.
             moments = self.cumulants
-            mm_inv = moment_matrix(moments, self.stencil).inv()
+            mm_inv = inverse_moment_matrix(moments, self.stencil)
             bg_moments = bg.moments(moments)
             weights = (mm_inv * sp.Matrix(bg_moments)).expand()
 
@@ -348,12 +357,23 @@ class CumulantBasedLbMethod(AbstractLbMethod):
         C_post = k_to_c_transform.post_collision_symbols
         central_moments = k_to_c_transform.required_central_moments
 
-        #   2) Get Forward Transformation from PDFs to central moments
-        pdfs_to_k_transform = self._central_moment_transform_class(
-            stencil, None, density, velocity, moment_exponents=central_moments, conserved_quantity_equations=cqe,
-            background_distribution=background_distribution)
-        pdfs_to_k_eqs = pdfs_to_k_transform.forward_transform(
-            f, simplification=pre_simplification, return_monomials=True)
+        #   2) Get Forward and Backward Transformations between PDFs and central moments
+        transform_class = self._central_moment_transform_class
+        post_collision_values = self.post_collision_pdf_symbols
+        if transform_class == 'auto':
+            pdfs_to_k_transform, pdfs_to_k_eqs, k_post_to_pdfs_eqs = cheapest_central_moment_transform_equations(
+                stencil, None, density, velocity, f, post_collision_values,
+                moment_exponents=central_moments, conserved_quantity_equations=cqe,
+                background_distribution=background_distribution, monomials=True, simplification=pre_simplification,
+                selection_key=self._transform_selection_key(pre_simplification))
+        else:
+            pdfs_to_k_transform = transform_class(
+                stencil, None, density, velocity, moment_exponents=central_moments, conserved_quantity_equations=cqe,
+                background_distribution=background_distribution)
+            pdfs_to_k_eqs = pdfs_to_k_transform.forward_transform(
+                f, simplification=pre_simplification, return_monomials=True)
+            k_post_to_pdfs_eqs = pdfs_to_k_transform.backward_transform(
+                post_collision_values, simplification=pre_simplification, start_from_monomials=True)
 
         #   3) Symmetric forcing
         if include_force_terms:
@@ -374,16 +394,11 @@ class CumulantBasedLbMethod(AbstractLbMethod):
         C_eq = sp.Matrix(self.cumulant_equilibrium_values)
 
         C_pre_vec = sp.Matrix(C_pre)
-        collision_rule = C_pre_vec + d @ (C_eq - C_pre_vec)
+        collision_rule = C_pre_vec + sp.Matrix(sparse_matrix_vector_product(sparse_rows(d), C_eq - C_pre_vec))
         cumulant_collision_eqs = [Assignment(lhs, rhs) for lhs, rhs in zip(C_post, collision_rule)]
         cumulant_collision_eqs = AssignmentCollection(cumulant_collision_eqs)
 
-        #   5) Get backward transformation from central moments to PDFs
-        d = self.post_collision_pdf_symbols
-        k_post_to_pdfs_eqs = pdfs_to_k_transform.backward_transform(
-            d, simplification=pre_simplification, start_from_monomials=True)
-
-        #   6) That's all. Now, put it all together.
+        #   5) That's all. Now, put it all together.
         all_acs = [] if pdfs_to_k_transform.absorbs_conserved_quantity_equations else [cqe]
         subexpressions_relaxation_rates = AssignmentCollection(subexpressions_relaxation_rates)
         all_acs += [subexpressions_relaxation_rates, forcing_subexpressions, pdfs_to_k_eqs, k_to_c_eqs,
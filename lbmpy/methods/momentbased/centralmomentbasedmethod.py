@@ -8,9 +8,10 @@ from pystencils.simp import apply_to_all_assignments
 
 from lbmpy.methods.abstractlbmethod import AbstractLbMethod, LbmCollisionRule, RelaxationInfo
 from lbmpy.methods.conservedquantitycomputation import AbstractConservedQuantityComputation
-from lbmpy.moment_transforms import BinomialChimeraTransform
+from lbmpy.moment_transforms import BinomialChimeraTransform, cheapest_central_moment_transform_equations
 
-from lbmpy.moments import MOMENT_SYMBOLS, moment_matrix, set_up_shift_matrix
+from lbmpy.moments import (
+    MOMENT_SYMBOLS, inverse_moment_matrix, moment_matrix, set_up_shift_matrix, sparse_matrix_vector_product)
 
 
 def relax_central_moments(pre_collision_symbols, post_collision_symbols,
@@ -18,8 +19,10 @@ def relax_central_moments(pre_collision_symbols, post_collision_symbols,
                           force_terms):
     equilibrium_vec = sp.Matrix(equilibrium_values)
     moment_vec = sp.Matrix(pre_collision_symbols)
-    relaxation_matrix = sp.diag(*relaxation_rates)
-    moment_vec = moment_vec + relaxation_matrix * (equilibrium_vec - moment_vec) + force_terms
+    #   the diagonal relaxation matrix as sparse rows, skipping conserved moments with a zero relaxation rate
+    relaxation_rows = [{i: rate} if rate != 0 else dict() for i, rate in enumerate(relaxation_rates)]
+    relaxation = sparse_matrix_vector_product(relaxation_rows, equilibrium_vec - moment_vec)
+    moment_vec = moment_vec + sp.Matrix(relaxation) + force_terms
     main_assignments = [Assignment(s, eq) for s, eq in zip(post_collision_symbols, moment_vec)]
 
     return AssignmentCollection(main_assignments)
@@ -50,7 +53,9 @@ class CentralMomentBasedLbMethod(AbstractLbMethod):
         zero_centered: Determines the PDF storage format, regular or centered around the equilibrium's
                        background distribution.
         central_moment_transform_class: transformation class to transform PDFs to central moment space (subclass of 
-                                        :class:`lbmpy.moment_transforms.AbstractCentralMomentTransform`)
+                                        :class:`lbmpy.moment_transforms.AbstractCentralMomentTransform`), or
+                                        ``'auto'`` to select the transform with the fewest operations (see
+                                        :func:`lbmpy.moment_transforms.select_central_moment_transform`)
     """
 
     def __init__(self, stencil, equilibrium, relaxation_dict,
@@ -93,9 +98,15 @@ class CentralMomentBasedLbMethod(AbstractLbMethod):
     @property
     def central_moment_transform_class(self):
         """The transform class (subclass of :class:`lbmpy.moment_transforms.AbstractCentralMomentTransform` defining the
-        transformation of populations to central moment space."""
+        transformation of populations to central moment space, or ``'auto'``."""
         return self._central_moment_transform_class
 
+    def _transform_selection_key(self, pre_simplification):
+        """Identifies the choice of the central moment transform for ``central_moment_transform_class='auto'``"""
+        force_model = None if self._force_model is None else type(self._force_model).__name__
+        return (type(self).__name__, self.stencil, tuple(self._relaxation_dict.keys()), self._cqc.compressible,
+                self._zero_centered, force_model, pre_simplification)
+
     @property
     def moments(self):
         """Central moments relaxed by this method."""
@@ -293,7 +304,7 @@ class CentralMomentBasedLbMethod(AbstractLbMethod):
             weights = bg.discrete_populations
         else:
             #   or, if those are not available, by moment matching.
-            mm_inv = self.moment_matrix.inv()
+            mm_inv = inverse_moment_matrix(self.moments, self.stencil)
             bg_moments = bg.moments(self.moments)
             weights = (mm_inv * sp.Matrix(bg_moments)).expand()
         
@@ -341,11 +352,22 @@ class CentralMomentBasedLbMethod(AbstractLbMethod):
         else:
             background_distribution = None
 
-        #   1) Get Forward Transformation from PDFs to central moments
-        pdfs_to_c_transform = self.central_moment_transform_class(
-            stencil, self.moments, density, velocity, conserved_quantity_equations=cqe,
-            background_distribution=background_distribution)
-        pdfs_to_c_eqs = pdfs_to_c_transform.forward_transform(f, simplification=pre_simplification)
+        #   1) Get Forward and Backward Transformations between PDFs and central moments
+        transform_class = self.central_moment_transform_class
+        post_collision_values = self.post_collision_pdf_symbols
+        if transform_class == 'auto':
+            pdfs_to_c_transform, pdfs_to_c_eqs, c_post_to_pdfs_eqs = cheapest_central_moment_transform_equations(
+                stencil, self.moments, density, velocity, f, post_collision_values,
+                conserved_quantity_equations=cqe, background_distribution=background_distribution,
+                simplification=pre_simplification,
+                selection_key=self._transform_selection_key(pre_simplification))
+        else:
+            pdfs_to_c_transform = transform_class(
+                stencil, self.moments, density, velocity, conserved_quantity_equations=cqe,
+                background_distribution=background_distribution)
+            pdfs_to_c_eqs = pdfs_to_c_transform.forward_transform(f, simplification=pre_simplification)
+            c_post_to_pdfs_eqs = pdfs_to_c_transform.backward_transform(post_collision_values,
+                                                                        simplification=pre_simplification)
 
         #   2) Collision
         k_pre = pdfs_to_c_transform.pre_collision_symbols
@@ -363,12 +385,7 @@ class CentralMomentBasedLbMethod(AbstractLbMethod):
         collision_eqs = relax_central_moments(k_pre, k_post, tuple(relaxation_rates),
                                               tuple(equilibrium_value), force_terms=force_model_terms)
 
-        #   3) Get backward transformation from central moments to PDFs
-        post_collision_values = self.post_collision_pdf_symbols
-        c_post_to_pdfs_eqs = pdfs_to_c_transform.backward_transform(post_collision_values,
-                                                                    simplification=pre_simplification)
-
-        #   4) Now, put it all together.
+        #   3) Now, put it all together.
         all_acs = [] if pdfs_to_c_transform.absorbs_conserved_quantity_equations else [cqe]
         subexpressions_relaxation_rates = AssignmentCollection(subexpressions_relaxation_rates)
         all_acs += [subexpressions_relaxation_rates, forcing_subexpressions, pdfs_to_c_eqs, collision_eqs]
@@ -380,7 +397,7 @@ class CentralMomentBasedLbMethod(AbstractLbMethod):
         simplification_hints.update(self._cqc.defined_symbols())
         simplification_hints['relaxation_rates'] = [rr for rr in self.relaxation_rates]
 
-        #   5) Maybe add forcing terms.
+        #   4) Maybe add forcing terms.
         if include_force_terms and not moment_space_forcing:
             force_model_terms = self._force_model(self)
             force_term_symbols = sp.symbols(f"forceTerm_:{len(force_model_terms)}")
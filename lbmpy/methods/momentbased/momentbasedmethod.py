@@ -6,7 +6,9 @@ import numpy as np
 
 from lbmpy.methods.abstractlbmethod import AbstractLbMethod, LbmCollisionRule, RelaxationInfo
 from lbmpy.methods.conservedquantitycomputation import AbstractConservedQuantityComputation, DensityVelocityComputation
-from lbmpy.moments import MOMENT_SYMBOLS, moment_matrix
+from lbmpy.moments import (
+    MOMENT_SYMBOLS, inverse_moment_matrix, moment_matrix, sparse_inverse_moment_matrix, sparse_matrix_product,
+    sparse_matrix_vector_product, sparse_moment_matrix, sparse_rows)
 from pystencils.sympyextensions import is_constant
 from pystencils import Assignment, AssignmentCollection
 
@@ -291,7 +293,7 @@ class MomentBasedLbMethod(AbstractLbMethod):
             weights = bg.discrete_populations
         else:
             #   or, if those are not available, by moment matching.
-            mm_inv = self.moment_matrix.inv()
+            mm_inv = inverse_moment_matrix(self.moments, self.stencil)
             bg_moments = bg.moments(self.moments)
             weights = (mm_inv * sp.Matrix(bg_moments)).expand()
 
@@ -362,8 +364,9 @@ class MomentBasedLbMethod(AbstractLbMethod):
             m_post_to_f_post_eqs = pdf_to_m_transform.backward_transform(self.post_collision_pdf_symbols,
                                                                          simplification=pre_simplification)
 
+            #   the relaxation is evaluated as sparse linear combinations, skipping the zeros of the relaxation matrix
             m_pre_vec = sp.Matrix(m_pre)
-            collision_rule = m_pre_vec + d * (m_eq - m_pre_vec)
+            collision_rule = m_pre_vec + sp.Matrix(sparse_matrix_vector_product(sparse_rows(d), m_eq - m_pre_vec))
 
             if include_force_terms and moment_space_forcing:
                 collision_rule += self._force_model.moment_space_forcing(self)
@@ -383,8 +386,10 @@ class MomentBasedLbMethod(AbstractLbMethod):
             if self._zero_centered and not self._equilibrium.deviation_only:
                 raise Exception("Can only derive population-space equations for zero-centered storage"
                                 " if delta equilibrium is used.")
-            pdf_to_moment = self.moment_matrix
-            collision_rule = f + pdf_to_moment.inv() * d * (m_eq - pdf_to_moment * f)
+            #   f + M^-1 D (m_eq - M f), with sparse rows of the moment matrix, its exact inverse and D
+            m_pre_vec = sp.Matrix(sparse_matrix_vector_product(sparse_moment_matrix(self.moments, self.stencil), f))
+            relaxation = sparse_matrix_product(sparse_inverse_moment_matrix(self.moments, self.stencil), sparse_rows(d))
+            collision_rule = f + sp.Matrix(sparse_matrix_vector_product(relaxation, m_eq - m_pre_vec))
             collision_eqs = [Assignment(lhs, rhs) for lhs, rhs in zip(self.post_collision_pdf_symbols, collision_rule)]
             subexpressions = list(additional_subexpressions) + forcing_subexpressions + cqe.all_assignments
             main_assignments = collision_eqs
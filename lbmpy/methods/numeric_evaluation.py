@@ -0,0 +1,126 @@
+"""
+Numeric evaluation of collision rules with NumPy, without code generation.
+
+A :class:`NumericCollisionOperator` translates the assignments of a collision rule once into a Python function over
+NumPy arrays and evaluates it for whole batches of population vectors. This allows to check two methods for
+equivalence by comparing their post-collision populations for random samples, instead of simplifying the
+difference of their symbolic update rules:
+
+>>> import sympy as sp
+>>> from lbmpy.methods import create_srt, create_trt
+>>> from lbmpy.stencils import LBStencil
+>>> stencil = LBStencil('D2Q9')
+>>> omega = sp.Symbol('omega')
+>>> srt = create_srt(stencil, omega, compressible=True).get_collision_rule()
+>>> trt = create_trt(stencil, omega, omega, compressible=True).get_collision_rule()
+>>> collision_rules_equivalent(srt, trt)
+True
+"""
+import numpy as np
+import sympy as sp
+
+from lbmpy.maxwellian_equilibrium import get_weights
+
+
+class NumericCollisionOperator:
+    """Collision rule evaluated numerically for batches of population vectors.
+
+    Args:
+        collision_rule: instance of :class:`lbmpy.methods.LbmCollisionRule`, or an assignment collection whose main
+                        assignments compute the post-collision populations
+        pdf_symbols: pre-collision population symbols, defaults to those of the collision rule's method
+        post_collision_pdf_symbols: order of the returned populations, defaults to those of the collision rule's
+                                    method, or to the order of the main assignments if there is no method
+
+    All free symbols of the collision rule other than the populations, e.g. relaxation rates or force components,
+    are parameters of the operator, which are passed by symbol or name on evaluation.
+    """
+
+    def __init__(self, collision_rule, pdf_symbols=None, post_collision_pdf_symbols=None):
+        method = getattr(collision_rule, 'method', None)
+        if pdf_symbols is None:
+            if method is None:
+                raise ValueError("pdf_symbols have to be given for collision rules without method")
+            pdf_symbols = method.pre_collision_pdf_symbols
+        main_assignments = collision_rule.main_assignments_dict
+        if post_collision_pdf_symbols is None:
+            post_collision_pdf_symbols = method.post_collision_pdf_symbols if method is not None \
+                else list(main_assignments.keys())
+
+        self._pdf_symbols = tuple(pdf_symbols)
+        self._parameters = tuple(sorted(collision_rule.free_symbols - set(self._pdf_symbols), key=lambda s: s.name))
+
+        #   lambdify prints the left-hand sides of subexpressions as variable names, hence all symbols are renamed
+        symbols = set(self._pdf_symbols) | set(self._parameters) | set(collision_rule.bound_symbols)
+        renaming = {s: sp.Symbol(f"v_{i}") for i, s in enumerate(sorted(symbols, key=lambda s: (s.name, str(s))))}
+        subexpressions = [(renaming[a.lhs], a.rhs.xreplace(renaming)) for a in collision_rule.subexpressions]
+        outputs = [main_assignments[s].xreplace(renaming) for s in post_collision_pdf_symbols]
+        arguments = [renaming[s] for s in self._pdf_symbols + self._parameters]
+        self._function = sp.lambdify(arguments, outputs, modules='numpy',
+                                     cse=lambda expressions: (subexpressions, expressions))
+
+    @property
+    def pdf_symbols(self):
+        """Pre-collision population symbols, in the order of the last axis of the population arrays"""
+        return self._pdf_symbols
+
+    @property
+    def parameters(self):
+        """Free symbols of the collision rule, other than the populations, sorted by name"""
+        return self._parameters
+
+    def __call__(self, pdfs, parameters=None):
+        """Returns the post-collision populations for an array of pre-collision populations.
+
+        Args:
+            pdfs: array of shape (..., Q)
+            parameters: dict mapping each parameter, as symbol or name, to a scalar or an array broadcastable to the
+                        batch shape (...)
+
+        Returns:
+            array of the same shape as `pdfs`
+        """
+        pdfs = np.asarray(pdfs, dtype=np.float64)
+        if pdfs.shape[-1] != len(self._pdf_symbols):
+            raise ValueError(f"Last axis of pdfs has to be of length {len(self._pdf_symbols)}")
+        values = {str(k) if isinstance(k, sp.Symbol) else k: v for k, v in (parameters or dict()).items()}
+        missing = [s.name for s in self._parameters if s.name not in values]
+        if missing:
+            raise ValueError(f"Missing values for parameters {missing}")
+
+        results = self._function(*(pdfs[..., i] for i in range(pdfs.shape[-1])),
+                                 *(values[s.name] for s in self._parameters))
+        return np.stack([np.broadcast_to(r, pdfs.shape[:-1]).astype(np.float64) for r in results], axis=-1)
+
+
+def max_collision_rule_deviation(reference, other, samples=64, parameters=None, pdfs=None, seed=0):
+    """Largest absolute difference of the post-collision populations of two collision rules for random samples.
+
+    Args:
+        reference, other: collision rules of methods on the same stencil
+        samples: number of random population vectors, which deviate by up to 10% from the lattice weights
+        parameters: dict of fixed parameter values, by symbol or name. The remaining parameters of both rules are
+                    drawn per sample from (0.5, 1.9), such that a shared relaxation rate gets the same value.
+        pdfs: array of shape (samples, Q) used instead of random population vectors
+        seed: seed of the random number generator
+    """
+    operators = [NumericCollisionOperator(reference), NumericCollisionOperator(other)]
+    rng = np.random.default_rng(seed)
+    if pdfs is None:
+        weights = np.array([float(w) for w in get_weights(reference.method.stencil)])
+        pdfs = weights * (1 + 0.1 * rng.uniform(-1, 1, size=(samples, len(weights))))
+    pdfs = np.asarray(pdfs, dtype=np.float64)
+
+    values = {str(k) if isinstance(k, sp.Symbol) else k: v for k, v in (parameters or dict()).items()}
+    names = sorted({s.name for op in operators for s in op.parameters} - set(values))
+    values.update({name: rng.uniform(0.5, 1.9, size=pdfs.shape[:-1]) for name in names})
+
+    return float(np.max(np.abs(operators[0](pdfs, values) - operators[1](pdfs, values))))
+
+
+def collision_rules_equivalent(reference, other, atol=1e-10, **kwargs):
+    """Checks if two collision rules yield the same post-collision populations for random samples.
+
+    Keyword arguments are passed to :func:`max_collision_rule_deviation`.
+    """
+    return max_collision_rule_deviation(reference, other, **kwargs) <= atol
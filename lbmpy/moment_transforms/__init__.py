@@ -22,6 +22,8 @@ from .centralmomenttransforms import (
 
 from .cumulanttransforms import CentralMomentsToCumulantsByGeneratingFunc
 
+from .selection import select_central_moment_transform, cheapest_central_moment_transform_equations
+
 __all__ = [
     "AbstractMomentTransform",
     "PdfsToMomentsByMatrixTransform", "PdfsToMomentsByChimeraTransform",
@@ -30,6 +32,7 @@ __all__ = [
     "PdfsToCentralMomentsByShiftMatrix",
     "FastCentralMomentTransform",
     "CentralMomentsToCumulantsByGeneratingFunc",
+    "select_central_moment_transform", "cheapest_central_moment_transform_equations",
     "PRE_COLLISION_MONOMIAL_RAW_MOMENT", "POST_COLLISION_MONOMIAL_RAW_MOMENT",
     "PRE_COLLISION_RAW_MOMENT", "POST_COLLISION_RAW_MOMENT",
     "PRE_COLLISION_MONOMIAL_CENTRAL_MOMENT", "POST_COLLISION_MONOMIAL_CENTRAL_MOMENT",
@@ -11,7 +11,9 @@ from lbmpy.moments import (
     moment_matrix, monomial_to_polynomial_transformation_matrix,
     set_up_shift_matrix, contained_moments, moments_up_to_order,
     moments_of_order,
-    central_moment_reduced_monomial_to_polynomial_matrix)
+    central_moment_reduced_monomial_to_polynomial_matrix, matrix_from_sparse_rows,
+    sparse_inverse_moment_matrix, sparse_matrix_product, sparse_matrix_vector_product, sparse_moment_matrix,
+    sparse_rows)
 
 from lbmpy.moments import statistical_quantity_symbol as sq_sym
 
@@ -22,6 +24,7 @@ from .abstractmomenttransform import (
 )
 
 from .rawmomenttransforms import PdfsToMomentsByChimeraTransform
+from .templates import transform_template
 
 
 class AbstractCentralMomentTransform(AbstractMomentTransform):
@@ -46,7 +49,8 @@ class AbstractCentralMomentTransform(AbstractMomentTransform):
             **kwargs
         )
 
-        assert len(self.moment_polynomials) == self.q, 'Number of moments must match stencil'
+        if len(self.moment_polynomials) != self.q:
+            raise ValueError('Number of moments must match stencil')
 
     def _cm_background_shift(self, central_moments):
         if self.background_distribution is not None:
@@ -67,11 +71,15 @@ class PdfsToCentralMomentsByMatrix(AbstractCentralMomentTransform):
         super(PdfsToCentralMomentsByMatrix, self).__init__(
             stencil, moment_polynomials, equilibrium_density, equilibrium_velocity, **kwargs)
 
-        moment_matrix_without_shift = moment_matrix(self.moment_polynomials, self.stencil)
         shift_matrix = set_up_shift_matrix(self.moment_polynomials, self.stencil, equilibrium_velocity)
 
-        self.forward_matrix = shift_matrix * moment_matrix_without_shift
-        self.backward_matrix = moment_matrix_without_shift.inv() * shift_matrix.inv()
+        #   products of the sparse moment matrices with the lower triangular shift matrices
+        self._forward_rows = sparse_matrix_product(sparse_rows(shift_matrix),
+                                                   sparse_moment_matrix(self.moment_polynomials, self.stencil))
+        self._backward_rows = sparse_matrix_product(sparse_inverse_moment_matrix(self.moment_polynomials, self.stencil),
+                                                    sparse_rows(shift_matrix.inv()))
+        self.forward_matrix = matrix_from_sparse_rows(self._forward_rows, self.q)
+        self.backward_matrix = matrix_from_sparse_rows(self._backward_rows, self.q)
 
     def forward_transform(self, pdf_symbols, simplification=True, subexpression_base='sub_f_to_k',
                           return_monomials=False):
@@ -92,17 +100,19 @@ class PdfsToCentralMomentsByMatrix(AbstractCentralMomentTransform):
         simplification = self._get_simp_strategy(simplification)
 
         if return_monomials:
-            assert len(self.moment_exponents) == self.q, "Could not derive invertible monomial transform." \
-                f"Expected {self.q} monomials, but got {len(self.moment_exponents)}."
-            km = moment_matrix(self.moment_exponents, self.stencil, shift_velocity=self.equilibrium_velocity)
+            if len(self.moment_exponents) != self.q:
+                raise ValueError("Could not derive invertible monomial transform."
+                                 f"Expected {self.q} monomials, but got {len(self.moment_exponents)}.")
+            km = sparse_rows(moment_matrix(self.moment_exponents, self.stencil,
+                                           shift_velocity=self.equilibrium_velocity))
             background_shift = self._cm_background_shift(self.moment_exponents)
             pre_collision_moments = self.pre_collision_monomial_symbols
         else:
-            km = self.forward_matrix
+            km = self._forward_rows
             background_shift = self._cm_background_shift(self.moment_polynomials)
             pre_collision_moments = self.pre_collision_symbols
 
-        f_to_k_vec = km * sp.Matrix(pdf_symbols) + background_shift
+        f_to_k_vec = sp.Matrix(sparse_matrix_vector_product(km, pdf_symbols)) + background_shift
         main_assignments = [Assignment(k, eq) for k, eq in zip(pre_collision_moments, f_to_k_vec)]
 
         symbol_gen = SymbolGen(subexpression_base)
@@ -131,15 +141,16 @@ class PdfsToCentralMomentsByMatrix(AbstractCentralMomentTransform):
         simplification = self._get_simp_strategy(simplification)
 
         if start_from_monomials:
-            assert len(self.moment_exponents) == self.q, "Could not derive invertible monomial transform." \
-                f"Expected {self.q} monomials, but got {len(self.moment_exponents)}."
-            mm_inv = moment_matrix(self.moment_exponents, self.stencil).inv()
+            if len(self.moment_exponents) != self.q:
+                raise ValueError("Could not derive invertible monomial transform."
+                                 f"Expected {self.q} monomials, but got {len(self.moment_exponents)}.")
             shift_inv = set_up_shift_matrix(self.moment_exponents, self.stencil, self.equilibrium_velocity).inv()
-            km_inv = mm_inv * shift_inv
+            km_inv = sparse_matrix_product(sparse_inverse_moment_matrix(self.moment_exponents, self.stencil),
+                                           sparse_rows(shift_inv))
             background_shift = self._cm_background_shift(self.moment_exponents)
             post_collision_moments = self.post_collision_monomial_symbols
         else:
-            km_inv = self.backward_matrix
+            km_inv = self._backward_rows
             background_shift = self._cm_background_shift(self.moment_polynomials)
             post_collision_moments = self.post_collision_symbols
 
@@ -148,7 +159,7 @@ class PdfsToCentralMomentsByMatrix(AbstractCentralMomentTransform):
         subexpressions = [Assignment(xi, m - s)
                           for xi, m, s in zip(symbol_gen, post_collision_moments, background_shift)]
 
-        m_to_f_vec = km_inv * sp.Matrix([s.lhs for s in subexpressions])
+        m_to_f_vec = sparse_matrix_vector_product(km_inv, [s.lhs for s in subexpressions])
         main_assignments = [Assignment(f, eq) for f, eq in zip(pdf_symbols, m_to_f_vec)]
 
         ac = AssignmentCollection(main_assignments, subexpressions=subexpressions,
@@ -203,6 +214,7 @@ class BinomialChimeraTransform(AbstractCentralMomentTransform):
     def absorbs_conserved_quantity_equations(self):
         return True
 
+    @transform_template
     def forward_transform(self, pdf_symbols, simplification=True, subexpression_base='sub_f_to_k',
                           return_monomials=False):
         r"""Returns equations for polynomial central moments, computed from pre-collision populations
@@ -312,6 +324,7 @@ class BinomialChimeraTransform(AbstractCentralMomentTransform):
             ac = simplification.apply(ac)
         return ac
 
+    @transform_template
     def backward_transform(self, pdf_symbols, simplification=True, subexpression_base='sub_k_to_f',
                            start_from_monomials=False):
         r"""Returns an assignment collection containing equations for post-collision populations, 
@@ -519,6 +532,7 @@ class FastCentralMomentTransform(AbstractCentralMomentTransform):
         shift_matrix = set_up_shift_matrix(self.moment_exponents, self.stencil, equilibrium_velocity)
         self.inv_monomial_matrix = moment_matrix_without_shift.inv() * shift_matrix.inv()
 
+    @transform_template
     def forward_transform(self, pdf_symbols, simplification=True, subexpression_base='sub_f_to_k',
                           return_monomials=False):
         r"""Returns an assignment collection containing equations for pre-collision polynomial
@@ -608,6 +622,7 @@ class FastCentralMomentTransform(AbstractCentralMomentTransform):
             ac = simplification.apply(ac)
         return ac
 
+    @transform_template
     def backward_transform(self, pdf_symbols, simplification=True, subexpression_base='sub_k_to_f',
                            start_from_monomials=False):
         r"""Returns an assignment collection containing equations for post-collision populations, 
@@ -18,6 +18,7 @@ from .abstractmomenttransform import (
     PRE_COLLISION_CUMULANT, POST_COLLISION_CUMULANT,
     PRE_COLLISION_MONOMIAL_CUMULANT, POST_COLLISION_MONOMIAL_CUMULANT
 )
+from .templates import transform_template
 
 #   ======================= Central Moments <-> Cumulants ==============================================================
 
@@ -100,6 +101,7 @@ class CentralMomentsToCumulantsByGeneratingFunc(AbstractMomentTransform):
 
         return sorted(list(required_moments), key=exponent_tuple_sort_key)
 
+    @transform_template
     def forward_transform(self,
                           central_moment_base=PRE_COLLISION_MONOMIAL_CENTRAL_MOMENT,
                           simplification=True,
@@ -128,6 +130,7 @@ class CentralMomentsToCumulantsByGeneratingFunc(AbstractMomentTransform):
             ac = simplification.apply(ac)
         return ac
 
+    @transform_template
     def backward_transform(self,
                            central_moment_base=POST_COLLISION_MONOMIAL_CENTRAL_MOMENT,
                            simplification=True,
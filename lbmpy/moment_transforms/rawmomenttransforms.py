@@ -8,7 +8,9 @@ from pystencils.simp import (
 from pystencils.simp.assignment_collection import SymbolGen
 
 from lbmpy.moments import (
-    moment_matrix, monomial_to_polynomial_transformation_matrix, non_aliased_polynomial_raw_moments)
+    inverse_moment_matrix, moment_matrix, monomial_to_polynomial_transformation_matrix,
+    non_aliased_polynomial_raw_moments, sparse_inverse_moment_matrix, sparse_matrix_vector_product,
+    sparse_moment_matrix, sparse_rows)
 from lbmpy.moments import statistical_quantity_symbol as sq_sym
 
 from .abstractmomenttransform import (
@@ -16,6 +18,7 @@ from .abstractmomenttransform import (
     PRE_COLLISION_RAW_MOMENT, POST_COLLISION_RAW_MOMENT,
     PRE_COLLISION_MONOMIAL_RAW_MOMENT, POST_COLLISION_MONOMIAL_RAW_MOMENT
 )
+from .templates import transform_template
 
 
 class AbstractRawMomentTransform(AbstractMomentTransform):
@@ -65,7 +68,7 @@ class PdfsToMomentsByMatrixTransform(AbstractRawMomentTransform):
             conserved_quantity_equations=conserved_quantity_equations, **kwargs)
 
         self.moment_matrix = moment_matrix(self.moment_polynomials, stencil)
-        self.inv_moment_matrix = self.moment_matrix.inv()
+        self.inv_moment_matrix = inverse_moment_matrix(self.moment_polynomials, stencil)
 
     @property
     def absorbs_conserved_quantity_equations(self):
@@ -92,15 +95,15 @@ class PdfsToMomentsByMatrixTransform(AbstractRawMomentTransform):
         if return_monomials:
             assert len(self.moment_exponents) == self.q, "Could not derive invertible monomial transform." \
                 f"Expected {self.q} monomials, but got {len(self.moment_exponents)}."
-            mm = moment_matrix(self.moment_exponents, self.stencil)
+            mm = sparse_moment_matrix(self.moment_exponents, self.stencil)
             background_shift = self._rm_background_shift(self.moment_exponents)
             pre_collision_moments = self.pre_collision_monomial_symbols
         else:
-            mm = self.moment_matrix
+            mm = sparse_rows(self.moment_matrix)
             background_shift = self._rm_background_shift(self.moment_polynomials)
             pre_collision_moments = self.pre_collision_symbols
 
-        f_to_m_vec = mm * sp.Matrix(pdf_symbols) + background_shift
+        f_to_m_vec = sp.Matrix(sparse_matrix_vector_product(mm, pdf_symbols)) + background_shift
         main_assignments = [Assignment(m, eq) for m, eq in zip(pre_collision_moments, f_to_m_vec)]
 
         symbol_gen = SymbolGen(symbol=subexpression_base)
@@ -145,11 +148,11 @@ class PdfsToMomentsByMatrixTransform(AbstractRawMomentTransform):
         if start_from_monomials:
             assert len(self.moment_exponents) == self.q, "Could not derive invertible monomial transform." \
                 f"Expected {self.q} monomials, but got {len(self.moment_exponents)}."
-            mm_inv = moment_matrix(self.moment_exponents, self.stencil).inv()
+            mm_inv = sparse_inverse_moment_matrix(self.moment_exponents, self.stencil)
             background_shift = self._rm_background_shift(self.moment_exponents)
             post_collision_moments = self.post_collision_monomial_symbols
         else:
-            mm_inv = self.inv_moment_matrix
+            mm_inv = sparse_rows(self.inv_moment_matrix)
             background_shift = self._rm_background_shift(self.moment_polynomials)
             post_collision_moments = self.post_collision_symbols
 
@@ -158,7 +161,7 @@ class PdfsToMomentsByMatrixTransform(AbstractRawMomentTransform):
         subexpressions = [Assignment(xi, m - s)
                           for xi, m, s in zip(symbol_gen, post_collision_moments, background_shift)]
 
-        m_to_f_vec = mm_inv * sp.Matrix([s.lhs for s in subexpressions])
+        m_to_f_vec = sparse_matrix_vector_product(mm_inv, [s.lhs for s in subexpressions])
         main_assignments = [Assignment(f, eq) for f, eq in zip(pdf_symbols, m_to_f_vec)]
 
         ac = AssignmentCollection(main_assignments, subexpressions=subexpressions,
@@ -213,7 +216,7 @@ class PdfsToMomentsByChimeraTransform(AbstractRawMomentTransform):
             stencil, moment_polynomials, equilibrium_density, equilibrium_velocity,
             conserved_quantity_equations=conserved_quantity_equations, **kwargs)
 
-        self.inv_moment_matrix = moment_matrix(self.moment_exponents, self.stencil).inv()
+        self.inv_moment_matrix = inverse_moment_matrix(self.moment_exponents, self.stencil)
         self.mono_to_poly_matrix = monomial_to_polynomial_transformation_matrix(self.moment_exponents,
                                                                                 self.moment_polynomials)
         self.poly_to_mono_matrix = self.mono_to_poly_matrix.inv()
@@ -239,6 +242,7 @@ class PdfsToMomentsByChimeraTransform(AbstractRawMomentTransform):
                     (1 if i == d else 0) for i in range(self.dim)))
         return cq_symbols_to_moments
 
+    @transform_template
     def forward_transform(self, pdf_symbols, simplification=True,
                           subexpression_base='sub_f_to_m',
                           return_monomials=False):
@@ -342,6 +346,7 @@ class PdfsToMomentsByChimeraTransform(AbstractRawMomentTransform):
             ac = simplification.apply(ac)
         return ac
 
+    @transform_template
     def backward_transform(self, pdf_symbols, simplification=True,
                            subexpression_base='sub_k_to_f',
                            start_from_monomials=False):
@@ -0,0 +1,126 @@
+"""
+Selection of the cheapest transform between populations and central moments.
+
+Which of the central moment transforms yields the fewest operations depends on the stencil, the moment set and the
+conserved quantity equations. :func:`select_central_moment_transform` derives the forward and backward equations with
+every candidate, counts their operations and returns the cheapest class. The decision is stored in the tiered cache of
+:mod:`lbmpy.cache` under a selection key given by the caller, such that it is derived only once per key.
+"""
+from pystencils.simp import SimplificationStrategy
+
+from lbmpy.cache import tiered_cache
+
+from .centralmomenttransforms import (
+    PdfsToCentralMomentsByMatrix, BinomialChimeraTransform, FastCentralMomentTransform,
+    PdfsToCentralMomentsByShiftMatrix
+)
+
+CENTRAL_MOMENT_TRANSFORM_CANDIDATES = (PdfsToCentralMomentsByMatrix, BinomialChimeraTransform,
+                                       FastCentralMomentTransform, PdfsToCentralMomentsByShiftMatrix)
+
+
+def select_central_moment_transform(stencil, moment_polynomials, equilibrium_density, equilibrium_velocity,
+                                    pdf_symbols, post_collision_pdf_symbols,
+                                    moment_exponents=None, conserved_quantity_equations=None,
+                                    background_distribution=None, monomials=False, simplification=True,
+                                    selection_key=None):
+    """Returns the class of :data:`CENTRAL_MOMENT_TRANSFORM_CANDIDATES` with the fewest operations.
+
+    The operations of the forward and backward equations are counted by
+    :attr:`pystencils.AssignmentCollection.operation_count`, including the conserved quantity equations for
+    transforms that do not absorb them. Candidates that cannot handle the given moments are skipped.
+
+    Args:
+        stencil, moment_polynomials, equilibrium_density, equilibrium_velocity, moment_exponents,
+        conserved_quantity_equations, background_distribution: passed to the constructor of the candidates
+        pdf_symbols: pre-collision populations passed to ``forward_transform``
+        post_collision_pdf_symbols: post-collision populations passed to ``backward_transform``
+        monomials: if True, the equations are derived with ``return_monomials`` and ``start_from_monomials``
+        simplification: simplification passed to both transforms
+        selection_key: canonically serializable object (see :func:`lbmpy.cache.canonical_serialization`)
+                       identifying the decision, which is then cached in memory and on disk.
+                       If None, the decision is derived on every call.
+    """
+    if isinstance(simplification, SimplificationStrategy):
+        selection_key = None
+    name = _cheapest_central_moment_transform(stencil, moment_polynomials, equilibrium_density,
+                                              equilibrium_velocity, pdf_symbols, post_collision_pdf_symbols,
+                                              moment_exponents, conserved_quantity_equations,
+                                              background_distribution, monomials, simplification,
+                                              selection_key=selection_key)
+    return {c.__name__: c for c in CENTRAL_MOMENT_TRANSFORM_CANDIDATES}[name]
+
+
+def cheapest_central_moment_transform_equations(stencil, moment_polynomials, equilibrium_density,
+                                                equilibrium_velocity, pdf_symbols, post_collision_pdf_symbols,
+                                                moment_exponents=None, conserved_quantity_equations=None,
+                                                background_distribution=None, monomials=False,
+                                                simplification=True, selection_key=None):
+    """Like :func:`select_central_moment_transform`, but returns an instance of the cheapest transform together
+    with its forward and backward equations. If the decision is not cached yet, the equations derived while
+    comparing the candidates are returned instead of deriving them again."""
+    if isinstance(simplification, SimplificationStrategy):
+        selection_key = None
+    derived = dict()
+    name = _cheapest_central_moment_transform(stencil, moment_polynomials, equilibrium_density,
+                                              equilibrium_velocity, pdf_symbols, post_collision_pdf_symbols,
+                                              moment_exponents, conserved_quantity_equations,
+                                              background_distribution, monomials, simplification,
+                                              selection_key=selection_key, derived=derived)
+    if name in derived:
+        return derived[name]
+    transform_class = {c.__name__: c for c in CENTRAL_MOMENT_TRANSFORM_CANDIDATES}[name]
+    return _derive_equations(transform_class, stencil, moment_polynomials, equilibrium_density,
+                             equilibrium_velocity, pdf_symbols, post_collision_pdf_symbols, moment_exponents,
+                             conserved_quantity_equations, background_distribution, monomials, simplification)
+
+
+def _selection_key(*args, selection_key=None, derived=None):
+    if selection_key is None:
+        return None
+    return ('central_moment_transform', tuple(c.__name__ for c in CENTRAL_MOMENT_TRANSFORM_CANDIDATES), selection_key)
+
+
+@tiered_cache(key=_selection_key)
+def _cheapest_central_moment_transform(stencil, moment_polynomials, equilibrium_density, equilibrium_velocity,
+                                       pdf_symbols, post_collision_pdf_symbols, moment_exponents,
+                                       conserved_quantity_equations, background_distribution, monomials,
+                                       simplification, selection_key=None, derived=None):
+    """Name of the cheapest candidate. If the function body runs, i.e. the decision was not cached, the dictionary
+    `derived` receives the transform and equations of the cheapest candidate under its name."""
+    candidates = dict()
+    operation_counts = dict()
+    for transform_class in CENTRAL_MOMENT_TRANSFORM_CANDIDATES:
+        try:
+            transform, forward, backward = _derive_equations(
+                transform_class, stencil, moment_polynomials, equilibrium_density, equilibrium_velocity,
+                pdf_symbols, post_collision_pdf_symbols, moment_exponents, conserved_quantity_equations,
+                background_distribution, monomials, simplification)
+        except (ValueError, NotImplementedError):
+            continue
+
+        equations = [forward, backward]
+        if conserved_quantity_equations is not None and not transform.absorbs_conserved_quantity_equations:
+            equations.append(conserved_quantity_equations)
+        candidates[transform_class.__name__] = (transform, forward, backward)
+        operation_counts[transform_class.__name__] = sum(sum(ac.operation_count.values()) for ac in equations)
+
+    if not operation_counts:
+        raise ValueError("None of the central moment transforms can handle the given moments.")
+    name = min(operation_counts, key=operation_counts.get)
+    if derived is not None:
+        derived[name] = candidates[name]
+    return name
+
+
+def _derive_equations(transform_class, stencil, moment_polynomials, equilibrium_density, equilibrium_velocity,
+                      pdf_symbols, post_collision_pdf_symbols, moment_exponents, conserved_quantity_equations,
+                      background_distribution, monomials, simplification):
+    transform = transform_class(stencil, moment_polynomials, equilibrium_density, equilibrium_velocity,
+                                moment_exponents=moment_exponents,
+                                conserved_quantity_equations=conserved_quantity_equations,
+                                background_distribution=background_distribution)
+    forward = transform.forward_transform(pdf_symbols, simplification=simplification, return_monomials=monomials)
+    backward = transform.backward_transform(post_collision_pdf_symbols, simplification=simplification,
+                                            start_from_monomials=monomials)
+    return transform, forward, backward
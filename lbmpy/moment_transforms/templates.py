@@ -0,0 +1,243 @@
+"""
+Precomputed equations of the moment transforms for the standard stencils and moment sets.
+
+The equations returned by ``forward_transform`` and ``backward_transform`` of :class:`FastCentralMomentTransform`,
+:class:`BinomialChimeraTransform`, :class:`PdfsToMomentsByChimeraTransform` and
+:class:`CentralMomentsToCumulantsByGeneratingFunc` only depend on the stencil, the moment set, the symbols and the
+arguments of the call. For the methods created by :func:`generate_templates`, i.e. D2Q9, D3Q19 and D3Q27 with the
+default moment sets, the equations are shipped with lbmpy as versioned templates. A template is identified by a hash
+of a canonical serialization of all inputs and loaded only when a matching transform is requested. For all other
+inputs, the transforms derive their equations as before.
+
+Templates are disabled by setting the environment variable ``LBMPY_TRANSFORM_TEMPLATES`` to 0. After changes to the
+transforms, increase ``TEMPLATE_VERSION`` and regenerate the templates with
+``python -m lbmpy.moment_transforms.templates``.
+"""
+import gzip
+import hashlib
+import json
+import keyword
+import os
+from functools import wraps
+from inspect import signature
+
+import sympy as sp
+from sympy.parsing.sympy_parser import parse_expr
+
+from pystencils import Assignment, AssignmentCollection
+from pystencils.simp.assignment_collection import SymbolGen
+
+from lbmpy.cache import canonical_serialization
+
+TEMPLATE_VERSION = 1
+TEMPLATE_DIRECTORY = os.path.join(os.path.dirname(__file__), 'template_data')
+
+_config = {'enabled': os.environ.get('LBMPY_TRANSFORM_TEMPLATES', '1') != '0', 'recorded': None}
+_loaded_templates = {}
+
+
+def transform_template(transform_method):
+    """Decorator for ``forward_transform`` and ``backward_transform``, returning shipped equations if available."""
+    transform_signature = signature(transform_method)
+
+    @wraps(transform_method)
+    def wrapper(self, *args, **kwargs):
+        key = _template_key(self, transform_method.__name__, transform_signature, args, kwargs)
+        if key is None:
+            return transform_method(self, *args, **kwargs)
+
+        file_name = _template_file_name(type(self).__name__, transform_method.__name__, key)
+        if _config['enabled']:
+            template = _load_template(file_name, key)
+            if template is not None:
+                return _assignment_collection(template, self.stencil)
+
+        ac = transform_method(self, *args, **kwargs)
+        if _config['recorded'] is not None:
+            _config['recorded'][file_name] = (key, ac, self.stencil)
+        return ac
+
+    return wrapper
+
+
+def generate_templates(directory=TEMPLATE_DIRECTORY, stencils=('D2Q9', 'D3Q19', 'D3Q27')):
+    """Derives the transform equations of the standard methods and stores them as templates in `directory`.
+
+    Existing templates in the directory are removed. Returns the number of stored templates.
+    """
+    from lbmpy.creationfunctions import LBMConfig, create_lb_method
+    from lbmpy.enums import Method
+    from lbmpy.stencils import LBStencil
+
+    configurations = [(Method.CUMULANT, True), (Method.MONOMIAL_CUMULANT, True),
+                      (Method.CENTRAL_MOMENT, True), (Method.CENTRAL_MOMENT, False),
+                      (Method.MRT, True), (Method.MRT, False)]
+    recorded = dict()
+    enabled = _config['enabled']
+    _config['enabled'], _config['recorded'] = False, recorded
+    try:
+        for stencil in stencils:
+            for method, compressible in configurations:
+                lbm_config = LBMConfig(stencil=LBStencil(stencil), method=method, compressible=compressible)
+                #   the method is used directly, since collision rules are also cached on disk
+                create_lb_method(lbm_config=lbm_config).get_collision_rule(pre_simplification=True)
+    finally:
+        _config['enabled'], _config['recorded'] = enabled, None
+
+    os.makedirs(directory, exist_ok=True)
+    for file_name in os.listdir(directory):
+        if file_name.endswith('.json.gz'):
+            os.remove(os.path.join(directory, file_name))
+
+    stored = 0
+    for file_name, (key, ac, stencil) in sorted(recorded.items()):
+        template = _serialize(key, ac, stencil)
+        if template is None or not _equal_assignment_collections(_assignment_collection(_parse(template), stencil), ac):
+            continue
+        with gzip.open(os.path.join(directory, file_name), 'wt', encoding='utf-8') as f:
+            json.dump(template, f, separators=(',', ':'))
+        stored += 1
+    _loaded_templates.clear()
+    return stored
+
+
+#   ------------------------------------------ Internals ---------------------------------------------------------------
+
+
+def _template_key(transform, method_name, transform_signature, args, kwargs):
+    """Canonical serialization of all inputs of a transform call, or None if there is none"""
+    arguments = transform_signature.bind(transform, *args, **kwargs)
+    arguments.apply_defaults()
+    call_arguments = [(name, value) for name, value in arguments.arguments.items() if name != 'self']
+    if any(name == 'simplification' and not isinstance(value, (bool, str)) for name, value in call_arguments):
+        return None
+
+    cqe = transform.cqe
+    if cqe is not None:
+        if cqe.simplification_hints:
+            return None
+        cqe = [(a.lhs, a.rhs) for a in cqe.all_assignments]
+
+    background = transform.background_distribution
+    if background is not None:
+        if background.discrete_populations is not None:
+            background = tuple(background.discrete_populations)
+        else:
+            background = (type(background).__name__, background.continuous_equation, getattr(background, 'order', None))
+
+    try:
+        return canonical_serialization((
+            TEMPLATE_VERSION, type(transform).__name__, method_name,
+            transform.stencil, tuple(transform.moment_exponents), tuple(transform.moment_polynomials),
+            transform.equilibrium_density, tuple(transform.equilibrium_velocity),
+            transform.base_pre, transform.base_post, transform.mono_base_pre, transform.mono_base_post,
+            cqe, background, tuple(call_arguments)))
+    except ValueError:
+        return None
+
+
+def _template_file_name(class_name, method_name, key):
+    return f"{class_name}_{method_name}_{hashlib.sha256(key.encode()).hexdigest()[:24]}.json.gz"
+
+
+def _load_template(file_name, key):
+    if file_name not in _loaded_templates:
+        path = os.path.join(TEMPLATE_DIRECTORY, file_name)
+        template = None
+        if os.path.exists(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                stored = json.load(f)
+            if stored.get('version') == TEMPLATE_VERSION and stored.get('key') == key:
+                template = _parse(stored)
+        _loaded_templates[file_name] = template
+    return _loaded_templates[file_name]
+
+
+class _NotSerializable(Exception):
+    pass
+
+
+def _serialize(key, ac, stencil):
+    """JSON serializable template of an assignment collection, or None if it contains other than plain symbols"""
+    generator = ac.subexpression_symbol_generator
+    if type(generator) is not SymbolGen or generator._dtype is not None:
+        return None
+
+    symbols = set()
+    for a in ac.all_assignments:
+        symbols |= a.lhs.atoms(sp.Symbol) | a.rhs.atoms(sp.Symbol)
+    try:
+        hints = _encode_hint(ac.simplification_hints, stencil, symbols)
+    except _NotSerializable:
+        return None
+    if any(type(s) is not sp.Symbol or not s.name.isidentifier() or keyword.iskeyword(s.name) for s in symbols):
+        return None
+
+    return {
+        'version': TEMPLATE_VERSION,
+        'key': key,
+        'symbols': {s.name: s.assumptions0 for s in sorted(symbols, key=lambda s: s.name)},
+        'symbol_generator': [generator._symbol, generator._ctr],
+        'simplification_hints': hints,
+        'subexpressions': [[str(a.lhs), str(a.rhs)] for a in ac.subexpressions],
+        'main_assignments': [[str(a.lhs), str(a.rhs)] for a in ac.main_assignments],
+    }
+
+
+def _encode_hint(value, stencil, symbols):
+    """Encodes simplification hints as tagged JSON lists, collecting the contained symbols"""
+    if type(value) is type(stencil) and value == stencil:
+        return ['stencil']
+    if isinstance(value, sp.Expr):
+        symbols |= value.atoms(sp.Symbol)
+        return ['expr', str(value)]
+    if value is None or isinstance(value, (bool, int, str)):
+        return ['value', value]
+    if isinstance(value, (tuple, list)):
+        return [type(value).__name__, [_encode_hint(v, stencil, symbols) for v in value]]
+    if isinstance(value, dict):
+        return ['dict', [[_encode_hint(k, stencil, symbols), _encode_hint(v, stencil, symbols)]
+                         for k, v in value.items()]]
+    raise _NotSerializable()
+
+
+def _decode_hint(encoded, stencil, symbols):
+    tag = encoded[0]
+    if tag == 'stencil':
+        return stencil
+    if tag == 'expr':
+        return parse_expr(encoded[1], local_dict=symbols)
+    if tag == 'value':
+        return encoded[1]
+    if tag == 'dict':
+        return {_decode_hint(k, stencil, symbols): _decode_hint(v, stencil, symbols) for k, v in encoded[1]}
+    return {'tuple': tuple, 'list': list}[tag](_decode_hint(v, stencil, symbols) for v in encoded[1])
+
+
+def _parse(template):
+    symbols = {name: sp.Symbol(name, **assumptions) for name, assumptions in template['symbols'].items()}
+
+    def parse_assignments(assignments):
+        return tuple(Assignment(parse_expr(lhs, local_dict=symbols), parse_expr(rhs, local_dict=symbols))
+                     for lhs, rhs in assignments)
+
+    return (parse_assignments(template['main_assignments']), parse_assignments(template['subexpressions']),
+            tuple(template['symbol_generator']), template['simplification_hints'], symbols)
+
+
+def _assignment_collection(template, stencil):
+    main_assignments, subexpressions, (generator_symbol, generator_ctr), hints, symbols = template
+    return AssignmentCollection(list(main_assignments), subexpressions=list(subexpressions),
+                                simplification_hints=_decode_hint(hints, stencil, symbols),
+                                subexpression_symbol_generator=SymbolGen(generator_symbol, ctr=generator_ctr))
+
+
+def _equal_assignment_collections(ac1, ac2):
+    return ac1.main_assignments == ac2.main_assignments and ac1.subexpressions == ac2.subexpressions \
+        and ac1.simplification_hints == ac2.simplification_hints
+
+
+if __name__ == '__main__':
+    #   the transforms use the state of the imported module, not of __main__
+    from lbmpy.moment_transforms import templates
+    print(f"Stored {templates.generate_templates()} transform templates in {templates.TEMPLATE_DIRECTORY}")
@@ -40,8 +40,10 @@ from collections import Counter, defaultdict
 from copy import copy
 from typing import Iterable, List, Optional, Sequence, Tuple, TypeVar
 
+import numpy as np
 import sympy as sp
 
+from lbmpy.cache import tiered_cache
 from pystencils.cache import memorycache
 from pystencils.sympyextensions import remove_higher_order_terms
 
@@ -378,7 +380,7 @@ def is_shear_moment(moment, dim):
     return quadratic
 
 
-@memorycache(maxsize=512)
+@tiered_cache
 def discrete_moment(func, moment, stencil, shift_velocity=None):
     r"""
     Computes discrete moment of given distribution function
@@ -414,13 +416,87 @@ def discrete_moment(func, moment, stencil, shift_velocity=None):
     return res
 
 
+def numeric_discrete_moments(pdfs, moments, stencil, space="moment"):
+    """Numeric counterpart of :func:`discrete_moment` for arrays of populations, e.g. whole PDF fields.
+
+    All raw moments are computed by a single product with a precomputed moment matrix, which is cached per stencil,
+    moment sequence and space. Central moments are taken around the velocity of each cell, i.e. the first order
+    raw moments divided by the zeroth order moment, and are obtained from the raw moments by binomial expansion
+    along one direction after the other.
+    Cumulants are obtained from the central moments, or for orders up to one from the raw moments, with the relations
+    of :mod:`lbmpy.cumulants`. Moments in polynomial form are linear combinations of these values, like for
+    :func:`discrete_moment` and :func:`lbmpy.cumulants.discrete_cumulant`.
+
+    Args:
+        pdfs: array of shape (..., Q) with the populations of every cell
+        moments: sequence of moments in exponent-tuple or polynomial form
+        stencil: stencil of the populations
+        space: either 'moment', 'central moment' or 'cumulant'
+
+    Returns:
+        array of shape (..., len(moments))
+
+    >>> from lbmpy.maxwellian_equilibrium import get_weights
+    >>> from lbmpy.stencils import LBStencil
+    >>> stencil = LBStencil('D2Q9')
+    >>> weights = np.array(get_weights(stencil), dtype=np.float64)
+    >>> x, y, z = MOMENT_SYMBOLS
+    >>> numeric_discrete_moments(np.stack([weights, 2 * weights]), [(0, 0), (2, 0), x * y], stencil)
+    array([[1.        , 0.33333333, 0.        ],
+           [2.        , 0.66666667, 0.        ]])
+    """
+    if space not in ("moment", "central moment", "cumulant"):
+        raise ValueError("Only moment, central moment or cumulant space are supported")
+    pdfs = np.asarray(pdfs, dtype=np.float64)
+    if pdfs.shape[-1] != stencil.Q:
+        raise ValueError(f"Last axis of pdfs has to be of length {stencil.Q}")
+    moments = tuple(m if type(m) is tuple else sp.sympify(m) for m in moments)
+    stencil_key = _integer_stencil(stencil) or tuple(stencil)
+    monomials, matrix, coefficients, cumulant_functions = _numeric_moment_plan(stencil_key, moments, space)
+
+    raw = pdfs @ matrix.T
+    if space == "moment":
+        return raw
+
+    #   one contiguous array per monomial, central moments are obtained by shifting one direction after the other
+    values = np.ascontiguousarray(np.moveaxis(raw, -1, 0))
+    column = {monomial: i for i, monomial in enumerate(monomials)}
+    dim = stencil.D
+    density = values[column[(0,) * dim]]
+    velocity = [values[column[tuple(int(i == d) for i in range(dim))]] / density for d in range(dim)]
+    raw_values = values
+    for d, u in enumerate(velocity):
+        powers = [np.ones_like(u)]
+        for _ in range(max(monomial[d] for monomial in monomials)):
+            powers.append(-u * powers[-1])
+        shifted = np.empty_like(values)
+        for i, monomial in enumerate(monomials):
+            shifted[i] = values[i]
+            for k in range(monomial[d]):
+                lower = column[monomial[:d] + (k,) + monomial[d + 1:]]
+                shifted[i] += math.comb(monomial[d], k) * powers[monomial[d] - k] * values[lower]
+        values = shifted
+
+    if space == "cumulant":
+        values = np.stack([function(raw_values if sum(monomial) <= 1 else values)
+                           for monomial, function in zip(monomials, cumulant_functions)])
+    return np.moveaxis(np.tensordot(coefficients, values, axes=1), 0, -1)
+
+
 def moment_matrix(moments, stencil, shift_velocity=None):
     """
     Returns transformation matrix to moment space
 
     each row corresponds to a moment, each column to a direction of the stencil
     The entry i,j is the i'th moment polynomial evaluated at direction j
+
+    Without shift velocity, for integer stencils and moments with rational coefficients, the matrix is evaluated
+    with integer arithmetic and cached per moment set and stencil.
     """
+    if shift_velocity is None or all(shift == 0 for shift in shift_velocity):
+        exact_matrix = _exact_moment_matrix(tuple(moments), _integer_stencil(stencil))
+        if exact_matrix is not None:
+            return sp.Matrix(exact_matrix)
     if shift_velocity is None:
         shift_velocity = (0,) * len(stencil[0])
 
@@ -440,6 +516,73 @@ def moment_matrix(moments, stencil, shift_velocity=None):
     return sp.Matrix(len(moments), stencil.Q, generator)
 
 
+def inverse_moment_matrix(moments, stencil):
+    """
+    Returns the inverse of the :func:`moment_matrix`, the transformation matrix from moment space to populations.
+
+    For integer stencils and moments with rational coefficients, the inverse is computed exactly by fraction-free
+    Gauss-Jordan elimination on integers and cached per moment set and stencil. Otherwise sympy inverts the matrix.
+    """
+    exact_inverse = _exact_inverse_moment_matrix(tuple(moments), _integer_stencil(stencil))
+    if exact_inverse is not None:
+        return sp.Matrix(exact_inverse)
+    return moment_matrix(moments, stencil).inv()
+
+
+# ------------------------------ Sparse Linear Combinations ------------------------------------------------------------
+
+
+def sparse_rows(matrix):
+    """Rows of a matrix as dicts, mapping column indices to the non-zero entries of the row"""
+    return [{j: matrix[i, j] for j in range(matrix.cols) if matrix[i, j] != 0} for i in range(matrix.rows)]
+
+
+def matrix_from_sparse_rows(rows, columns):
+    """Inverse of :func:`sparse_rows`, returns a sympy matrix with the given number of columns"""
+    matrix = sp.zeros(len(rows), columns)
+    for i, row in enumerate(rows):
+        for j, entry in row.items():
+            matrix[i, j] = entry
+    return matrix
+
+
+def sparse_moment_matrix(moments, stencil):
+    """Sparse rows (see :func:`sparse_rows`) of :func:`moment_matrix`, cached for integer stencils"""
+    exact_matrix = _exact_moment_matrix(tuple(moments), _integer_stencil(stencil))
+    if exact_matrix is None:
+        return sparse_rows(moment_matrix(moments, stencil))
+    return [dict(row) for row in _exact_sparse_rows(exact_matrix)]
+
+
+def sparse_inverse_moment_matrix(moments, stencil):
+    """Sparse rows (see :func:`sparse_rows`) of :func:`inverse_moment_matrix`, cached for integer stencils"""
+    exact_inverse = _exact_inverse_moment_matrix(tuple(moments), _integer_stencil(stencil))
+    if exact_inverse is None:
+        return sparse_rows(inverse_moment_matrix(moments, stencil))
+    return [dict(row) for row in _exact_sparse_rows(exact_inverse)]
+
+
+def sparse_matrix_vector_product(rows, vector):
+    """Product of a matrix given by sparse rows and a vector, as list of linear combinations of the vector entries.
+
+    Only the non-zero terms of each row are multiplied, for the zero entries no sympy objects are created.
+    """
+    return [sp.Add(*[coefficient * vector[j] for j, coefficient in row.items()]) for row in rows]
+
+
+def sparse_matrix_product(rows_a, rows_b):
+    """Sparse rows of the product of two matrices, which are given by sparse rows"""
+    result = []
+    for row_a in rows_a:
+        terms = defaultdict(list)
+        for k, a in row_a.items():
+            for j, b in rows_b[k].items():
+                terms[j].append(a * b)
+        entries = {j: sp.Add(*products) for j, products in sorted(terms.items())}
+        result.append({j: entry for j, entry in entries.items() if entry != 0})
+    return result
+
+
 def set_up_shift_matrix(moments, stencil, velocity_symbols=sp.symbols("u_:3")):
     """
     Sets up a shift matrix to shift raw moments to central moment space.
@@ -454,10 +597,12 @@ def set_up_shift_matrix(moments, stencil, velocity_symbols=sp.symbols("u_:3")):
     if len(velocity_symbols) > dim:
         velocity_symbols = velocity_symbols[:dim]
 
-    M = moment_matrix(moments, stencil, shift_velocity=None)
     MN = moment_matrix(moments, stencil, shift_velocity=velocity_symbols)
 
-    N = sp.simplify(MN * M.inv())
+    #   entries vanishing on expansion, i.e. the upper triangle, are dropped instead of simplified
+    product = sparse_matrix_product(sparse_rows(MN), sparse_inverse_moment_matrix(moments, stencil))
+    N = matrix_from_sparse_rows([{j: sp.simplify(entry) for j, entry in row.items() if sp.expand(entry) != 0}
+                                 for row in product], stencil.Q)
 
     assert N.is_lower, "Calculating the shift matrix gave not a lower diagonal matrix. Thus it failed"
     assert sum(N[i, i] for i in range(stencil.Q)) == stencil.Q, "Calculating the shift matrix failed. " \
@@ -758,6 +903,140 @@ def moment_equality_table_by_stencil(name_to_stencil_dict, moments, truncate_ord
 
 # --------------------------------------- Internal Functions -----------------------------------------------------------
 
+def _integer_stencil(stencil):
+    """Stencil as nested tuple of Python integers, or None if it has non-integer entries"""
+    try:
+        result = tuple(tuple(int(c) for c in direction) for direction in stencil)
+    except TypeError:
+        return None
+    if any(c != int_c for direction, int_direction in zip(stencil, result)
+           for c, int_c in zip(direction, int_direction)):
+        return None
+    return result
+
+
+def _integer_moment_rows(moments, stencil):
+    """Evaluates the moments at the stencil directions with integer arithmetic.
+
+    Returns an integer matrix and a denominator per row, such that the moment matrix is the integer matrix with each
+    row divided by its denominator, or None if a moment is not a polynomial with rational coefficients.
+    """
+    if stencil is None or len(moments) == 0:
+        return None
+    dim = len(stencil[0])
+    directions = np.array(stencil, dtype=np.int64).reshape(len(stencil), dim)
+    rows, denominators = [], []
+    for moment in moments:
+        if type(moment) is tuple:
+            if len(moment) != dim or any(not isinstance(e, int) or e < 0 for e in moment):
+                return None
+            terms, denominator = [(moment, 1)], 1
+        else:
+            try:
+                poly = sp.Poly(moment, *MOMENT_SYMBOLS[:dim])
+            except (sp.PolynomialError, sp.GeneratorsNeeded):
+                return None
+            if not (poly.domain.is_ZZ or poly.domain.is_QQ):
+                return None
+            coefficients = [sp.Rational(c) for c in poly.coeffs()]
+            denominator = int(sp.ilcm(1, 1, *(c.q for c in coefficients)))
+            terms = [(monomial, int(c * denominator)) for monomial, c in zip(poly.monoms(), coefficients)]
+        row = np.zeros(len(stencil), dtype=object)
+        for monomial, coefficient in terms:
+            row += coefficient * np.prod(directions ** np.array(monomial, dtype=np.int64), axis=1).astype(object)
+        rows.append(row)
+        denominators.append(denominator)
+    return np.array(rows, dtype=object), denominators
+
+
+@memorycache(maxsize=128)
+def _exact_moment_matrix(moments, stencil):
+    integer_rows = _integer_moment_rows(moments, stencil)
+    if integer_rows is None:
+        return None
+    rows, denominators = integer_rows
+    return sp.ImmutableMatrix(rows.shape[0], rows.shape[1],
+                              lambda i, j: sp.Rational(int(rows[i, j]), denominators[i]))
+
+
+@memorycache(maxsize=128)
+def _exact_inverse_moment_matrix(moments, stencil):
+    integer_rows = _integer_moment_rows(moments, stencil)
+    if integer_rows is None or integer_rows[0].shape[0] != integer_rows[0].shape[1]:
+        return None
+    rows, denominators = integer_rows
+    n = rows.shape[0]
+
+    # fraction-free Gauss-Jordan elimination of [rows | I], all divisions are exact
+    augmented = np.concatenate([rows, np.eye(n, dtype=np.int64).astype(object)], axis=1)
+    previous_pivot = 1
+    for k in range(n):
+        pivot_rows = [i for i in range(k, n) if augmented[i, k] != 0]
+        if not pivot_rows:
+            return None
+        if pivot_rows[0] != k:
+            augmented[[k, pivot_rows[0]]] = augmented[[pivot_rows[0], k]]
+        pivot_row = augmented[k].copy()
+        augmented = (pivot_row[k] * augmented - np.outer(augmented[:, k], pivot_row)) // previous_pivot
+        augmented[k] = pivot_row
+        previous_pivot = pivot_row[k]
+
+    # rows of the moment matrix were scaled by their denominators, which scales the columns of the inverse
+    return sp.ImmutableMatrix(n, n, lambda i, j: sp.Rational(int(augmented[i, n + j]) * denominators[j],
+                                                             int(augmented[i, i])))
+
+
+@memorycache(maxsize=256)
+def _exact_sparse_rows(matrix):
+    return tuple(tuple(row.items()) for row in sparse_rows(matrix))
+
+
+@memorycache(maxsize=128)
+def _numeric_moment_plan(stencil, moments, space):
+    """Monomials, float moment matrix, coefficients of the requested moments in terms of the monomials and,
+    for cumulant space, the numeric cumulant functions of the monomials for :func:`numeric_discrete_moments`"""
+    dim = len(stencil[0])
+    terms = [[(moment, 1)] if type(moment) is tuple else
+             [(tuple(int(i) for i in e), c) for c, e in polynomial_to_exponent_representation(moment, dim=dim)]
+             for moment in moments]
+    monomials = {e for moment_terms in terms for e, _ in moment_terms}
+    if space != "moment":
+        #   central moments and cumulants depend on all contained raw moments
+        monomials |= {sub_monomial for e in monomials for sub_monomial in contained_moments(e)}
+        monomials |= {(0,) * dim} | {tuple(int(i == d) for i in range(dim)) for d in range(dim)}
+    monomials = sorted(monomials, key=lambda e: (sum(e), e))
+    column = {e: i for i, e in enumerate(monomials)}
+
+    directions = np.array(stencil, dtype=np.float64).reshape(len(stencil), dim)
+    matrix = np.stack([np.prod(directions ** np.array(e, dtype=np.float64), axis=1) for e in monomials])
+    coefficients = np.zeros((len(moments), len(monomials)))
+    for row, moment_terms in enumerate(terms):
+        for e, c in moment_terms:
+            coefficients[row, column[e]] += float(c)
+
+    if space == "moment":
+        matrix = coefficients @ matrix
+        coefficients = np.eye(len(moments))
+        cumulant_functions = None
+    else:
+        cumulant_functions = tuple(_numeric_cumulant_function(e, column) for e in monomials)
+    return tuple(monomials), matrix, coefficients, cumulant_functions
+
+
+def _numeric_cumulant_function(monomial, column):
+    """Cumulant as function of the raw moments for orders up to one, of the central moments otherwise, which are
+    passed as array with one entry per monomial along the first axis"""
+    from lbmpy.cumulants import cumulant_as_function_of_central_moments, cumulant_as_function_of_raw_moments
+    symbols = {e: sp.Symbol(f"m_{i}") for e, i in column.items()}
+    transform = cumulant_as_function_of_raw_moments if sum(monomial) <= 1 else cumulant_as_function_of_central_moments
+    function = sp.lambdify(list(symbols.values()), transform(monomial, symbols), modules='numpy')
+
+    def cumulant(moment_values):
+        return np.broadcast_to(function(*moment_values), moment_values.shape[1:])
+
+    return cumulant
+
+
 def __unique(seq: Sequence[T]) -> List[T]:
     """Removes duplicates from a sequence in an order preserving way.
 
@@ -1,3 +1,10 @@
+import signal
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+from math import comb
+
 import sympy as sp
 
 from lbmpy.innerloopsplit import create_lbm_split_groups
@@ -14,7 +21,7 @@ from lbmpy.methods.momentbased.momentbasedsimplifications import (
 from pystencils.simp import (
     SimplificationStrategy, add_subexpressions_for_divisions, apply_to_all_assignments,
     subexpression_substitution_in_main_assignments, insert_aliases, insert_constants,
-    add_subexpressions_for_constants)
+    add_subexpressions_for_constants, sympy_cse)
 # add_subexpressions_for_constants)
 
 
@@ -36,6 +43,73 @@ def create_simplification_strategy(lb_method, split_inner_loop=False):
     else:
         return SimplificationStrategy()
 
+
+class SimplificationBudgetWarning(UserWarning):
+    """Issued when a simplification step exceeds its budget and is skipped or replaced by a cheaper variant"""
+
+
+def bounded_simplification_strategy(simplification, time_limit=None, size_limit=None):
+    """Returns a simplification strategy that applies the rules of `simplification` within budgets.
+
+    Every rule becomes a step of :func:`bounded_simplification_step`. A callable that is no
+    :class:`pystencils.simp.SimplificationStrategy` is treated as a single step.
+
+    Args:
+        simplification: simplification strategy or callable on assignment collections
+        time_limit: maximum run-time of a single step in seconds, or None
+        size_limit: maximum size of the assignment collection a step may produce, see :func:`expression_size`,
+                    or None
+    """
+    rules = simplification.rules if isinstance(simplification, SimplificationStrategy) else [simplification]
+    s = SimplificationStrategy()
+    for rule in rules:
+        s.add(bounded_simplification_step(rule, time_limit, size_limit))
+    return s
+
+
+def bounded_simplification_step(rule, time_limit=None, size_limit=None, fallback=None):
+    """Wraps a simplification rule such that it is skipped or replaced by a cheaper variant if it exceeds a budget.
+
+    A step exceeds its budget if
+
+    - it runs longer than `time_limit` seconds. The step is interrupted by ``SIGALRM``, which is only possible
+      in the main thread on POSIX systems. Elsewhere, the step runs to completion and only a warning is issued.
+      An alarm set by the caller is kept and takes precedence if it is due earlier.
+    - its result is larger than `size_limit` and larger than its input. For rules that expand all assignments,
+      i.e. ``apply_to_all_assignments(sp.expand)``, the size of the result is estimated before the expansion.
+
+    In that case, the cheaper variant `fallback` is tried within the same budget. It defaults to a
+    common subexpression elimination without canonical ordering for :func:`pystencils.simp.sympy_cse`.
+    If there is no cheaper variant, or it exceeds the budget as well, the step is skipped,
+    i.e. it returns its input. Every skipped or replaced step issues a :class:`SimplificationBudgetWarning`.
+    """
+    if fallback is None and rule is sympy_cse:
+        fallback = _unordered_sympy_cse
+
+    def step(ac):
+        result, reason = _apply_within_budget(rule, ac, time_limit, size_limit)
+        if reason is None:
+            return result
+        name = _rule_name(rule)
+        if fallback is not None:
+            result, fallback_reason = _apply_within_budget(fallback, ac, time_limit, size_limit)
+            if fallback_reason is None:
+                warnings.warn(f"Simplification step '{name}' {reason}, "
+                              f"replaced by the cheaper variant '{_rule_name(fallback)}'", SimplificationBudgetWarning)
+                return result
+            reason += f", and so did the cheaper variant '{_rule_name(fallback)}'"
+        warnings.warn(f"Simplification step '{name}' {reason}, skipped", SimplificationBudgetWarning)
+        return ac
+
+    step.__name__ = _rule_name(rule)
+    return step
+
+
+def expression_size(assignment_collection):
+    """Number of nodes of the expression trees of all right-hand sides of an assignment collection"""
+    return sum(sum(1 for _ in sp.preorder_traversal(a.rhs)) for a in assignment_collection.all_assignments)
+
+
 #   --------------- Internal ----------------------------------------------------------------------------
 
 
@@ -98,3 +172,108 @@ def _cumulant_space_simplification(split_inner_loop):
         s.add(create_lbm_split_groups)
     s.add(lambda ac: ac.new_without_unused_subexpressions())
     return s
+
+
+class _StepTimeout(BaseException):
+    """Raised by the alarm signal; no ``Exception`` such that sympy does not swallow it"""
+
+
+@contextmanager
+def _interrupt_after(seconds):
+    """Raises :class:`_StepTimeout` after the given number of seconds, yields False if this is not possible.
+
+    An alarm set by the caller is restored afterwards, reduced by the elapsed time. If it is due before the
+    interruption, or its handler was not installed from Python, it is left alone and False is yielded."""
+    if seconds is None or not hasattr(signal, 'setitimer') \
+            or threading.current_thread() is not threading.main_thread():
+        yield False
+        return
+
+    previous_handler = signal.getsignal(signal.SIGALRM)
+    previous_delay, previous_interval = signal.getitimer(signal.ITIMER_REAL)
+    if previous_handler is None or 0 < previous_delay <= seconds:
+        yield False
+        return
+
+    def handler(signum, frame):
+        raise _StepTimeout()
+
+    start = time.perf_counter()
+    signal.signal(signal.SIGALRM, handler)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield True
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+        if previous_delay > 0:
+            remaining = max(previous_delay - (time.perf_counter() - start), 1e-6)
+            signal.setitimer(signal.ITIMER_REAL, remaining, previous_interval)
+
+
+def _apply_within_budget(rule, ac, time_limit, size_limit):
+    """Returns the result of the rule and None, or the input and the reason why the budget was exceeded"""
+    input_size = None
+    if size_limit is not None:
+        input_size = expression_size(ac)
+        if _expands_all_assignments(rule):
+            estimated_size = sum(_expanded_term_count(a.rhs, dict()) for a in ac.main_assignments)
+            if estimated_size > max(size_limit, input_size):
+                return ac, f"would expand to at least {estimated_size} terms (size limit {size_limit})"
+
+    start = time.perf_counter()
+    try:
+        with _interrupt_after(time_limit) as interruptible:
+            result = rule(ac)
+    except _StepTimeout:
+        return ac, f"exceeded the time limit of {time_limit}s"
+    elapsed = time.perf_counter() - start
+    if time_limit is not None and not interruptible and elapsed > time_limit:
+        warnings.warn(f"Simplification step '{_rule_name(rule)}' took {elapsed:.1f}s, more than the time limit of "
+                      f"{time_limit}s, but could not be interrupted outside of the main thread",
+                      SimplificationBudgetWarning)
+
+    if size_limit is not None:
+        result_size = expression_size(result)
+        if result_size > max(size_limit, input_size):
+            return ac, f"grew the assignments to size {result_size} (size limit {size_limit})"
+    return result, None
+
+
+def _expanded_term_count(expr, counts):
+    """Number of terms of the expanded expression if no terms cancel, computed without expanding"""
+    if expr in counts:
+        return counts[expr]
+    if expr.is_Add:
+        count = sum(_expanded_term_count(arg, counts) for arg in expr.args)
+    elif expr.is_Mul:
+        count = 1
+        for arg in expr.args:
+            count *= _expanded_term_count(arg, counts)
+    elif expr.is_Pow and expr.exp.is_Integer and expr.exp > 0:
+        #   number of monomials of degree n in the terms of the base
+        terms, n = _expanded_term_count(expr.base, counts), int(expr.exp)
+        count = comb(terms + n - 1, n)
+    else:
+        count = 1
+    counts[expr] = count
+    return count
+
+
+_APPLY_TO_ALL_ASSIGNMENTS_CODE = apply_to_all_assignments(sp.expand).__code__
+
+
+def _expands_all_assignments(rule):
+    """Whether the rule is ``apply_to_all_assignments(sp.expand)``, independent of its name"""
+    if getattr(rule, '__code__', None) is not _APPLY_TO_ALL_ASSIGNMENTS_CODE:
+        return False
+    free_variables = dict(zip(rule.__code__.co_freevars, (cell.cell_contents for cell in rule.__closure__)))
+    return free_variables.get('operation') is sp.expand
+
+
+def _unordered_sympy_cse(ac):
+    return sympy_cse(ac, order='none')
+
+
+def _rule_name(rule):
+    return getattr(rule, '__name__', type(rule).__name__)
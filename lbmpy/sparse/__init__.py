@@ -1,8 +1,10 @@
+from .lbstep_hybrid import HybridLatticeBoltzmannStep, select_dense_blocks
+from .lbstep_sparse import SparseLatticeBoltzmannStep
 from .mapping import SparseLbBoundaryMapper, SparseLbMapper
 from .update_rule_sparse import (
     create_lb_update_rule_sparse, create_macroscopic_value_getter_sparse,
     create_macroscopic_value_setter_sparse, create_symbolic_list)
 
-__all__ = ['SparseLbBoundaryMapper', 'SparseLbMapper', 'create_lb_update_rule_sparse',
-           'create_macroscopic_value_setter_sparse', 'create_macroscopic_value_getter_sparse',
-           'create_symbolic_list']
+__all__ = ['HybridLatticeBoltzmannStep', 'SparseLatticeBoltzmannStep', 'SparseLbBoundaryMapper', 'SparseLbMapper',
+           'create_lb_update_rule_sparse', 'create_macroscopic_value_setter_sparse',
+           'create_macroscopic_value_getter_sparse', 'create_symbolic_list', 'select_dense_blocks']
@@ -0,0 +1,468 @@
+import itertools
+from types import MappingProxyType
+
+import numpy as np
+
+from lbmpy.advanced_streaming.communication import offset_copy_kernel
+from lbmpy.boundaries.boundaries_in_kernel import update_rule_with_flag_boundaries
+from lbmpy.boundaries.boundaryhandling import create_lattice_boltzmann_boundary_kernel
+from lbmpy.creationfunctions import create_lb_collision_rule, update_with_default_parameters
+from lbmpy.macroscopic_value_kernels import macroscopic_values_getter, macroscopic_values_setter
+from lbmpy.sparse.lbstep_sparse import SparseLatticeBoltzmannStep
+from lbmpy.updatekernels import create_lbm_kernel
+from pystencils import Field, Target, create_kernel
+from pystencils.boundaries.boundaryhandling import BoundaryDataSetter
+from pystencils.boundaries.createindexlist import create_boundary_index_array, numpy_data_type_for_boundary_object
+from pystencils.timeloop import TimeLoop
+
+
+def select_dense_blocks(flag_arr, fluid_flag, block_size, fluid_fraction_threshold=0.5, ghost_layers=1):
+    """Divides the domain into blocks and selects the blocks that should be stored densely.
+
+    Args:
+        flag_arr: integer array including ghost layers
+        fluid_flag: flag marking the fluid cells
+        block_size: extent of the blocks, the domain size has to be a multiple of it
+        fluid_fraction_threshold: blocks with a larger fraction of fluid cells are stored densely
+        ghost_layers: number of ghost layers of the flag array
+
+    Returns:
+        boolean array with one entry per block, True for dense blocks
+
+    Examples:
+        >>> flag_arr = np.ones((10, 6), dtype=np.uint8)
+        >>> flag_arr[5:9, 1:5] = 2  # solid obstacle in the right half
+        >>> select_dense_blocks(flag_arr, fluid_flag=1, block_size=(4, 4))
+        array([[ True],
+               [False]])
+    """
+    interior = flag_arr[tuple(slice(ghost_layers, s - ghost_layers) for s in flag_arr.shape)]
+    block_size = _block_size(block_size, interior.shape)
+    blocks_per_dim = tuple(s // b for s, b in zip(interior.shape, block_size))
+    is_fluid = (interior & fluid_flag) != 0
+    block_view = is_fluid.reshape(sum(((n, b) for n, b in zip(blocks_per_dim, block_size)), ()))
+    fluid_fraction = block_view.mean(axis=tuple(range(1, 2 * len(block_size), 2)))
+    return fluid_fraction > fluid_fraction_threshold
+
+
+class HybridLatticeBoltzmannStep:
+    """Lattice Boltzmann simulation that stores open fluid regions densely and sparse regions as lists.
+
+    The domain is divided into blocks. Blocks with a fluid fraction above the threshold are stored as dense
+    fzyx arrays with one ghost layer and updated by the regular stream-collide kernel, compiled for the block shape,
+    with boundary index lists per block. All other fluid cells are stored in the compressed lists of a
+    :class:`lbmpy.sparse.SparseLatticeBoltzmannStep`. Before each time step the pdfs streamed into the ghost layers
+    of the dense blocks and into the dense cells neighboring sparse fluid cells are copied by a compiled kernel over
+    lists of offsets, so memory and bandwidth are spent mostly on fluid cells. Only the 'pull' streaming pattern is
+    supported.
+
+    Args:
+        flag_arr: integer array including ghost layers, marking fluid and boundary cells. Cells in the ghost
+                  layers without flag are periodic.
+        fluid_flag: flag marking the fluid cells
+        boundaries: dict mapping flags to boundary objects
+        ghost_layers: number of ghost layers of the flag array
+        block_size: extent of the blocks, a single integer or a tuple. The domain size has to be a multiple of it.
+        fluid_fraction_threshold: blocks with a larger fraction of fluid cells are stored densely
+        flag_field_boundaries: if True, the dense blocks are updated by stream-collide kernels that evaluate the
+                               boundaries inline based on the flag field instead of index lists, see
+                               :func:`lbmpy.boundaries.boundaries_in_kernel.update_rule_with_flag_boundaries`.
+                               This is slower for static geometries and only supports boundaries without data
+                               per link.
+        kernel_params: parameters passed to all kernels, e.g. for symbolic relaxation rates
+        lbm_config: see :class:`lbmpy.creationfunctions.LBMConfig`
+        lbm_optimisation: see :class:`lbmpy.creationfunctions.LBMOptimisation`
+        config: see :class:`pystencils.CreateKernelConfig`, only CPU targets are supported
+        method_parameters: parameters of :class:`lbmpy.creationfunctions.LBMConfig`, if no lbm_config is given
+    """
+
+    def __init__(self, flag_arr, fluid_flag, boundaries=MappingProxyType({}), ghost_layers=1, block_size=16,
+                 fluid_fraction_threshold=0.5, flag_field_boundaries=False, kernel_params=MappingProxyType({}),
+                 lbm_config=None, lbm_optimisation=None, config=None, **method_parameters):
+        lbm_config, lbm_optimisation, config = update_with_default_parameters(method_parameters, {},
+                                                                              lbm_config, lbm_optimisation, config)
+        if config.target != Target.CPU:
+            raise NotImplementedError("The hybrid lattice Boltzmann step supports only CPU targets")
+        # the dense blocks are updated by pull kernels, and the exchange copies pdfs between the same slots
+        if lbm_config.streaming_pattern != 'pull':
+            raise ValueError("The hybrid lattice Boltzmann step supports only the 'pull' streaming pattern")
+
+        collision_rule = create_lb_collision_rule(lbm_config=lbm_config, lbm_optimisation=lbm_optimisation)
+        self.method = collision_rule.method
+        self.kernel_params = kernel_params.copy()
+        self._flag_arr = flag_arr
+        self._fluid_flag = fluid_flag
+        self._ghost_layers = ghost_layers
+        self.dim = flag_arr.ndim
+        self.domain_size = tuple(s - 2 * ghost_layers for s in flag_arr.shape)
+        self.block_size = _block_size(block_size, self.domain_size)
+        self.dense_blocks = select_dense_blocks(flag_arr, fluid_flag, self.block_size, fluid_fraction_threshold,
+                                                ghost_layers)
+        self._dense_block_indices = [tuple(b) for b in np.argwhere(self.dense_blocks)]
+        q = len(self.method.stencil)
+        dtype = config.data_type.default_factory().numpy_dtype
+
+        # cells in the ghost layers without flag are replaced by their periodic image
+        self._resolved_flags, self._periodic_image = self._resolve_periodic_images()
+        is_fluid = (self._resolved_flags & fluid_flag) != 0
+        is_dense_cell = self._dense_cell_mask()
+
+        # dense cells next to sparse fluid cells are stored in the lists as interface cells
+        interface_flag = _unused_flag(flag_arr, fluid_flag, boundaries)
+        in_domain = np.zeros(flag_arr.shape, dtype=bool)
+        in_domain[self._interior_slice()] = True
+        is_sparse_fluid = is_fluid & in_domain & ~is_dense_cell
+        is_interface = is_fluid & is_dense_cell & self._has_neighbor(is_sparse_fluid)
+        sparse_flags = flag_arr.copy()
+        sparse_flags[is_fluid & is_dense_cell] = 0
+        sparse_flags[is_interface] = interface_flag
+
+        self._sparse_step = None
+        if np.any(is_sparse_fluid):
+            self._sparse_step = SparseLatticeBoltzmannStep(sparse_flags, fluid_flag, boundaries, ghost_layers,
+                                                           interface_mask=interface_flag,
+                                                           kernel_params=self.kernel_params,
+                                                           lbm_config=lbm_config, lbm_optimisation=lbm_optimisation,
+                                                           config=config)
+
+        # all dense blocks are stored in one array, every block is a contiguous fzyx array with one ghost layer.
+        # The two arrays swap their roles every time step
+        padded_block = tuple(b + 2 for b in self.block_size)
+        self._dense_shape = (len(self._dense_block_indices), q) + padded_block[::-1]
+        self._dense_arrays = (np.zeros(self._dense_shape, dtype=dtype), np.zeros(self._dense_shape, dtype=dtype))
+        self._parity = 0
+        self._dense_flags = [self._resolved_flags[self._block_slice(block, padding=1)].copy(order='F')
+                             for block in self._dense_block_indices]
+
+        src = Field.create_generic('src', self.dim, dtype=dtype, index_shape=(q,), layout='fzyx')
+        density = Field.create_generic('rho', self.dim, dtype=dtype, layout='fzyx')
+        velocity = Field.create_generic('u', self.dim, dtype=dtype, index_shape=(self.dim,), layout='fzyx')
+        self._flag_field_boundaries = flag_field_boundaries
+        self._dense_kernel = None
+        self._dense_boundary_kernels = []
+        if self._dense_block_indices:
+            # all blocks have the same shape, the kernels are compiled for it with constant strides
+            block_arr = self._dense_block(self._dense_arrays[0], 0)
+            block_src = Field.create_from_numpy_array('src', block_arr, index_dimensions=1)
+            block_dst = Field.create_from_numpy_array('dst', block_arr, index_dimensions=1)
+            if flag_field_boundaries:
+                block_flags = Field.create_from_numpy_array('flags', self._dense_flags[0])
+                update_rule = update_rule_with_flag_boundaries(collision_rule, block_src, block_dst, block_flags,
+                                                               boundaries)
+            else:
+                update_rule = create_lbm_kernel(collision_rule, block_src, block_dst)
+                self._create_dense_boundary_kernels(boundaries, block_src, config)
+            self._dense_kernel = create_kernel(update_rule, config=config).compile()
+        getter = macroscopic_values_getter(self.method, density.center, velocity.center_vector, src)
+        self._dense_getter = create_kernel(getter, config=config).compile()
+        setter = macroscopic_values_setter(self.method, density.center, velocity.center_vector, src)
+        self._dense_setter = create_kernel(setter, config=config).compile()
+
+        self._create_exchange_lists(is_fluid, is_dense_cell, is_interface, is_sparse_fluid)
+        self._copy_kernel = offset_copy_kernel(dtype, cpu_openmp=config.cpu_openmp)
+        self._step_calls = self._create_step_calls()
+        self.set_pdf_fields_from_macroscopic_values()
+        self.time_steps_run = 0
+
+    @property
+    def flag_array(self):
+        return self._flag_arr
+
+    @property
+    def number_of_fluid_cells(self):
+        return int(np.count_nonzero(self._flag_arr[self._interior_slice()] & self._fluid_flag))
+
+    @property
+    def number_of_dense_cells(self):
+        """Number of cells stored densely, including the ghost layers of the dense blocks"""
+        return int(np.prod(self._dense_shape[2:])) * len(self._dense_block_indices)
+
+    @property
+    def sparse_step(self):
+        """The :class:`lbmpy.sparse.SparseLatticeBoltzmannStep` of the sparse part, None if all fluid is dense"""
+        return self._sparse_step
+
+    @property
+    def density(self):
+        """Dense density array without ghost layers, NaN outside of the fluid"""
+        return self._macroscopic_values()[0]
+
+    @property
+    def velocity(self):
+        """Dense velocity array without ghost layers, NaN outside of the fluid"""
+        return self._macroscopic_values()[1]
+
+    def set_pdf_fields_from_macroscopic_values(self, density=1.0, velocity=None):
+        """Initializes all pdfs in equilibrium, with density and velocity given as scalars or as arrays of the
+        domain size"""
+        dtype = self._dense_arr.dtype
+        density_arr = np.broadcast_to(np.asarray(density, dtype=dtype), self.domain_size)
+        if velocity is None:
+            velocity = np.zeros(self.dim)
+        velocity_arr = np.broadcast_to(np.asarray(velocity, dtype=dtype), self.domain_size + (self.dim,))
+        for k, block in enumerate(self._dense_block_indices):
+            inner = self._block_slice(block, padding=0, offset=-self._ghost_layers)
+            rho = np.ones(self._dense_shape[2:][::-1], dtype=dtype, order='F')
+            u = np.zeros(rho.shape + (self.dim,), dtype=dtype, order='F')
+            rho[(slice(1, -1),) * self.dim] = density_arr[inner]
+            u[(slice(1, -1),) * self.dim] = velocity_arr[inner]
+            self._dense_setter(src=self._dense_block(self._dense_arr, k), rho=rho, u=u, **self.kernel_params)
+        if self._sparse_step is not None:
+            self._sparse_step.set_pdf_fields_from_macroscopic_values(density_arr, velocity_arr)
+
+    def time_step(self):
+        self._single_step()
+        self.time_steps_run += 1
+
+    def get_time_loop(self):
+        fixed_loop = TimeLoop(steps=2)
+        fixed_loop.add_single_step_function(self._single_step)
+
+        def two_time_steps():
+            # the roles of the dense arrays are chosen when the loop runs, single time steps in between swap them
+            for function, arguments in self._step_calls[self._parity] + self._step_calls[1 - self._parity]:
+                function(**arguments)
+
+        fixed_loop.add_call(two_time_steps, {})
+        return fixed_loop
+
+    def run(self, time_steps):
+        time_loop = self.get_time_loop()
+        time_loop.run(time_steps)
+        self.time_steps_run += time_loop.time_steps_run
+
+    def benchmark_run(self, time_steps):
+        """Runs the given number of time steps (rounded up to an even number) and returns the MLUPS,
+        counting only fluid cells"""
+        time_loop = self.get_time_loop()
+        duration_of_time_step = time_loop.benchmark_run(time_steps)
+        self.time_steps_run += time_loop.time_steps_run
+        return self.number_of_fluid_cells / duration_of_time_step * 1e-6
+
+    def benchmark(self, time_for_benchmark=5, init_time_steps=2, number_of_time_steps_for_estimation='auto'):
+        time_loop = self.get_time_loop()
+        duration_of_time_step = time_loop.benchmark(time_for_benchmark, init_time_steps,
+                                                    number_of_time_steps_for_estimation)
+        self.time_steps_run += time_loop.time_steps_run
+        return self.number_of_fluid_cells / duration_of_time_step * 1e-6
+
+    # ------------------------------------------ Helper Functions -------------------------------------------------
+
+    @property
+    def _dense_arr(self):
+        return self._dense_arrays[self._parity]
+
+    def _single_step(self):
+        for function, arguments in self._step_calls[self._parity]:
+            function(**arguments)
+        self._parity = 1 - self._parity
+
+    def _create_step_calls(self):
+        """Calls of a time step as pairs of function and arguments, for both roles of the two dense arrays"""
+        step_calls = []
+        for src_arr, dst_arr in (self._dense_arrays, self._dense_arrays[::-1]):
+            calls = [(self._exchange, {'dense': src_arr.reshape(-1)})]
+            if self._sparse_step is not None:
+                calls.append((self._sparse_step.time_step, {}))
+            for kernel, k, index_arr in self._dense_boundary_kernels:
+                calls.append((kernel, {'src': self._dense_block(src_arr, k), 'indexField': index_arr,
+                                       **self.kernel_params}))
+            for k in range(len(self._dense_block_indices)):
+                arguments = {'src': self._dense_block(src_arr, k), 'dst': self._dense_block(dst_arr, k),
+                             **self.kernel_params}
+                if self._flag_field_boundaries:
+                    arguments['flags'] = self._dense_flags[k]
+                calls.append((self._dense_kernel, arguments))
+            step_calls.append(calls)
+        return step_calls
+
+    def _create_dense_boundary_kernels(self, boundaries, src, config):
+        """Creates the boundary kernels of the dense blocks and their index lists in block coordinates"""
+        stencil = self.method.stencil
+        for flag, boundary in boundaries.items():
+            index_field = Field.create_generic('indexField', spatial_dimensions=1,
+                                               dtype=numpy_data_type_for_boundary_object(boundary, self.dim))
+            kernel = None
+            for k, block in enumerate(self._dense_block_indices):
+                index_arr = create_boundary_index_array(self._dense_flags[k], stencil, flag, self._fluid_flag,
+                                                        boundary, 1, boundary.inner_or_boundary,
+                                                        boundary.single_link)
+                if len(index_arr) == 0:
+                    continue
+                if boundary.additional_data_init_callback:
+                    # offset of the block including its ghost layer, as for the blocks of the regular boundary
+                    # handling, such that the link positions agree with LatticeBoltzmannStep
+                    data_setter = BoundaryDataSetter(index_arr, self._block_origin(block) - 1, stencil, 1,
+                                                     self._dense_block(self._dense_arr, k))
+                    boundary.additional_data_init_callback(data_setter)
+                if kernel is None:
+                    kernel = create_lattice_boltzmann_boundary_kernel(src, index_field, self.method, boundary,
+                                                                      target=config.target,
+                                                                      cpu_openmp=config.cpu_openmp).compile()
+                self._dense_boundary_kernels.append((kernel, k, index_arr))
+
+    def _exchange(self, dense):
+        self._copy_kernel(src=dense, dst=dense, offsets=self._dense_from_dense)
+        if self._sparse_step is not None:
+            sparse = self._sparse_step.pdf_array.reshape(-1, order='F')
+            self._copy_kernel(src=sparse, dst=dense, offsets=self._dense_from_sparse)
+            self._copy_kernel(src=dense, dst=sparse, offsets=self._sparse_from_dense)
+
+    def _create_exchange_lists(self, is_fluid, is_dense_cell, is_interface, is_sparse_fluid):
+        """Creates int64 arrays of shape (N, 2) with the flat (source, destination) indices into the dense and the
+        sparse pdf arrays, for :func:`lbmpy.advanced_streaming.communication.offset_copy_kernel`. Only the pdfs that
+        are streamed into the fluid of the receiving part are exchanged."""
+        stencil = np.array(self.method.stencil, dtype=np.int64)[:, :, None]
+        block_lookup = np.full(self.dense_blocks.shape, -1, dtype=np.int64)
+        for k, block in enumerate(self._dense_block_indices):
+            block_lookup[block] = k
+
+        dense_from_dense, dense_from_sparse = [], []
+        for k, block in enumerate(self._dense_block_indices):
+            local = np.indices(self._dense_shape[2:][::-1]).reshape(self.dim, -1)
+            is_ghost = np.any((local == 0) | (local == np.array(self._dense_shape[2:][::-1])[:, None] - 1), axis=0)
+            local = local[:, is_ghost]
+            cells = local + self._block_origin(block)[:, None] + self._ghost_layers - 1
+            cells = self._periodic_image[(slice(None),) + tuple(cells)]
+            needs_pdfs = is_fluid[tuple(cells)]
+            local, cells = local[:, needs_pdfs], cells[:, needs_pdfs]
+            # the pdf of direction i in a ghost cell is pulled by the block cell in direction i
+            pulled = local[None] + stencil
+            is_pulled = np.all((pulled >= 1) & (pulled <= np.array(self.block_size)[:, None]), axis=1)
+            is_source_dense = is_dense_cell[tuple(cells)]
+            dst = self._dense_flat_index(k, local)
+            dense_from_dense.append((dst[:, is_source_dense][is_pulled[:, is_source_dense]],
+                                     self._dense_flat_index_of_cells(cells[:, is_source_dense], block_lookup)[
+                                         is_pulled[:, is_source_dense]]))
+            if self._sparse_step is not None:
+                dense_from_sparse.append((dst[:, ~is_source_dense][is_pulled[:, ~is_source_dense]],
+                                          self._sparse_flat_index(cells[:, ~is_source_dense])[
+                                              is_pulled[:, ~is_source_dense]]))
+
+        sparse_from_dense = []
+        if self._sparse_step is not None:
+            interface_cells = np.array(np.nonzero(is_interface))
+            pulled = self._periodic_image[(slice(None),) + tuple(np.swapaxes(interface_cells[None] + stencil, 0, 1))]
+            is_pulled = is_sparse_fluid[tuple(pulled)]
+            sparse_from_dense.append((self._sparse_flat_index(interface_cells)[is_pulled],
+                                      self._dense_flat_index_of_cells(interface_cells, block_lookup)[is_pulled]))
+
+        def offsets(pairs):
+            if not pairs:
+                return np.empty((0, 2), dtype=np.int64)
+            return np.stack([np.concatenate([p[i] for p in pairs]) for i in (1, 0)], axis=1).astype(np.int64)
+
+        self._dense_from_dense = offsets(dense_from_dense)
+        self._dense_from_sparse = offsets(dense_from_sparse)
+        self._sparse_from_dense = offsets(sparse_from_dense)
+
+    def _dense_flat_index(self, k, local):
+        """Flat indices of shape (Q, number of cells) into the dense array for cells of block k"""
+        q = len(self.method.stencil)
+        directions = np.arange(q)[:, None]
+        block_idx = np.full((q, local.shape[1]), k, dtype=np.int64)
+        reversed_local = tuple(np.broadcast_to(c, (q, local.shape[1])) for c in local[::-1])
+        return np.ravel_multi_index((block_idx, np.broadcast_to(directions, block_idx.shape)) + reversed_local,
+                                    self._dense_shape)
+
+    def _dense_flat_index_of_cells(self, cells, block_lookup):
+        block_coordinates = (cells - self._ghost_layers) // np.array(self.block_size)[:, None]
+        blocks = block_lookup[tuple(block_coordinates)]
+        q = len(self.method.stencil)
+        local = cells - self._ghost_layers - block_coordinates * np.array(self.block_size)[:, None] + 1
+        directions = np.broadcast_to(np.arange(q)[:, None], (q, cells.shape[1]))
+        return np.ravel_multi_index((np.broadcast_to(blocks, directions.shape), directions)
+                                    + tuple(np.broadcast_to(c, directions.shape) for c in local[::-1]),
+                                    self._dense_shape)
+
+    def _sparse_flat_index(self, cells):
+        mapping = self._sparse_step.mapping
+        coordinates = np.empty(cells.shape[1], dtype=mapping.coordinates.dtype)
+        for name, c in zip(coordinates.dtype.names, cells):
+            coordinates[name] = c
+        cell_idx = mapping.cell_idx_bulk(coordinates).astype(np.int64)
+        return cell_idx[None, :] + np.arange(len(self.method.stencil))[:, None] * len(mapping)
+
+    def _resolve_periodic_images(self):
+        """Returns the flags with periodic ghost cells replaced by the flags of their image, and the coordinates
+        of the image of every cell"""
+        coordinates = np.indices(self._flag_arr.shape)
+        is_periodic = self._flag_arr == 0
+        for d, extent in enumerate(self.domain_size):
+            c = coordinates[d]
+            c[is_periodic & (c < self._ghost_layers)] += extent
+            c[is_periodic & (c >= extent + self._ghost_layers)] -= extent
+        return self._flag_arr[tuple(coordinates)], coordinates
+
+    def _dense_cell_mask(self):
+        mask = np.zeros(self._flag_arr.shape, dtype=bool)
+        for block in self._dense_block_indices:
+            mask[self._block_slice(block, padding=0)] = True
+        return mask
+
+    def _has_neighbor(self, mask):
+        """Cells that have a neighbor, in the sense of the stencil and with periodic images, marked in mask"""
+        result = np.zeros(mask.shape, dtype=bool)
+        interior = self._interior_slice()
+        cells = np.indices(self.domain_size).reshape(self.dim, -1) + self._ghost_layers
+        for direction in self.method.stencil:
+            neighbors = cells + np.array(direction)[:, None]
+            neighbors = self._periodic_image[(slice(None),) + tuple(neighbors)]
+            result[interior] |= mask[tuple(neighbors)].reshape(self.domain_size)
+        return result
+
+    def _macroscopic_values(self):
+        dtype = self._dense_arr.dtype
+        density = np.full(self.domain_size, np.nan, dtype=dtype)
+        velocity = np.full(self.domain_size + (self.dim,), np.nan, dtype=dtype)
+        if self._sparse_step is not None:
+            sparse_density, sparse_velocity = self._sparse_step.density, self._sparse_step.velocity
+            is_sparse = ~np.isnan(sparse_density)
+            density[is_sparse] = sparse_density[is_sparse]
+            velocity[is_sparse] = sparse_velocity[is_sparse]
+        padded_shape = self._dense_shape[2:][::-1]
+        for k, block in enumerate(self._dense_block_indices):
+            rho = np.empty(padded_shape, dtype=dtype, order='F')
+            u = np.empty(padded_shape + (self.dim,), dtype=dtype, order='F')
+            self._dense_getter(src=self._dense_block(self._dense_arr, k), rho=rho, u=u, **self.kernel_params)
+            inner = self._block_slice(block, padding=0, offset=-self._ghost_layers)
+            is_fluid = (self._flag_arr[self._block_slice(block, padding=0)] & self._fluid_flag) != 0
+            interior = (slice(1, -1),) * self.dim
+            density[inner][is_fluid] = rho[interior][is_fluid]
+            velocity[inner][is_fluid] = u[interior][is_fluid]
+        return density, velocity
+
+    def _dense_block(self, arr, k):
+        return arr[k].T
+
+    def _block_origin(self, block):
+        return np.array([b * s for b, s in zip(block, self.block_size)])
+
+    def _block_slice(self, block, padding, offset=0):
+        gl = self._ghost_layers
+        return tuple(slice(o + gl - padding + offset, o + gl + s + padding + offset)
+                     for o, s in zip(self._block_origin(block), self.block_size))
+
+    def _interior_slice(self):
+        gl = self._ghost_layers
+        return tuple(slice(gl, s - gl) for s in self._flag_arr.shape)
+
+
+def _block_size(block_size, domain_size):
+    if isinstance(block_size, int):
+        block_size = (block_size,) * len(domain_size)
+    block_size = tuple(min(b, s) for b, s in zip(block_size, domain_size))
+    if any(s % b != 0 for b, s in zip(block_size, domain_size)):
+        raise ValueError(f"The domain size {domain_size} has to be a multiple of the block size {block_size}")
+    return block_size
+
+
+def _unused_flag(flag_arr, fluid_flag, boundaries):
+    used = int(np.bitwise_or.reduce(flag_arr, axis=None)) | fluid_flag
+    for flag in boundaries:
+        used |= flag
+    for bit in itertools.count():
+        if not used & (1 << bit):
+            if (1 << bit) > np.iinfo(flag_arr.dtype).max:
+                raise ValueError("No free bit in the flag array for the interface between dense and sparse cells")
+            return flag_arr.dtype.type(1 << bit)
@@ -0,0 +1,310 @@
+import os
+from dataclasses import replace
+from types import MappingProxyType
+
+import numpy as np
+
+from lbmpy.advanced_streaming.utility import Timestep
+from lbmpy.boundaries import NoSlip
+from lbmpy.creationfunctions import create_lb_collision_rule, update_with_default_parameters
+from lbmpy.sparse.mapping import SparseLbBoundaryMapper, SparseLbMapper
+from lbmpy.sparse.update_rule_sparse import (
+    create_lb_update_rule_sparse, create_macroscopic_value_getter_sparse, create_macroscopic_value_setter_sparse)
+from pystencils import Field, Target, create_kernel
+from pystencils.field import FieldType
+from pystencils.timeloop import TimeLoop
+
+
+class SparseLatticeBoltzmannStep:
+    """Lattice Boltzmann simulation on compressed, list based storage, where only fluid and boundary cells are stored.
+
+    The counterpart of :class:`lbmpy.lbstep.LatticeBoltzmannStep` for sparse domains like porous media. The
+    mapping between cells and list entries is built from a flag field, see :class:`lbmpy.sparse.SparseLbMapper`.
+    No-slip boundaries are handled by the pull index array, all other boundaries by boundary kernels over index
+    arrays, see :class:`lbmpy.sparse.SparseLbBoundaryMapper`. Velocity and density are computed and scattered back
+    to dense arrays only when they are accessed. With the streaming pattern 'aa' of the lbm_config the pdfs are
+    streamed in place, which requires only a single pdf array.
+
+    Args:
+        flag_arr: integer array including ghost layers, marking fluid and boundary cells. Cells in the ghost layers
+                  without flag are periodic.
+        fluid_flag: flag marking the fluid cells
+        boundaries: dict mapping flags to boundary objects
+        ghost_layers: number of ghost layers of the flag array
+        cell_order: order of the cells in the compressed arrays, see :class:`lbmpy.sparse.SparseLbMapper`
+        interface_mask: cells with these flags are stored like boundary cells and serve as neighbors of fluid
+                        cells, but they are not updated. Their pdfs have to be set from outside before each time
+                        step, see :class:`lbmpy.sparse.HybridLatticeBoltzmannStep`
+        mapping_file: if given, the mapping, the pull index array and the index arrays of boundaries without
+                      additional data are loaded from this file, see :meth:`lbmpy.sparse.SparseLbMapper.load`.
+                      If the file does not exist or belongs to a different geometry, they are created and saved
+                      to the file, so repeated runs on the same geometry skip the preprocessing.
+        kernel_params: parameters passed to all kernels, e.g. for symbolic relaxation rates
+        lbm_config: see :class:`lbmpy.creationfunctions.LBMConfig`
+        lbm_optimisation: see :class:`lbmpy.creationfunctions.LBMOptimisation`
+        config: see :class:`pystencils.CreateKernelConfig`, only CPU targets are supported
+        method_parameters: parameters of :class:`lbmpy.creationfunctions.LBMConfig`, if no lbm_config is given
+
+    Examples:
+        >>> from lbmpy.boundaries import NoSlip
+        >>> flag_arr = np.ones((12, 8), dtype=np.uint16)
+        >>> flag_arr[:, 0] = flag_arr[:, -1] = 2
+        >>> flag_arr[0, 1:-1] = flag_arr[-1, 1:-1] = 0  # periodic in x
+        >>> step = SparseLatticeBoltzmannStep(flag_arr, fluid_flag=1, boundaries={2: NoSlip()},
+        ...                                   relaxation_rate=1.8, force=(1e-6, 0))
+        >>> step.run(10)
+        >>> step.velocity.shape
+        (10, 6, 2)
+    """
+
+    def __init__(self, flag_arr, fluid_flag, boundaries=MappingProxyType({}), ghost_layers=1, cell_order=None,
+                 interface_mask=0, mapping_file=None, kernel_params=MappingProxyType({}), lbm_config=None,
+                 lbm_optimisation=None, config=None, **method_parameters):
+        lbm_config, lbm_optimisation, config = update_with_default_parameters(method_parameters, {},
+                                                                              lbm_config, lbm_optimisation, config)
+        if config.target != Target.CPU:
+            raise NotImplementedError("The sparse lattice Boltzmann step supports only CPU targets")
+
+        no_slip_mask = 0
+        other_boundary_mask = interface_mask
+        for flag, boundary in boundaries.items():
+            if type(boundary) is NoSlip:
+                no_slip_mask |= flag
+            else:
+                other_boundary_mask |= flag
+
+        collision_rule = create_lb_collision_rule(lbm_config=lbm_config, lbm_optimisation=lbm_optimisation)
+        self.method = collision_rule.method
+        self.kernel_params = kernel_params.copy()
+        self._ghost_layers = ghost_layers
+        self._flag_arr = flag_arr
+
+        self.mapping = SparseLbMapper(self.method.stencil, flag_arr, fluid_flag, no_slip_mask, other_boundary_mask,
+                                      cell_order)
+        self._streaming_pattern = lbm_config.streaming_pattern
+        if self._streaming_pattern not in ('pull', 'aa'):
+            raise ValueError("The sparse lattice Boltzmann step supports only the 'pull' and 'aa' streaming patterns")
+        saved_index_arrays = self._load_mapping(mapping_file)
+        index_arrays = dict(saved_index_arrays)
+        index_arr_name = f'{self._streaming_pattern}_{ghost_layers}'
+        if index_arr_name not in index_arrays:
+            index_arrays[index_arr_name] = self.mapping.create_index_array(ghost_layers, self._streaming_pattern)
+        self._index_arr = index_arrays[index_arr_name]
+        num_fluid_cells = self.mapping.num_fluid_cells
+        q = len(self.method.stencil)
+        dim = self.method.dim
+        dtype = config.data_type.default_factory().numpy_dtype
+
+        # fluid cells are stored first, followed by the boundary cells that are written by the boundary kernels
+        self._pdf_arr = np.zeros((len(self.mapping), q), dtype=dtype, order='f')
+        self._pdf_arr_tmp = np.zeros_like(self._pdf_arr) if self._streaming_pattern == 'pull' else None
+        self._pdf_arrays = (self._pdf_arr, self._pdf_arr_tmp)
+        self._parity = 0
+        self._density_arr = np.ones(num_fluid_cells, dtype=dtype)
+        self._velocity_arr = np.zeros((num_fluid_cells, dim), dtype=dtype, order='f')
+
+        pdf_field = Field.create_generic('pdfs', spatial_dimensions=1, index_shape=(q,), dtype=dtype,
+                                         field_type=FieldType.CUSTOM)
+        pdf_field_tmp = Field.create_generic('pdfs_tmp', spatial_dimensions=1, index_shape=(q,), dtype=dtype)
+        index_field = Field.create_generic('idx', spatial_dimensions=1, index_shape=(q - 1,),
+                                           dtype=self._index_arr.dtype)
+        density_field = Field.create_generic('rho', spatial_dimensions=1, dtype=dtype)
+        velocity_field = Field.create_generic('u', spatial_dimensions=1, index_shape=(dim,), dtype=dtype)
+        kernel_config = replace(config, ghost_layers=((0, 0),))
+
+        # kernels are stored by the parity of the time step they belong to, the boundary kernels run before the
+        # stream-collide kernel of the time step. The AA pattern alternates between even and odd kernels
+        if self._streaming_pattern == 'pull':
+            self._timestep = Timestep.BOTH
+            timesteps = {Timestep.BOTH: 'stream_pull_collide'}
+        else:
+            self._timestep = Timestep.EVEN
+            timesteps = {Timestep.EVEN: 'aa_even', Timestep.ODD: 'aa_odd'}
+        self._timestep_of_parity = (self._timestep, self._timestep.next())
+
+        # in-place updates are independent per cell, but the accesses through the index array cannot be checked
+        in_place = self._streaming_pattern == 'aa'
+        write_kernel_config = replace(kernel_config, skip_independence_check=in_place, allow_double_writes=in_place)
+
+        self._lbm_kernels, self._getter_kernels, self._setter_kernels = {}, {}, {}
+        self._boundary_kernels = {timestep: [] for timestep in timesteps}
+        for timestep, kernel_type in timesteps.items():
+            update_rule = create_lb_update_rule_sparse(collision_rule, pdf_field, pdf_field_tmp, index_field,
+                                                       kernel_type)
+            self._lbm_kernels[timestep] = create_kernel(update_rule, config=write_kernel_config).compile()
+
+            # macroscopic values are read and set where the previous kernel stored the post-collision pdfs
+            prev_kernel_type = timesteps[timestep.next()]
+            getter_eqs = create_macroscopic_value_getter_sparse(self.method, pdf_field,
+                                                                {'density': density_field, 'velocity': velocity_field},
+                                                                index_field, prev_kernel_type)
+            self._getter_kernels[timestep] = create_kernel(getter_eqs, config=kernel_config).compile()
+            setter_eqs = create_macroscopic_value_setter_sparse(self.method, pdf_field, density_field.center,
+                                                                velocity_field.center_vector, index_field,
+                                                                prev_kernel_type)
+            self._setter_kernels[timestep] = create_kernel(setter_eqs, config=write_kernel_config).compile()
+
+        for flag, boundary in boundaries.items():
+            if type(boundary) is NoSlip:
+                continue
+            # index arrays with additional data depend on the boundary object, not only on the geometry, and the
+            # layout of the index array depends on the type of the boundary
+            boundary_index_arr_name = f'boundary_{flag}_{type(boundary).__name__}_{self._streaming_pattern}_' \
+                                      f'{ghost_layers}'
+            boundary_index_arr = index_arrays.get(boundary_index_arr_name) if not boundary.additional_data else None
+            for timestep in timesteps:
+                boundary_mapper = SparseLbBoundaryMapper(boundary, self.method, pdf_field, self._streaming_pattern,
+                                                         prev_timestep=timestep.next())
+                if boundary_index_arr is not None and boundary_index_arr.dtype != boundary_mapper.index_field_dtype:
+                    boundary_index_arr = None
+                if boundary_index_arr is None:
+                    boundary_index_arr = boundary_mapper.create_index_arr(self.mapping, flag, ghost_layers)
+                    if not boundary.additional_data:
+                        index_arrays[boundary_index_arr_name] = boundary_index_arr
+                if len(boundary_index_arr) == 0:
+                    break
+                kernel = boundary_mapper.create_kernel(cpu_openmp=config.cpu_openmp).compile()
+                self._boundary_kernels[timestep].append((kernel, boundary_index_arr))
+
+        if mapping_file is not None and any(saved_index_arrays.get(n) is not a for n, a in index_arrays.items()):
+            self.mapping.save(mapping_file, index_arrays)
+
+        self.set_pdf_fields_from_macroscopic_values()
+        self.time_steps_run = 0
+
+    @property
+    def flag_array(self):
+        return self._flag_arr
+
+    @property
+    def number_of_fluid_cells(self):
+        return self.mapping.num_fluid_cells
+
+    @property
+    def pdf_array(self):
+        """Compressed pdf array of shape (number of stored cells, Q), fluid cells first. For the 'aa' streaming
+        pattern, the post-collision pdfs are stored inverted after an odd number of time steps and in the neighbor
+        cells after an even number of time steps."""
+        return self._pdf_arr
+
+    @property
+    def density(self):
+        """Dense density array without ghost layers, NaN outside of the fluid"""
+        self._compute_macroscopic_values()
+        return self._scatter(self._density_arr)
+
+    @property
+    def velocity(self):
+        """Dense velocity array without ghost layers, NaN outside of the fluid"""
+        self._compute_macroscopic_values()
+        return self._scatter(self._velocity_arr)
+
+    def set_pdf_fields_from_macroscopic_values(self, density=None, velocity=None):
+        """Initializes the pdfs in equilibrium. The density and velocity can be given for all fluid cells, either as
+        dense arrays without ghost layers or as compressed arrays in the order of the fluid cells. Without
+        arguments the last computed macroscopic values are used, initially density 1 and velocity 0."""
+        if density is not None:
+            self._density_arr[:] = self._gather(np.asarray(density))
+        if velocity is not None:
+            self._velocity_arr[:] = self._gather(np.asarray(velocity))
+        self._setter_kernels[self._timestep](pdfs=self._fluid_part(self._pdf_arr), idx=self._index_arr,
+                                             rho=self._density_arr, u=self._velocity_arr, **self.kernel_params)
+
+    def time_step(self):
+        timestep = self._timestep
+        self._run_boundary_kernels(timestep, self._pdf_arr)
+        self._lbm_kernels[timestep](pdfs=self._fluid_part(self._pdf_arr), idx=self._index_arr,
+                                    **self._tmp_arguments(self._pdf_arr_tmp), **self.kernel_params)
+        if self._streaming_pattern == 'pull':
+            self._pdf_arr, self._pdf_arr_tmp = self._pdf_arr_tmp, self._pdf_arr
+        self._timestep = timestep.next()
+        self._parity = 1 - self._parity
+
+    def get_time_loop(self):
+        fixed_loop = TimeLoop(steps=2)
+        fixed_loop.add_single_step_function(self.time_step)
+        step_calls = []
+        for parity, timestep in enumerate(self._timestep_of_parity):
+            src, dst = self._pdf_arrays
+            if parity == 1 and self._streaming_pattern == 'pull':
+                src, dst = dst, src
+            calls = [(kernel, {'pdfs': src, 'idx': self._index_arr, 'indexField': boundary_index_arr,
+                               **self.kernel_params})
+                     for kernel, boundary_index_arr in self._boundary_kernels[timestep]]
+            lbm_arguments = {'pdfs': self._fluid_part(src), 'idx': self._index_arr, **self._tmp_arguments(dst),
+                             **self.kernel_params}
+            calls.append((self._lbm_kernels[timestep], lbm_arguments))
+            step_calls.append(calls)
+
+        def two_time_steps():
+            # arrays and kernels are chosen when the loop runs, single time steps in between change the parity
+            for function, arguments in step_calls[self._parity] + step_calls[1 - self._parity]:
+                function(**arguments)
+
+        fixed_loop.add_call(two_time_steps, {})
+        return fixed_loop
+
+    def run(self, time_steps):
+        time_loop = self.get_time_loop()
+        time_loop.run(time_steps)
+        self.time_steps_run += time_loop.time_steps_run
+
+    def benchmark_run(self, time_steps):
+        """Runs the given number of time steps (rounded up to an even number) and returns the MLUPS,
+        counting only fluid cells"""
+        time_loop = self.get_time_loop()
+        duration_of_time_step = time_loop.benchmark_run(time_steps)
+        self.time_steps_run += time_loop.time_steps_run
+        return self.number_of_fluid_cells / duration_of_time_step * 1e-6
+
+    def benchmark(self, time_for_benchmark=5, init_time_steps=2, number_of_time_steps_for_estimation='auto'):
+        time_loop = self.get_time_loop()
+        duration_of_time_step = time_loop.benchmark(time_for_benchmark, init_time_steps,
+                                                    number_of_time_steps_for_estimation)
+        self.time_steps_run += time_loop.time_steps_run
+        return self.number_of_fluid_cells / duration_of_time_step * 1e-6
+
+    # ------------------------------------------ Helper Functions -------------------------------------------------
+
+    def _load_mapping(self, mapping_file):
+        """Loads the mapping and returns the saved index arrays, or an empty dict if there is no matching file"""
+        if mapping_file is None or not os.path.exists(mapping_file):
+            return {}
+        try:
+            return self.mapping.load(mapping_file)
+        except ValueError:
+            return {}
+
+    def _run_boundary_kernels(self, timestep, pdf_arr):
+        for kernel, boundary_index_arr in self._boundary_kernels[timestep]:
+            kernel(pdfs=pdf_arr, idx=self._index_arr, indexField=boundary_index_arr, **self.kernel_params)
+
+    def _tmp_arguments(self, pdf_arr_tmp):
+        return {} if pdf_arr_tmp is None else {'pdfs_tmp': self._fluid_part(pdf_arr_tmp)}
+
+    def _fluid_part(self, arr):
+        return arr[:self.mapping.num_fluid_cells]
+
+    def _compute_macroscopic_values(self):
+        self._getter_kernels[self._timestep](pdfs=self._fluid_part(self._pdf_arr), idx=self._index_arr,
+                                             rho=self._density_arr, u=self._velocity_arr, **self.kernel_params)
+
+    def _fluid_cell_coordinates(self):
+        fluid_coordinates = self.mapping.fluid_coordinates
+        return tuple(fluid_coordinates[name] for name in fluid_coordinates.dtype.names)
+
+    def _interior(self, arr):
+        gl = self._ghost_layers
+        return arr[tuple(slice(gl, s - gl) for s in self._flag_arr.shape)]
+
+    def _scatter(self, values):
+        result = np.full(self._flag_arr.shape + values.shape[1:], np.nan, dtype=values.dtype)
+        result[self._fluid_cell_coordinates()] = values
+        return self._interior(result)
+
+    def _gather(self, values):
+        if values.ndim == 0 or values.shape[0] == self.number_of_fluid_cells:
+            return values
+        gl = self._ghost_layers
+        coordinates = tuple(c.astype(np.int64) - gl for c in self._fluid_cell_coordinates())
+        return values[coordinates]
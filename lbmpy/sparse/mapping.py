@@ -1,13 +1,20 @@
+import hashlib
+import json
+import os
+from types import MappingProxyType
 from typing import Tuple
 
 import numpy as np
 import sympy as sp
 
-from lbmpy.boundaries.boundaryhandling import LbmWeightInfo
-from pystencils import Assignment, Field, TypedSymbol
-from pystencils.boundaries.boundaryhandling import BoundaryOffsetInfo
+from lbmpy.advanced_streaming.utility import Timestep
+from lbmpy.cell_ordering import cell_order
+from pystencils import Assignment, AssignmentCollection, CreateKernelConfig, Field, TypedSymbol, create_kernel, fields
+from pystencils.boundaries.boundaryhandling import BoundaryDataSetter, BoundaryOffsetInfo
 from pystencils.boundaries.createindexlist import (
-    boundary_index_array_coordinate_names, create_boundary_index_list, direction_member_name)
+    boundary_index_array_coordinate_names, create_boundary_index_list, direction_member_name,
+    numpy_data_type_for_boundary_object)
+from pystencils.field import FieldType
 
 
 class SparseLbMapper:
@@ -15,11 +22,20 @@ class SparseLbMapper:
 
     Args:
           flag_arr: integer array where each bit corresponds to a boundary or 'fluid'
+          cell_order: order of the fluid cells and of the boundary cells in the compressed arrays. By default they
+                      are stored in the lexicographic order of the flag array, which can place neighbors far apart
+                      for irregular geometries. 'morton', 'hilbert' or 'rcm' (reverse Cuthill-McKee on the neighbor
+                      graph of the stencil) keep neighbors close, see :func:`lbmpy.cell_ordering.cell_order`
     """
-    def __init__(self, stencil, flag_arr, fluid_flag, no_slip_flag, other_boundary_mask):
+    _FILE_MAGIC = b'LBMPYSPARSEMAP'
+    _FILE_VERSION = 1
+
+    def __init__(self, stencil, flag_arr, fluid_flag, no_slip_flag, other_boundary_mask, cell_order=None):
         self._flag_arr = flag_arr
+        self._cell_order = cell_order
         self._coordinate_arr = None
         self._sorter = None  # array of indices that sort _coordinate_arr
+        self._sorted_linear_indices = None  # linear indices into the flag array of the sorted coordinates
         self._dirty = True
         self.fluid_flag = fluid_flag
         self.no_slip_flag = no_slip_flag
@@ -61,11 +77,10 @@ class SparseLbMapper:
             return self._sorter[left]
 
     def cell_idx_bulk(self, coordinates):
-        coordinates = coordinates.astype(self._coordinate_arr.dtype)
-        left = np.searchsorted(self._coordinate_arr, coordinates, sorter=self._sorter, side='left')
-        right = np.searchsorted(self._coordinate_arr, coordinates, sorter=self._sorter, side='right')
-        left[left + 1 != right] = -1
-        return self._sorter[left]
+        """Maps a structured array of coordinates, like the coordinate array, to list indices.
+        Raises IndexError if a coordinate is not found."""
+        return self._cell_idx_of_cells(np.array([coordinates[name] for name in coordinates.dtype.names],
+                                                dtype=np.int64))
 
     def coordinate(self, cell_idx: int) -> Tuple[np.uint32, ...]:
         """Maps from a cell index to its coordinate.
@@ -84,6 +99,113 @@ class SparseLbMapper:
             self._assemble()
         return len(self._coordinate_arr)
 
+    def geometry_hash(self):
+        """SHA-256 digest of the flag array, the stencil and the flags of the mapping, identifies saved mappings"""
+        flag_arr = np.ascontiguousarray(self._flag_arr)
+        parameters = [flag_arr.shape, flag_arr.dtype.str, [tuple(int(c) for c in d) for d in self.stencil],
+                      int(self.fluid_flag), int(self.no_slip_flag), int(self.other_boundary_mask), self._cell_order]
+        sha = hashlib.sha256(json.dumps(parameters).encode())
+        sha.update(flag_arr.data)
+        return sha.hexdigest()
+
+    def save(self, filename, index_arrays=MappingProxyType({})):
+        """Saves the mapping together with index arrays in a raw binary file, that is memory-mapped by :meth:`load`.
+
+        The file starts with a JSON header holding the geometry hash and the dtype, shape and offset of each array,
+        followed by the raw array data. It is written to a temporary file first and then moved to `filename`, so
+        existing memory maps of a previous version stay valid.
+
+        Args:
+            filename: path of the file
+            index_arrays: dict mapping names to index arrays, e.g. the pull index array of
+                          :meth:`create_index_array` and boundary index arrays
+        """
+        arrays = {'coordinates': self.coordinates, 'sorter': self._sorter}
+        for name, arr in index_arrays.items():
+            if name in arrays:
+                raise ValueError(f"Index array name '{name}' is reserved")
+            arrays[name] = arr
+
+        entries, offset = {}, 0
+        for name, arr in arrays.items():
+            fortran_order = arr.ndim > 1 and arr.flags.f_contiguous
+            entries[name] = {'descr': np.lib.format.dtype_to_descr(arr.dtype), 'shape': arr.shape,
+                             'fortran_order': fortran_order, 'offset': offset}
+            offset = _aligned(offset + arr.nbytes)
+        header = json.dumps({'version': self._FILE_VERSION, 'geometry_hash': self.geometry_hash(),
+                             'num_fluid_cells': int(self.num_fluid_cells), 'arrays': entries}).encode()
+        data_start = _aligned(len(self._FILE_MAGIC) + 8 + len(header))
+
+        tmp_filename = f"{filename}.tmp{os.getpid()}"
+        with open(tmp_filename, 'wb') as f:
+            f.write(self._FILE_MAGIC + np.uint64(len(header)).tobytes() + header)
+            for name, arr in arrays.items():
+                f.seek(data_start + entries[name]['offset'])
+                f.write(arr.tobytes(order='F' if entries[name]['fortran_order'] else 'C'))
+            f.truncate(data_start + offset)
+        os.replace(tmp_filename, filename)
+
+    def load(self, filename):
+        """Loads the mapping and the index arrays from a file written by :meth:`save`.
+
+        The arrays are memory-mapped copy-on-write, so only the parts that are accessed are read and the file is
+        never modified.
+
+        Returns:
+            dict mapping the names of the saved index arrays to the arrays
+
+        Raises:
+            ValueError: if the file is no saved mapping or was saved for a different flag array, stencil or flags
+        """
+        with open(filename, 'rb') as f:
+            magic = f.read(len(self._FILE_MAGIC))
+            if magic != self._FILE_MAGIC:
+                raise ValueError(f"{filename} is no saved sparse mapping")
+            header_length = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            header = json.loads(f.read(header_length))
+        if header['version'] != self._FILE_VERSION:
+            raise ValueError(f"Unsupported version {header['version']} of the saved sparse mapping {filename}")
+        if header['geometry_hash'] != self.geometry_hash():
+            raise ValueError(f"The saved sparse mapping {filename} belongs to a different geometry")
+
+        data_start = _aligned(len(self._FILE_MAGIC) + 8 + header_length)
+        arrays = {}
+        for name, entry in header['arrays'].items():
+            dtype = np.lib.format.descr_to_dtype(_descr_from_json(entry['descr']))
+            shape = tuple(entry['shape'])
+            order = 'F' if entry['fortran_order'] else 'C'
+            if np.prod(shape) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype, order=order)
+            else:
+                arrays[name] = np.memmap(filename, dtype=dtype, mode='c', offset=data_start + entry['offset'],
+                                         shape=shape, order=order)
+
+        self._coordinate_arr = arrays.pop('coordinates')
+        self._sorter = arrays.pop('sorter')
+        self._num_fluid_cells = header['num_fluid_cells']
+        self._sorted_linear_indices = None
+        self._dirty = False
+        return arrays
+
+    def _cell_idx_of_cells(self, cells):
+        """List indices of cells given as integer array of shape (dim, number of cells). The cells are looked up by
+        their linear index into the flag array, the lookup needs memory only for the stored cells."""
+        if self._dirty:
+            self._assemble()
+        if self._sorted_linear_indices is None:
+            coordinates = self._coordinate_arr[self._sorter]
+            self._sorted_linear_indices = np.ravel_multi_index(
+                tuple(coordinates[name].astype(np.int64) for name in coordinates.dtype.names), self._flag_arr.shape)
+        sorted_linear_indices = self._sorted_linear_indices
+        try:
+            linear_indices = np.ravel_multi_index(tuple(cells), self._flag_arr.shape)
+        except ValueError:
+            raise IndexError("Coordinate not found")
+        positions = np.minimum(np.searchsorted(sorted_linear_indices, linear_indices), len(self) - 1)
+        if len(linear_indices) > 0 and (len(self) == 0 or np.any(sorted_linear_indices[positions] != linear_indices)):
+            raise IndexError("Coordinate not found")
+        return self._sorter[positions]
+
     def _assemble(self):
         dim = len(self._flag_arr.shape)
         struct_type = np.dtype([(name, np.uint32) for name in boundary_index_array_coordinate_names[:dim]])
@@ -91,6 +213,9 @@ class SparseLbMapper:
         # Add fluid cells
         coordinates_fluid = np.argwhere(np.bitwise_and(self._flag_arr, self.fluid_flag)).astype(np.uint32)
         coordinates_boundary = np.argwhere(np.bitwise_and(self._flag_arr, self.other_boundary_mask)).astype(np.uint32)
+        if self._cell_order is not None:
+            coordinates_fluid = coordinates_fluid[self._ordering(coordinates_fluid)]
+            coordinates_boundary = coordinates_boundary[self._ordering(coordinates_boundary)]
         self._num_fluid_cells = coordinates_fluid.shape[0]
 
         total_cells = len(coordinates_fluid) + len(coordinates_boundary)
@@ -101,95 +226,207 @@ class SparseLbMapper:
             self._coordinate_arr[d_name][self._num_fluid_cells:] = coordinates_boundary[:, d]
 
         self._sorter = np.argsort(self._coordinate_arr).astype(np.uint32)
+        self._sorted_linear_indices = None
         self._dirty = False
 
-    def create_index_array(self, ghost_layers=1):
-        # TODO support different layouts here
-        stencil = self.stencil
+    def _ordering(self, coordinates):
+        if len(coordinates) == 0:
+            return np.arange(0)
+        return cell_order(coordinates.T, self._cell_order, self._flag_arr.shape, directions=self.stencil)
+
+    def create_index_array(self, ghost_layers=1, streaming_pattern='pull'):
+        """Creates the pull index array of the fluid cells.
 
-        def pdf_index(cell_index, direction_index):
-            return cell_index + direction_index * len(self)
+        For every fluid cell and non-center direction, the entry is the list index of the pdf that is pulled
+        from the neighbor, i.e. cell index + direction index * len(self). Fluid and boundary neighbors are looked
+        up in the mapping, for no-slip neighbors the inverse pdf of the cell itself is used and neighbors in the
+        ghost layers are wrapped periodically.
 
-        def inverse_idx(idx):
-            return stencil.index(tuple(-d_i for d_i in stencil[idx]))
+        For the in-place streaming_pattern 'aa' the direction of each entry is inverted, since the even time step
+        stores the post-collision pdfs inverted in the cell itself. The odd time step reads the pdf of a direction
+        through the entry of the direction and writes it through the entry of the inverse direction, see
+        :func:`lbmpy.sparse.create_lb_update_rule_sparse`.
 
+        Returns:
+            uint32 array of shape (number of fluid cells, number of directions - 1)
+        """
+        # TODO support different layouts here
+        if streaming_pattern not in ('pull', 'aa'):
+            raise ValueError(f"Unsupported streaming pattern '{streaming_pattern}' for sparse index arrays")
+        stencil = self.stencil
         flag_arr = self.flag_array
         no_slip_flag = self.no_slip_flag
         fluid_boundary_mask = self.other_boundary_mask | self.fluid_flag
+        dim = len(flag_arr.shape)
+        coord_names = boundary_index_array_coordinate_names[:dim]
+
+        fluid_coordinates = self.fluid_coordinates
+        cells = np.array([fluid_coordinates[name] for name in coord_names], dtype=np.int64)
+        own_cell_idx = np.arange(self.num_fluid_cells, dtype=np.int64)
+        periodic_extent = np.array([s - 2 * ghost_layers for s in flag_arr.shape], dtype=np.int64)[:, np.newaxis]
+        upper_ghost_layer = np.array([s - ghost_layers for s in flag_arr.shape], dtype=np.int64)[:, np.newaxis]
 
-        result = []
+        # directions are stored contiguously, i.e. the array is the transposed of a (directions, cells) array
+        result = np.empty((len(stencil) - 1, self.num_fluid_cells), dtype=np.uint32).swapaxes(0, 1)
         for direction_idx, direction in enumerate(stencil):
             if all(d_i == 0 for d_i in direction):
                 assert direction_idx == 0
                 continue
-            for own_cell_idx, cell in enumerate(self.fluid_coordinates):
-                inv_neighbor_cell = np.array([cell_i - dir_i for cell_i, dir_i in zip(cell, direction)])
-                if flag_arr[tuple(inv_neighbor_cell)] & fluid_boundary_mask:
-                    neighbor_cell_idx = self.cell_idx(tuple(inv_neighbor_cell))
-                    result.append(pdf_index(neighbor_cell_idx, direction_idx))
-                elif flag_arr[tuple(inv_neighbor_cell)] & no_slip_flag:  # no-slip before periodicity!
-                    result.append(pdf_index(own_cell_idx, inverse_idx(direction_idx)))
-                else:
-                    at_border = False
-                    for i, x_i in enumerate(inv_neighbor_cell):
-                        if x_i == (ghost_layers - 1):
-                            inv_neighbor_cell[i] += flag_arr.shape[i] - (2 * ghost_layers)
-                            at_border = True
-                        elif x_i == flag_arr.shape[i] - ghost_layers:
-                            inv_neighbor_cell[i] -= flag_arr.shape[i] - (2 * ghost_layers)
-                            at_border = True
-                    if at_border:
-                        assert flag_arr[tuple(inv_neighbor_cell)] & fluid_boundary_mask
-                        neighbor_cell_idx = self.cell_idx(tuple(inv_neighbor_cell))
-                        result.append(pdf_index(neighbor_cell_idx, direction_idx))
-                    else:
-                        raise ValueError("Could not find neighbor for {} direction {}".format(cell, direction))
-
-        index_array = np.array(result, dtype=np.uint32)
-        index_arr = index_array.reshape([len(stencil) - 1, self.num_fluid_cells])
-        index_arr = index_arr.swapaxes(0, 1)
-        return index_arr
+            inverse_idx = stencil.index(tuple(-d_i for d_i in direction))
+            inv_neighbor_cells = cells - np.array(direction, dtype=np.int64)[:, np.newaxis]
+            neighbor_flags = flag_arr[tuple(inv_neighbor_cells)]
+
+            is_neighbor = (neighbor_flags & fluid_boundary_mask) != 0
+            is_no_slip = ~is_neighbor & ((neighbor_flags & no_slip_flag) != 0)  # no-slip before periodicity!
+            is_periodic = ~is_neighbor & ~is_no_slip
+
+            periodic_cells = inv_neighbor_cells[:, is_periodic]
+            at_lower_border = periodic_cells == ghost_layers - 1
+            at_upper_border = periodic_cells == upper_ghost_layer
+            periodic_cells = periodic_cells + periodic_extent * at_lower_border - periodic_extent * at_upper_border
+            at_border = np.any(at_lower_border | at_upper_border, axis=0)
+            is_valid = at_border & ((flag_arr[tuple(periodic_cells)] & fluid_boundary_mask) != 0)
+            if not np.all(is_valid):
+                first_invalid = np.flatnonzero(is_periodic)[~is_valid][0]
+                raise ValueError("Could not find neighbor for {} direction {}".format(
+                    fluid_coordinates[first_invalid], direction))
+            inv_neighbor_cells[:, is_periodic] = periodic_cells
+
+            neighbor_cell_idx = own_cell_idx.copy()
+            neighbor_cell_idx[~is_no_slip] = self._cell_idx_of_cells(inv_neighbor_cells[:, ~is_no_slip])
+            if streaming_pattern == 'aa':
+                pdf_direction_idx = np.where(is_no_slip, direction_idx, inverse_idx)
+            else:
+                pdf_direction_idx = np.where(is_no_slip, inverse_idx, direction_idx)
+            result[:, direction_idx - 1] = neighbor_cell_idx + pdf_direction_idx * len(self)
+
+        return result
 
 
 class SparseLbBoundaryMapper:
+    """Creates boundary kernels for list based sparse storage, which run over index arrays of boundary links.
+
+    Args:
+        boundary: boundary object, see :mod:`lbmpy.boundaries`
+        method: lattice Boltzmann method
+        pdf_field_sparse: custom field of the compressed pdf array, see :class:`SparseLbMapper`
+        streaming_pattern: 'pull' for two pdf arrays or 'aa' for in-place streaming with the index array created by
+                           :meth:`SparseLbMapper.create_index_array` with streaming_pattern='aa'
+        prev_timestep: for 'aa' streaming, the parity of the kernel that ran before the boundary kernel
+    """
     NEIGHBOR_IDX_NAME = 'nidx{}'
+    CELL_IDX_NAME = 'cell'
     DIR_SYMBOL = TypedSymbol("dir", np.uint32)
 
-    def __init__(self, boundary, method, pdf_field_sparse):
-        full_pdf_field = Field.create_generic('pdfFull', spatial_dimensions=method.dim, index_dimensions=1)
-
-        additional_data_field = Field.create_generic('additionalData', spatial_dimensions=1,
-                                                     dtype=boundary.additional_data)
-        boundary_eqs = boundary(full_pdf_field, self.DIR_SYMBOL, method, additional_data_field)
-        neighbor_offsets = {fa.offsets for eq in boundary_eqs for fa in eq.atoms(Field.Access)}
-        neighbor_offsets = list(neighbor_offsets)
-
-        neighbor_offsets_dtype = [(self.NEIGHBOR_IDX_NAME.format(i), np.uint32)
-                                  for i in range(len(neighbor_offsets))]
-
-        index_field_dtype = np.dtype([('dir', np.uint32),
-                                      *neighbor_offsets_dtype,
-                                      *boundary.additional_data])
-        index_field = Field.create_generic('indexField', spatial_dimensions=1, dtype=index_field_dtype)
-        boundary_eqs = boundary(full_pdf_field, self.DIR_SYMBOL, method, index_field)
-
-        offset_subs = {off: sp.Symbol(self.NEIGHBOR_IDX_NAME.format(i)) for i, off in enumerate(neighbor_offsets)}
-
-        new_boundary_eqs = []
-        for eq in boundary_eqs:
-            substitutions = {
-                fa: pdf_field_sparse.absolute_access([index_field(offset_subs[fa.offsets].name)], fa.index)
-                for fa in eq.atoms(Field.Access)
-                if fa.field == full_pdf_field
-            }
-            new_boundary_eqs.append(eq.subs(substitutions))
-
+    def __init__(self, boundary, method, pdf_field_sparse, streaming_pattern='pull', prev_timestep=Timestep.BOTH):
+        if streaming_pattern not in ('pull', 'aa'):
+            raise ValueError(f"Unsupported streaming pattern '{streaming_pattern}' for sparse boundaries")
+        if streaming_pattern == 'aa' and prev_timestep not in (Timestep.EVEN, Timestep.ODD):
+            raise ValueError("In-place streaming requires the parity of the previous time step")
+        dim = method.dim
+        q = len(method.stencil)
+        full_pdf_field = Field.create_generic('pdfFull', spatial_dimensions=dim, index_dimensions=1)
+        f_out, f_in = fields(f"f_out({q}), f_in({q}): [{dim}D]")
+        inv_dir = sp.IndexedBase(BoundaryOffsetInfo.INV_DIR_SYMBOL, shape=(1,))
+
+        # the boundary reads the pdfs of the fluid cell and writes into the boundary cell the link points to
+        link_offset = BoundaryOffsetInfo.offset_from_dir(self.DIR_SYMBOL, dim)
+
+        def to_full_pdf_field(field_access):
+            offset = link_offset if field_access.field == f_in else (0,) * dim
+            return full_pdf_field[offset](*field_access.index)
+
+        def boundary_assignments(index_field, to_pdf_field):
+            assignments = boundary(f_out, f_in, self.DIR_SYMBOL, inv_dir, method, index_field)
+            if isinstance(assignments, Assignment):
+                assignments = [assignments]
+            if isinstance(assignments, AssignmentCollection):
+                assignments = assignments.all_assignments
+            result = []
+            for eq in assignments:
+                result.append(eq.subs({fa: to_pdf_field(fa) for fa in eq.atoms(Field.Access)
+                                       if fa.field in (f_out, f_in)}))
+            return result
+
+        if streaming_pattern == 'aa':
+            index_field_dtype = np.dtype([('dir', np.uint32), (self.CELL_IDX_NAME, np.uint32),
+                                          *boundary.additional_data])
+            index_field = Field.create_generic('indexField', spatial_dimensions=1, dtype=index_field_dtype)
+            to_sparse_pdf_field = self._aa_pdf_accesses(method.stencil, pdf_field_sparse, index_field,
+                                                        prev_timestep, f_out)
+            boundary_eqs = new_boundary_eqs = boundary_assignments(index_field, to_sparse_pdf_field)
+            neighbor_offsets = []
+        else:
+            additional_data_field = Field.create_generic('additionalData', spatial_dimensions=1,
+                                                         dtype=numpy_data_type_for_boundary_object(boundary, dim))
+            boundary_eqs = boundary_assignments(additional_data_field, to_full_pdf_field)
+            neighbor_offsets = {fa.offsets for eq in boundary_eqs for fa in eq.atoms(Field.Access)
+                                if fa.field == full_pdf_field}
+            neighbor_offsets = sorted(neighbor_offsets, key=str)
+
+            neighbor_offsets_dtype = [(self.NEIGHBOR_IDX_NAME.format(i), np.uint32)
+                                      for i in range(len(neighbor_offsets))]
+
+            index_field_dtype = np.dtype([('dir', np.uint32),
+                                          *neighbor_offsets_dtype,
+                                          *boundary.additional_data])
+            index_field = Field.create_generic('indexField', spatial_dimensions=1, dtype=index_field_dtype)
+            boundary_eqs = boundary_assignments(index_field, to_full_pdf_field)
+
+            offset_subs = {off: sp.Symbol(self.NEIGHBOR_IDX_NAME.format(i))
+                           for i, off in enumerate(neighbor_offsets)}
+
+            new_boundary_eqs = []
+            for eq in boundary_eqs:
+                substitutions = {
+                    fa: pdf_field_sparse.absolute_access([index_field(offset_subs[fa.offsets].name)], fa.index)
+                    for fa in eq.atoms(Field.Access)
+                    if fa.field == full_pdf_field
+                }
+                new_boundary_eqs.append(eq.subs(substitutions))
+
+        self.boundary = boundary
         self.boundary_eqs = new_boundary_eqs
         self.boundary_eqs_orig = boundary_eqs
         self.method = method
         self.index_field_dtype = index_field_dtype
         self.neighbor_offsets = neighbor_offsets
         self.index_field = index_field
+        self._neighbor_offset_tables = self._create_neighbor_offset_tables()
+
+    def _aa_pdf_accesses(self, stencil, pdf_field_sparse, index_field, prev_timestep, f_out):
+        """Maps the accesses of the boundary to the in-place pdf array. After an even step the post-collision
+        pdfs of a cell are stored inverted in the cell itself, and the pdfs streaming into the cell are read by the
+        odd step through the index array. After an odd step the post-collision pdfs are stored in the neighbors,
+        at the locations the index array points to for the inverse directions, and the pdfs of the next step in
+        the cell itself."""
+        q = len(stencil)
+        idx_field = Field.create_generic('idx', spatial_dimensions=1, index_shape=(q - 1,), dtype=np.uint32,
+                                         field_type=FieldType.CUSTOM)
+        cell = index_field(self.CELL_IDX_NAME)
+
+        def inverse(i):
+            if isinstance(i, int):
+                return stencil.index(tuple(-d_i for d_i in stencil[i]))
+            return BoundaryOffsetInfo.inv_dir(i)
+
+        def own_cell(i):
+            return pdf_field_sparse.absolute_access((cell,), (i,))
+
+        def odd_read(i):
+            if i == 0:
+                return own_cell(0)
+            return pdf_field_sparse.absolute_access((idx_field.absolute_access((cell,), (i - 1,)),), ())
+
+        def to_sparse_pdf_field(field_access):
+            i = field_access.index[0]
+            i = int(i) if isinstance(i, (int, sp.Integer)) else i
+            if prev_timestep == Timestep.EVEN:
+                return own_cell(inverse(i)) if field_access.field == f_out else odd_read(i)
+            else:
+                return odd_read(inverse(i)) if field_access.field == f_out else own_cell(i)
+
+        return to_sparse_pdf_field
 
     def _build_substitutions(self):
         dim = self.method.dim
@@ -204,6 +441,14 @@ class SparseLbBoundaryMapper:
             subs_dict[BoundaryOffsetInfo.inv_dir(self.DIR_SYMBOL)] = inv_idx
         return result
 
+    def _create_neighbor_offset_tables(self):
+        """Evaluates the symbolic neighbor offsets for all stencil directions, once per boundary and method.
+        Returns one integer array of shape (Q, dim) per neighbor offset."""
+        substitutions = self._build_substitutions()
+        return [np.array([[int(sp.sympify(e).subs(substitution)) for e in neighbor_offset]
+                          for substitution in substitutions], dtype=np.int64)
+                for neighbor_offset in self.neighbor_offsets]
+
     def create_index_arr(self, mapping: SparseLbMapper, boundary_mask, nr_of_ghost_layers=1):
         stencil = self.method.stencil
         flag_dtype = mapping.flag_array.dtype.type
@@ -218,21 +463,45 @@ class SparseLbBoundaryMapper:
         coord_names = boundary_index_array_coordinate_names[:dim]
         center_coordinates = idx_arr[coord_names]
 
-        substitutions = self._build_substitutions()
-        for j, neighbor_offset in enumerate(self.neighbor_offsets):
+        if self.CELL_IDX_NAME in self.index_field_dtype.names:
+            result[self.CELL_IDX_NAME] = mapping.cell_idx_bulk(center_coordinates)
+
+        for j, offsets in enumerate(self._neighbor_offset_tables):
             neighbor_coordinates = center_coordinates.copy()
-            offsets = np.array([tuple(int(sp.sympify(e).subs(substitution)) for e in neighbor_offset)
-                                for substitution in substitutions])
             for i, coord_name in enumerate(coord_names):
                 neighbor_coordinates[coord_name] += offsets[:, i][idx_arr['dir']]
             result[self.NEIGHBOR_IDX_NAME.format(j)] = mapping.cell_idx_bulk(neighbor_coordinates)
 
         result[direction_member_name] = idx_arr[direction_member_name]
-        # Find neighbor indices
+
+        if self.boundary.additional_data and self.boundary.additional_data_init_callback:
+            data_idx_arr = np.zeros(idx_arr.shape, dtype=numpy_data_type_for_boundary_object(self.boundary, dim))
+            for name in idx_arr.dtype.names:
+                data_idx_arr[name] = idx_arr[name]
+            data_setter = BoundaryDataSetter(data_idx_arr, (0,) * dim, stencil, nr_of_ghost_layers, np.empty(0))
+            self.boundary.additional_data_init_callback(data_setter)
+            for name, _ in self.boundary.additional_data:
+                result[name] = data_idx_arr[name]
         return result
 
     def assignments(self):
         return [BoundaryOffsetInfo(self.method.stencil),
-                LbmWeightInfo(self.method),
+                *self.boundary.get_additional_code_nodes(self.method),
                 Assignment(self.DIR_SYMBOL, self.index_field(self.DIR_SYMBOL.name)),
                 *self.boundary_eqs]
+
+    def create_kernel(self, **kernel_creation_args):
+        """Creates the boundary kernel, that runs over the index array created by :meth:`create_index_arr`"""
+        config = CreateKernelConfig(ghost_layers=0, skip_independence_check=True, **kernel_creation_args)
+        return create_kernel(self.assignments(), config=config)
+
+
+def _aligned(offset, alignment=64):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _descr_from_json(descr):
+    """JSON turns the field tuples of structured dtype descriptions into lists, numpy expects tuples"""
+    if isinstance(descr, str):
+        return descr
+    return [(name, _descr_from_json(fmt), *(tuple(s) for s in shape)) for name, fmt, *shape in descr]
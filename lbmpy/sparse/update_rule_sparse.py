@@ -1,6 +1,7 @@
 from pystencils import Assignment, AssignmentCollection
 # noinspection PyProtectedMember
 from pystencils.field import Field, FieldType, compute_strides
+from pystencils.simp import add_subexpressions_for_field_reads
 
 AC = AssignmentCollection
 
@@ -22,19 +23,32 @@ def create_symbolic_list(name, num_cells, values_per_cell, dtype, layout='AoS'):
 def create_lb_update_rule_sparse(collision_rule, src, dst, idx, kernel_type='stream_pull_collide') -> AC:
     """Creates a update rule from a collision rule using compressed pdf storage and two (src/dst) arrays.
 
+    The in-place AA pattern needs only a single pdf array: the even time step ('aa_even') collides in place and
+    stores the post-collision pdfs in the inverse slots of the cell, the odd time step ('aa_odd') reads and writes
+    the pdfs of the neighbors through the index array, which has to be created with streaming_pattern 'aa', see
+    :meth:`lbmpy.sparse.SparseLbMapper.create_index_array`.
+
     Args:
         collision_rule: arbitrary collision rule, e.g. created with create_lb_collision_rule
-        src: symbolic field to read from
-        dst: symbolic field to write to
+        src: symbolic field to read from, for the AA pattern the only pdf field
+        dst: symbolic field to write to, ignored for the AA pattern
         idx: symbolic index field
-        kernel_type: one of 'stream_pull_collide', 'collide_only' or 'stream_pull_only'
+        kernel_type: one of 'stream_pull_collide', 'collide_only', 'stream_pull_only', 'aa_even' or 'aa_odd'
     Returns:
         update rule
     """
-    assert kernel_type in ('stream_pull_collide', 'collide_only', 'stream_pull_only')
+    assert kernel_type in ('stream_pull_collide', 'collide_only', 'stream_pull_only', 'aa_even', 'aa_odd')
     method = collision_rule.method
     q = len(method.stencil)
 
+    if kernel_type in ('aa_even', 'aa_odd'):
+        read, write = _aa_accesses(method.stencil, src, idx, odd=kernel_type == 'aa_odd')
+        symbol_subs = dict(zip(method.pre_collision_pdf_symbols, read))
+        symbol_subs.update(zip(method.post_collision_pdf_symbols, write))
+        result = collision_rule.new_with_substitutions(symbol_subs)
+        # all pdfs have to be loaded before the first one is overwritten
+        return add_subexpressions_for_field_reads(result, subexpressions=True, main_assignments=True)
+
     symbol_subs = _list_substitutions(method, src, idx)
 
     if kernel_type == 'stream_pull_only':
@@ -51,20 +65,26 @@ def create_lb_update_rule_sparse(collision_rule, src, dst, idx, kernel_type='str
         return collision_rule.new_with_substitutions(symbol_subs)
 
 
-def create_macroscopic_value_getter_sparse(method, pdfs, output_descriptor) -> AC:
+def create_macroscopic_value_getter_sparse(method, pdfs, output_descriptor, idx=None,
+                                           kernel_type='stream_pull_collide') -> AC:
     """Returns assignment collection with assignments to compute density and/or velocity.
 
     Args:
         method: lb method
         pdfs: symbolic pdf field
         output_descriptor: see `output_equations_from_pdfs`
+        idx: symbolic index field, only required for kernel_type 'aa_odd'
+        kernel_type: the pdfs are read where the update rule of this kernel type stores the post-collision pdfs,
+                     for the AA pattern 'aa_even' after an even and 'aa_odd' after an odd time step or initially
     """
     cqc = method.conserved_quantity_computation
-    getter_eqs = cqc.output_equations_from_pdfs(pdfs.center_vector, output_descriptor)
+    getter_eqs = cqc.output_equations_from_pdfs(_post_collision_pdfs(method.stencil, pdfs, idx, kernel_type),
+                                                output_descriptor)
     return getter_eqs
 
 
-def create_macroscopic_value_setter_sparse(method, pdfs, density, velocity) -> AC:
+def create_macroscopic_value_setter_sparse(method, pdfs, density, velocity, idx=None,
+                                           kernel_type='stream_pull_collide') -> AC:
     """Returns assignment collection to set a pdf array to equilibrium with given density and velocity.
 
     Args:
@@ -72,11 +92,14 @@ def create_macroscopic_value_setter_sparse(method, pdfs, density, velocity) -> A
         pdfs: symbolic pdf field
         density: True to read density from array, or for spatially constant density a single symbol/value
         velocity: similar to density parameter
+        idx: see `create_macroscopic_value_getter_sparse`
+        kernel_type: see `create_macroscopic_value_getter_sparse`
     """
     cqc = method.conserved_quantity_computation
     inp_eqs = cqc.equilibrium_input_equations_from_init_values(density, velocity, force_substitution=False)
     result = method.get_equilibrium(conserved_quantity_equations=inp_eqs)
-    substitutions = {a: b for a, b in zip(method.post_collision_pdf_symbols, pdfs.center_vector)}
+    pdf_accesses = _post_collision_pdfs(method.stencil, pdfs, idx, kernel_type)
+    substitutions = {a: b for a, b in zip(method.post_collision_pdf_symbols, pdf_accesses)}
     return result.new_with_substitutions(substitutions).new_without_subexpressions()
 
 
@@ -93,3 +116,20 @@ def _list_substitutions(method, src, idx, store_center=False):
         result[method.pre_collision_pdf_symbols[0]] = src(0)
 
     return result
+
+
+def _aa_accesses(stencil, pdfs, idx, odd):
+    """Reads and writes of the AA pattern, the odd step reads through the index entry of a direction and writes
+    through the entry of the inverse direction."""
+    inverse = [stencil.inverse_index(d) for d in stencil]
+    if not odd:
+        return [pdfs(i) for i in range(len(stencil))], [pdfs(inverse[i]) for i in range(len(stencil))]
+    read = [pdfs(0)] + [pdfs.absolute_access((idx(i - 1),), ()) for i in range(1, len(stencil))]
+    write = [pdfs(0)] + [pdfs.absolute_access((idx(inverse[i] - 1),), ()) for i in range(1, len(stencil))]
+    return read, write
+
+
+def _post_collision_pdfs(stencil, pdfs, idx, kernel_type):
+    if kernel_type in ('aa_even', 'aa_odd'):
+        return _aa_accesses(stencil, pdfs, idx, odd=kernel_type == 'aa_odd')[1]
+    return pdfs.center_vector
@@ -1,3 +1,5 @@
+import itertools
+
 import pystencils as ps
 
 import numpy as np
@@ -6,8 +8,9 @@ from lbmpy.stencils import LBStencil
 from pystencils.slicing import get_slice_before_ghost_layer, get_ghost_region_slice
 from lbmpy.creationfunctions import create_lb_update_rule, LBMConfig, LBMOptimisation
 from lbmpy.advanced_streaming.communication import get_communication_slices, _fix_length_one_slices, \
-    LBMPeriodicityHandling
-from lbmpy.advanced_streaming.utility import streaming_patterns, Timestep
+    LBMPeriodicityHandling, get_block_neighbors, exchange_between_blocks, NON_PERIODIC_BORDER
+from lbmpy.advanced_streaming.utility import streaming_patterns, get_timesteps, is_inplace, Timestep
+from pystencils.datahandling.blockiteration import SerialBlock
 from lbmpy.enums import Stencil
 
 import pytest
@@ -125,3 +128,260 @@ def test_optimised_and_full_communication_equivalence(stencil_name):
             for j in range(gl, domain_size[1]):
                 for f in range(len(stencil)):
                     assert dh.cpu_arrays['pdf'][i, j, f] == pdf_full_communication[i, j, f]
+
+
+@pytest.mark.parametrize('stencil_name', [Stencil.D2Q9, Stencil.D3Q27])
+@pytest.mark.parametrize('streaming_pattern', streaming_patterns)
+@pytest.mark.parametrize('layout', ['fzyx', 'zyxf'])
+def test_compiled_and_numpy_periodicity_equivalence(stencil_name, streaming_pattern, layout):
+    stencil = LBStencil(stencil_name)
+    dh = ps.create_data_handling((6, 5, 4)[:stencil.D], periodicity=True, default_target=ps.Target.CPU,
+                                 default_layout=layout)
+    dh.add_array('pdfs', values_per_cell=stencil.Q)
+    initial = np.random.default_rng(42).random(dh.cpu_arrays['pdfs'].shape)
+
+    results = []
+    for cpu_compiled_copy in (False, True):
+        handling = LBMPeriodicityHandling(stencil, dh, 'pdfs', streaming_pattern=streaming_pattern,
+                                          cpu_compiled_copy=cpu_compiled_copy, cpu_openmp=cpu_compiled_copy)
+        for timestep in get_timesteps(streaming_pattern):
+            dh.cpu_arrays['pdfs'][:] = initial
+            handling(timestep)
+            results.append(dh.cpu_arrays['pdfs'].copy())
+
+    num_results = len(results) // 2
+    assert not np.array_equal(results[0], initial)
+    for numpy_result, compiled_result in zip(results[:num_results], results[num_results:]):
+        np.testing.assert_equal(compiled_result, numpy_result)
+
+
+@pytest.mark.parametrize('stencil_name, domain_size, block_size', [(Stencil.D2Q9, (8, 6), (4, 3)),
+                                                                   (Stencil.D3Q19, (4, 6, 4), (2, 3, 4))])
+@pytest.mark.parametrize('streaming_pattern', ['pull', 'aa'])
+def test_block_exchange_equals_single_block(stencil_name, domain_size, block_size, streaming_pattern):
+    stencil = LBStencil(stencil_name)
+    dh = ps.create_data_handling(domain_size, periodicity=True, default_target=ps.Target.CPU, default_layout='c')
+    dh.add_array('pdfs', values_per_cell=stencil.Q)
+    dh.add_array_like('pdfs_tmp', 'pdfs')
+    pdfs, pdfs_tmp = ps.fields(f"pdfs({stencil.Q}), pdfs_tmp({stencil.Q}): [{stencil.D}D]", layout='c')
+    kernels = []
+    for timestep in get_timesteps(streaming_pattern):
+        lbm_config = LBMConfig(stencil=stencil, relaxation_rate=1.8, streaming_pattern=streaming_pattern,
+                               timestep=timestep)
+        update = create_lb_update_rule(lbm_config=lbm_config,
+                                       lbm_optimisation=LBMOptimisation(symbolic_field=pdfs,
+                                                                        symbolic_temporary_field=pdfs_tmp))
+        kernels.append(ps.create_kernel(update).compile())
+    domain = (slice(1, -1),) * stencil.D
+    dh.fill('pdfs', 0.0, ghost_layers=True)
+    dh.cpu_arrays['pdfs'][domain] = np.random.default_rng(42).uniform(0.01, 0.1, domain_size + (stencil.Q,))
+
+    # the same domain decomposed into blocks with their own ghost layers
+    blocks = []
+    for origin in itertools.product(*(range(0, d, b) for d, b in zip(domain_size, block_size))):
+        interior = tuple(slice(o + 1, o + b + 1) for o, b in zip(origin, block_size))
+        arrays = {'pdfs': np.zeros(tuple(b + 2 for b in block_size) + (stencil.Q,))}
+        arrays['pdfs'][domain] = dh.cpu_arrays['pdfs'][interior]
+        arrays['pdfs_tmp'] = np.zeros_like(arrays['pdfs'])
+        local_slice = tuple(slice(0, b + 2) for b in block_size)
+        blocks.append((SerialBlock(arrays, tuple(o - 1 for o in origin), local_slice), interior, arrays))
+
+    comm_directions = [d for d in itertools.product((-1, 0, 1), repeat=stencil.D) if any(d)]
+    block_neighbors = get_block_neighbors([b for b, _, _ in blocks], domain_size, dh.periodicity, comm_directions)
+    assert len(block_neighbors) == len(blocks) * len(comm_directions)
+    assert all(j is not None and j != NON_PERIODIC_BORDER for _, j, _ in block_neighbors)
+
+    periodicity_handling = LBMPeriodicityHandling(stencil, dh, 'pdfs', streaming_pattern=streaming_pattern)
+
+    def communicate(timestep):
+        periodicity_handling(timestep)
+        slices_per_comm_dir = get_communication_slices(stencil, comm_directions, streaming_pattern, timestep)
+        exchange_between_blocks([b for b, _, _ in blocks], block_neighbors, 'pdfs', slices_per_comm_dir)
+
+    # in-place patterns start with a time step that reads only the own cell
+    timesteps = get_timesteps(streaming_pattern)
+    if not is_inplace(streaming_pattern):
+        communicate(Timestep.BOTH)
+    for t in range(5):
+        kernel = kernels[t % len(kernels)]
+        dh.run_kernel(kernel)
+        for _, _, arrays in blocks:
+            kernel(pdfs=arrays['pdfs'], pdfs_tmp=arrays['pdfs_tmp'])
+        if not is_inplace(streaming_pattern):
+            dh.swap('pdfs', 'pdfs_tmp')
+            for _, _, arrays in blocks:
+                arrays['pdfs'], arrays['pdfs_tmp'] = arrays['pdfs_tmp'], arrays['pdfs']
+        communicate(timesteps[t % len(timesteps)])
+
+    for _, interior, arrays in blocks:
+        np.testing.assert_equal(arrays['pdfs'][domain], dh.cpu_arrays['pdfs'][interior])
+
+
+def test_block_neighbors_non_periodic():
+    blocks = [SerialBlock({}, (o - 1, -1), (slice(0, 6), slice(0, 6))) for o in (0, 4)]
+    neighbors = get_block_neighbors(blocks, (8, 4), (False, True), [(1, 0), (-1, 0), (0, 1)])
+    assert neighbors == [(0, 1, (1, 0)), (0, NON_PERIODIC_BORDER, (-1, 0)), (0, 0, (0, 1)),
+                         (1, NON_PERIODIC_BORDER, (1, 0)), (1, 0, (-1, 0)), (1, 1, (0, 1))]
+    assert get_block_neighbors(blocks[:1], (8, 4), (False, True), [(1, 0)]) == [(0, None, (1, 0))]
+
+
+def _run_with_periodicity_handling(dh, stencil, streaming_pattern, time_steps=5, **kwargs):
+    dh.add_array('pdfs', values_per_cell=stencil.Q)
+    dh.add_array_like('pdfs_tmp', 'pdfs')
+    kernels = []
+    for timestep in get_timesteps(streaming_pattern):
+        lbm_config = LBMConfig(stencil=stencil, relaxation_rate=1.8, streaming_pattern=streaming_pattern,
+                               timestep=timestep)
+        lbm_optimisation = LBMOptimisation(symbolic_field=dh.fields['pdfs'],
+                                           symbolic_temporary_field=dh.fields['pdfs_tmp'])
+        kernels.append(ps.create_kernel(create_lb_update_rule(lbm_config=lbm_config,
+                                                              lbm_optimisation=lbm_optimisation)).compile())
+    dh.fill('pdfs', 0.0, ghost_layers=True)
+    dh.fill('pdfs_tmp', 0.0, ghost_layers=True)
+    initial = np.random.default_rng(42).uniform(0.01, 0.1, dh.shape + (stencil.Q,))
+    for block in dh.iterate(ghost_layers=False):
+        block['pdfs'][...] = initial[block.global_slice]
+
+    periodicity_handling = LBMPeriodicityHandling(stencil, dh, 'pdfs', streaming_pattern=streaming_pattern, **kwargs)
+    timesteps = get_timesteps(streaming_pattern)
+    if not is_inplace(streaming_pattern):
+        periodicity_handling(Timestep.BOTH)
+    for t in range(time_steps):
+        dh.run_kernel(kernels[t % len(kernels)])
+        if not is_inplace(streaming_pattern):
+            dh.swap('pdfs', 'pdfs_tmp')
+        periodicity_handling(timesteps[t % len(timesteps)])
+    return periodicity_handling, dh.gather_array('pdfs')
+
+
+@pytest.mark.parametrize('streaming_pattern', ['pull', 'aa'])
+def test_periodicity_handling_parallel_blocks(streaming_pattern):
+    wlb = pytest.importorskip('waLBerla')
+    from pystencils.datahandling import ParallelDataHandling
+
+    stencil = LBStencil(Stencil.D2Q9)
+    serial_dh = ps.create_data_handling((8, 6), periodicity=True, default_target=ps.Target.CPU)
+    _, expected = _run_with_periodicity_handling(serial_dh, stencil, streaming_pattern)
+
+    blocks = wlb.createUniformBlockGrid(blocks=(2, 2, 1), cellsPerBlock=(4, 3, 1), periodic=(1, 1, 1))
+    parallel_dh = ParallelDataHandling(blocks=blocks, dim=2, default_target=ps.Target.CPU)
+    periodicity_handling, result = _run_with_periodicity_handling(parallel_dh, stencil, streaming_pattern)
+    assert periodicity_handling._sync_function is None
+    assert len(periodicity_handling._block_neighbors) == 4 * 3
+    np.testing.assert_equal(result, expected)
+
+
+def _neighbors_with_remote_first_block(blocks, *args, **kwargs):
+    """All blocks are local in a single process, the neighbor lookup simulates that the first block is owned by
+    another process"""
+    return [(i, None if 0 in (i, j) else j, d) for i, j, d in get_block_neighbors(blocks, *args, **kwargs)]
+
+
+@pytest.mark.parametrize('streaming_pattern', ['pull', 'aa'])
+def test_periodicity_handling_blocks_on_other_process(streaming_pattern, monkeypatch):
+    wlb = pytest.importorskip('waLBerla')
+    from pystencils.datahandling import ParallelDataHandling
+    from lbmpy.advanced_streaming import communication
+    if is_inplace(streaming_pattern):
+        pytest.importorskip('mpi4py')
+
+    monkeypatch.setattr(communication, 'get_block_neighbors', _neighbors_with_remote_first_block)
+    stencil = LBStencil(Stencil.D2Q9)
+    serial_dh = ps.create_data_handling((8, 6), periodicity=True, default_target=ps.Target.CPU)
+    _, expected = _run_with_periodicity_handling(serial_dh, stencil, streaming_pattern)
+
+    blocks = wlb.createUniformBlockGrid(blocks=(2, 2, 1), cellsPerBlock=(4, 3, 1), periodic=(1, 1, 1))
+    parallel_dh = ParallelDataHandling(blocks=blocks, dim=2, default_target=ps.Target.CPU)
+    periodicity_handling, result = _run_with_periodicity_handling(parallel_dh, stencil, streaming_pattern)
+    if is_inplace(streaming_pattern):
+        assert periodicity_handling._remote_exchange is not None
+    else:
+        assert periodicity_handling._block_neighbors is None
+        assert periodicity_handling._sync_function is not None
+    np.testing.assert_equal(result, expected)
+
+
+class LocalBlocksDataHandling:
+    """Data handling with several uniform blocks on one process, each block stores its arrays in a serial data
+    handling without periodicity"""
+
+    default_target = ps.Target.CPU
+
+    def __init__(self, domain_size, block_size, periodicity=True):
+        self.shape = domain_size
+        self.periodicity = (periodicity,) * len(domain_size)
+        self.block_size = block_size
+        self.origins = list(itertools.product(*(range(0, d, b) for d, b in zip(domain_size, block_size))))
+        self.block_dhs = [ps.create_data_handling(block_size, default_target=ps.Target.CPU) for _ in self.origins]
+
+    @property
+    def fields(self):
+        return self.block_dhs[0].fields
+
+    def add_array(self, name, **kwargs):
+        for dh in self.block_dhs:
+            dh.add_array(name, **kwargs)
+
+    def add_array_like(self, name, name_of_template):
+        for dh in self.block_dhs:
+            dh.add_array_like(name, name_of_template)
+
+    def fill(self, name, value, ghost_layers=False):
+        for dh in self.block_dhs:
+            dh.fill(name, value, ghost_layers=ghost_layers)
+
+    def swap(self, name1, name2):
+        for dh in self.block_dhs:
+            dh.swap(name1, name2)
+
+    def run_kernel(self, kernel):
+        for dh in self.block_dhs:
+            dh.run_kernel(kernel)
+
+    def iterate(self, ghost_layers=True, gpu=False):
+        ghost_layers = int(ghost_layers)
+        local_slice = tuple(slice(1 - ghost_layers, b + 1 + ghost_layers) for b in self.block_size)
+        for origin, dh in zip(self.origins, self.block_dhs):
+            yield SerialBlock(dh.cpu_arrays, tuple(o - ghost_layers for o in origin), local_slice)
+
+    def gather_array(self, name):
+        blocks = list(self.iterate(ghost_layers=False))
+        result = np.empty(self.shape + blocks[0][name].shape[len(self.shape):])
+        for block in blocks:
+            result[block.global_slice] = block[name]
+        return result
+
+
+@pytest.mark.parametrize('stencil_name, domain_size, block_size', [(Stencil.D2Q9, (8, 6), (4, 3)),
+                                                                   (Stencil.D3Q19, (4, 6, 4), (2, 3, 4))])
+@pytest.mark.parametrize('streaming_pattern', ['pull', 'aa'])
+@pytest.mark.parametrize('cpu_compiled_copy', [True, False])
+def test_periodicity_handling_local_blocks(stencil_name, domain_size, block_size, streaming_pattern,
+                                           cpu_compiled_copy):
+    stencil = LBStencil(stencil_name)
+    serial_dh = ps.create_data_handling(domain_size, periodicity=True, default_target=ps.Target.CPU)
+    _, expected = _run_with_periodicity_handling(serial_dh, stencil, streaming_pattern)
+
+    blocks_dh = LocalBlocksDataHandling(domain_size, block_size)
+    periodicity_handling, result = _run_with_periodicity_handling(blocks_dh, stencil, streaming_pattern,
+                                                                  cpu_compiled_copy=cpu_compiled_copy)
+    assert periodicity_handling._remote_exchange is None
+    assert (periodicity_handling._cpu_copy_kernel is not None) == cpu_compiled_copy
+    # the kernels are compiled for the array sizes of the blocks, which may change the rounding
+    np.testing.assert_allclose(result, expected, rtol=0, atol=1e-14)
+
+
+def test_periodicity_handling_remote_blocks(monkeypatch):
+    pytest.importorskip('mpi4py')
+    from lbmpy.advanced_streaming import communication
+
+    monkeypatch.setattr(communication, 'get_block_neighbors', _neighbors_with_remote_first_block)
+    stencil = LBStencil(Stencil.D2Q9)
+    serial_dh = ps.create_data_handling((8, 6), periodicity=True, default_target=ps.Target.CPU)
+    _, expected = _run_with_periodicity_handling(serial_dh, stencil, 'aa')
+
+    blocks_dh = LocalBlocksDataHandling((8, 6), (4, 3))
+    periodicity_handling, result = _run_with_periodicity_handling(blocks_dh, stencil, 'aa')
+    # the eight directions of the first block and the eight directions of the other blocks towards it
+    assert len(periodicity_handling._remote_exchange._sends) == 2 * 8
+    np.testing.assert_allclose(result, expected, rtol=0, atol=1e-14)
@@ -0,0 +1,67 @@
+"""Compares the time per step of index list and flag field boundaries for a channel with a moving obstacle.
+
+The obstacle is moved every `geometry_update_interval` time steps. The index lists have to be recreated after every
+geometry change, while the flag field kernel reads the changed flags directly. Run with
+``python lbmpy_tests/benchmark/benchmark_boundaries_in_kernel.py``.
+"""
+import time
+
+import pystencils as ps
+from lbmpy.boundaries import NoSlip, UBB, FixedDensity
+from lbmpy.boundaries.boundaries_in_kernel import update_rule_with_flag_boundaries
+from lbmpy.boundaries.boundaryhandling import LatticeBoltzmannBoundaryHandling
+from lbmpy.creationfunctions import create_lb_collision_rule, LBMConfig
+from lbmpy.enums import Stencil
+from lbmpy.geometry import add_box_boundary
+from lbmpy.stencils import LBStencil
+from lbmpy.updatekernels import create_lbm_kernel
+from pystencils import create_data_handling, make_slice
+
+
+def benchmark(domain_size=(64, 32, 32), time_steps=20, geometry_update_intervals=(1, 5, 20)):
+    stencil = LBStencil(Stencil.D3Q19)
+    collision_rule = create_lb_collision_rule(lbm_config=LBMConfig(stencil=stencil, relaxation_rate=1.7,
+                                                                   compressible=True))
+    dh = create_data_handling(domain_size, default_ghost_layers=1)
+    src = dh.add_array('src', values_per_cell=stencil.Q)
+    dst = dh.add_array_like('dst', 'src')
+    dh.fill('src', 0.0, ghost_layers=True)
+    dh.fill('dst', 0.0, ghost_layers=True)
+
+    bh = LatticeBoltzmannBoundaryHandling(collision_rule.method, dh, 'src')
+    boundaries = {add_box_boundary(bh, NoSlip()): NoSlip()}
+    inflow, outflow, obstacle = UBB((0.02, 0, 0)), FixedDensity(1.0), NoSlip("obstacle")
+    boundaries[bh.set_boundary(inflow, slice_obj=make_slice[0, :, :])] = inflow
+    boundaries[bh.set_boundary(outflow, slice_obj=make_slice[-1, :, :])] = outflow
+    boundaries[bh.set_boundary(obstacle, slice_obj=make_slice[5:8, 10:20, 10:20])] = obstacle
+    flag_field = dh.fields[bh.flag_interface.flag_field_name]
+
+    index_list_kernel = ps.create_kernel(create_lbm_kernel(collision_rule, src, dst)).compile()
+    flag_rule = update_rule_with_flag_boundaries(collision_rule, src, dst, flag_field, boundaries)
+    flag_kernel = ps.create_kernel(flag_rule).compile()
+
+    for geometry_update_interval in geometry_update_intervals:
+        timings = []
+        for with_index_lists in (True, False):
+            bh.set_boundary('domain', make_slice[5:domain_size[0], 10:20, 10:20])
+            bh.set_boundary(obstacle, make_slice[5:8, 10:20, 10:20])
+            bh.prepare()
+            start = time.perf_counter()
+            for t in range(time_steps):
+                if t % geometry_update_interval == geometry_update_interval - 1:
+                    position = 5 + (t + 1) // geometry_update_interval
+                    bh.set_boundary('domain', make_slice[position - 1, 10:20, 10:20])
+                    bh.set_boundary(obstacle, make_slice[position + 2, 10:20, 10:20])
+                if with_index_lists:
+                    bh()
+                    dh.run_kernel(index_list_kernel)
+                else:
+                    dh.run_kernel(flag_kernel)
+                dh.swap('src', 'dst')
+            timings.append((time.perf_counter() - start) / time_steps)
+        print(f"geometry update every {geometry_update_interval} steps: "
+              f"index lists {timings[0] * 1e3:.2f} ms, flag field {timings[1] * 1e3:.2f} ms per step")
+
+
+if __name__ == '__main__':
+    benchmark()
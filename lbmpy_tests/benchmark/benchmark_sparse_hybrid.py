@@ -0,0 +1,62 @@
+"""Compares the fluid cell updates per second of dense, sparse and hybrid storage for a channel that is open in the
+left half and filled with a packed bed of obstacles in the right half.
+
+Run with ``python lbmpy_tests/benchmark/benchmark_sparse_hybrid.py``.
+"""
+import numpy as np
+
+from lbmpy.boundaries import NoSlip
+from lbmpy.enums import Stencil
+from lbmpy.lbstep import LatticeBoltzmannStep
+from lbmpy.sparse import HybridLatticeBoltzmannStep, SparseLatticeBoltzmannStep
+from lbmpy.stencils import LBStencil
+from pystencils import make_slice
+
+
+def packed_bed_channel(domain_size, porosity=0.4, seed=42):
+    """Channel periodic in x with walls in y and z, open in the left half and a random packed bed in the right half.
+
+    The last layer in x is kept open, since the sparse mapping requires fluid periodic images of fluid cells."""
+    flag_arr = np.full(tuple(s + 2 for s in domain_size), 2, dtype=np.uint16)
+    flag_arr[0, 1:-1, 1:-1] = flag_arr[-1, 1:-1, 1:-1] = 0
+    flag_arr[(slice(1, -1),) * len(domain_size)] = 1
+    bed = flag_arr[domain_size[0] // 2 + 1:-2, 1:-1, 1:-1]
+    bed[np.random.default_rng(seed).random(bed.shape) > porosity] = 2
+    return flag_arr
+
+
+def benchmark(domain_size=(128, 64, 64), block_size=16, time_steps=100, warm_up_time_steps=10):
+    flag_arr = packed_bed_channel(domain_size)
+    method_parameters = {'stencil': LBStencil(Stencil.D3Q19), 'relaxation_rate': 1.7, 'compressible': True,
+                         'force': (1e-5, 0, 0)}
+    wall = NoSlip()
+
+    dense = LatticeBoltzmannStep(domain_size=domain_size, periodicity=(True, False, False), **method_parameters)
+    solid = flag_arr[1:-1, 1:-1, 1:-1] == 2
+    dense.boundary_handling.set_boundary(wall, mask_callback=lambda x, y, z: solid[x.astype(int), y.astype(int),
+                                                                                   z.astype(int)],
+                                         ghost_layers=False)
+    for wall_slice in (make_slice[:, 0, :], make_slice[:, -1, :], make_slice[:, :, 0], make_slice[:, :, -1]):
+        dense.boundary_handling.set_boundary(wall, slice_obj=wall_slice)
+    number_of_fluid_cells = int(np.count_nonzero(flag_arr == 1))
+
+    hybrid_steps = {
+        'hybrid': HybridLatticeBoltzmannStep(flag_arr, 1, {2: wall}, block_size=block_size, **method_parameters),
+        'hybrid, flag field boundaries': HybridLatticeBoltzmannStep(flag_arr, 1, {2: wall}, block_size=block_size,
+                                                                    flag_field_boundaries=True,
+                                                                    **method_parameters),
+    }
+    sparse = SparseLatticeBoltzmannStep(flag_arr, 1, {2: wall}, **method_parameters)
+    dense_blocks = next(iter(hybrid_steps.values())).dense_blocks
+    print(f"{number_of_fluid_cells} fluid cells, {np.count_nonzero(dense_blocks)} of {dense_blocks.size} blocks dense")
+
+    for step in (dense, sparse, *hybrid_steps.values()):
+        step.run(warm_up_time_steps)
+    print(f"dense: {dense.benchmark_run(time_steps, number_of_fluid_cells):.1f} fluid MLUPS")
+    print(f"sparse: {sparse.benchmark_run(time_steps):.1f} fluid MLUPS")
+    for name, step in hybrid_steps.items():
+        print(f"{name}: {step.benchmark_run(time_steps):.1f} fluid MLUPS")
+
+
+if __name__ == '__main__':
+    benchmark()
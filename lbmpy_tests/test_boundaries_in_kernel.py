@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+import pystencils as ps
+from lbmpy.boundaries import NoSlip, UBB, FixedDensity
+from lbmpy.boundaries.boundaries_in_kernel import update_rule_with_flag_boundaries
+from lbmpy.boundaries.boundaryhandling import LatticeBoltzmannBoundaryHandling
+from lbmpy.creationfunctions import create_lb_collision_rule, LBMConfig
+from lbmpy.enums import Stencil
+from lbmpy.geometry import add_box_boundary
+from lbmpy.stencils import LBStencil
+from lbmpy.updatekernels import create_lbm_kernel
+from pystencils import create_data_handling, make_slice
+
+
+def channel_with_obstacle(domain_size, stencil):
+    collision_rule = create_lb_collision_rule(lbm_config=LBMConfig(stencil=stencil, relaxation_rate=1.7,
+                                                                   compressible=True))
+    dh = create_data_handling(domain_size, default_ghost_layers=1)
+    src = dh.add_array('src', values_per_cell=stencil.Q)
+    dst = dh.add_array_like('dst', 'src')
+    dh.fill('src', 0.0, ghost_layers=True)
+    dh.fill('dst', 0.0, ghost_layers=True)
+
+    bh = LatticeBoltzmannBoundaryHandling(collision_rule.method, dh, 'src')
+    boundaries = {add_box_boundary(bh, NoSlip()): NoSlip()}
+    inflow, outflow = UBB((0.02,) + (0,) * (stencil.D - 1)), FixedDensity(1.0)
+    boundaries[bh.set_boundary(inflow, slice_obj=make_slice[0, :, :][:stencil.D])] = inflow
+    boundaries[bh.set_boundary(outflow, slice_obj=make_slice[-1, :, :][:stencil.D])] = outflow
+    obstacle = NoSlip("obstacle")
+    boundaries[bh.set_boundary(obstacle, slice_obj=make_slice[5:8, 3:6, 3:6][:stencil.D])] = obstacle
+    flag_field = dh.fields[bh.flag_interface.flag_field_name]
+    return collision_rule, dh, src, dst, bh, flag_field, boundaries
+
+
+def test_flag_field_boundaries_equal_index_lists():
+    stencil = LBStencil(Stencil.D2Q9)
+    collision_rule, dh, src, dst, bh, flag_field, boundaries = channel_with_obstacle((16, 10), stencil)
+
+    index_list_kernel = ps.create_kernel(create_lbm_kernel(collision_rule, src, dst)).compile()
+    flag_rule = update_rule_with_flag_boundaries(collision_rule, src, dst, flag_field, boundaries)
+    flag_kernel = ps.create_kernel(flag_rule).compile()
+
+    initial_pdfs = dh.cpu_arrays['src'].copy()
+    results = []
+    for with_index_lists in (True, False):
+        dh.cpu_arrays['src'][:] = initial_pdfs
+        for _ in range(20):
+            if with_index_lists:
+                bh()
+                dh.run_kernel(index_list_kernel)
+            else:
+                dh.run_kernel(flag_kernel)
+            dh.swap('src', 'dst')
+        results.append(dh.cpu_arrays['src'].copy())
+
+    fluid = dh.cpu_arrays[bh.flag_interface.flag_field_name] == bh.flag_interface.domain_flag
+    assert np.max(np.abs(results[0][fluid] - initial_pdfs[fluid])) > 1e-4
+    np.testing.assert_allclose(results[0][fluid], results[1][fluid], atol=1e-14)
+
+
+def test_flag_field_boundaries_reject_link_data():
+    stencil = LBStencil(Stencil.D2Q9)
+    collision_rule = create_lb_collision_rule(lbm_config=LBMConfig(stencil=stencil, relaxation_rate=1.7))
+    src, dst = ps.fields(f"src({stencil.Q}), dst({stencil.Q}): [2D]")
+    flag_field = ps.fields("flags: uint32[2D]")
+    inflow = UBB(lambda boundary_data: None, dim=2)
+    with pytest.raises(ValueError):
+        update_rule_with_flag_boundaries(collision_rule, src, dst, flag_field, {2: inflow})
+
+
+def test_flag_field_boundaries_geometry_changes():
+    """Moves the obstacle every few time steps. The index lists are recreated after every geometry change, while
+    the flag field kernel reads the changed flags directly."""
+    stencil = LBStencil(Stencil.D2Q9)
+    collision_rule, dh, src, dst, bh, flag_field, boundaries = channel_with_obstacle((16, 10), stencil)
+    index_list_kernel = ps.create_kernel(create_lbm_kernel(collision_rule, src, dst)).compile()
+    flag_rule = update_rule_with_flag_boundaries(collision_rule, src, dst, flag_field, boundaries)
+    flag_kernel = ps.create_kernel(flag_rule).compile()
+
+    obstacle = next(boundary for boundary in boundaries.values() if boundary.name == "obstacle")
+    flag_arr = dh.cpu_arrays[bh.flag_interface.flag_field_name]
+    initial_flags, initial_pdfs = flag_arr.copy(), dh.cpu_arrays['src'].copy()
+    results = []
+    for with_index_lists in (True, False):
+        dh.cpu_arrays['src'][:] = initial_pdfs
+        bh.set_boundary('domain', make_slice[5:16, 3:6])
+        bh.set_boundary(obstacle, make_slice[5:8, 3:6])
+        np.testing.assert_equal(flag_arr, initial_flags)
+        for t in range(30):
+            if t % 5 == 4:
+                position = 5 + (t + 1) // 5
+                bh.set_boundary('domain', make_slice[position - 1, 3:6])
+                bh.set_boundary(obstacle, make_slice[position + 2, 3:6])
+                # the former obstacle cells hold different values for both boundary treatments
+                dh.cpu_arrays['src'][position - 1, 3:6] = 0.0
+            if with_index_lists:
+                bh()
+                dh.run_kernel(index_list_kernel)
+            else:
+                dh.run_kernel(flag_kernel)
+            dh.swap('src', 'dst')
+        results.append(dh.cpu_arrays['src'].copy())
+
+    fluid = flag_arr == bh.flag_interface.domain_flag
+    assert not np.array_equal(flag_arr, initial_flags)
+    assert np.max(np.abs(results[0][fluid] - initial_pdfs[fluid])) > 1e-4
+    np.testing.assert_allclose(results[0][fluid], results[1][fluid], atol=1e-14)
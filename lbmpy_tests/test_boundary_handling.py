@@ -1,11 +1,14 @@
 import numpy as np
 import pytest
+import sympy as sp
 
 from lbmpy.boundaries import NoSlip, UBB, SimpleExtrapolationOutflow, ExtrapolationOutflow, \
+    NoSlipLinearBouzidi, UBBLinearBouzidi, TIME_STEP_SYMBOL, LINK_POSITION_SYMBOLS, \
     FixedDensity, DiffusionDirichlet, NeumannByCopy, StreamInConstant, FreeSlip
+from lbmpy.advanced_streaming.utility import Timestep
 from lbmpy.boundaries.boundaryhandling import LatticeBoltzmannBoundaryHandling
 from lbmpy.creationfunctions import create_lb_function, create_lb_method, LBMConfig
-from lbmpy.enums import Stencil, Method
+from lbmpy.enums import Stencil, Method, ForceModel
 from lbmpy.geometry import add_box_boundary
 from lbmpy.lbstep import LatticeBoltzmannStep
 from lbmpy.stencils import LBStencil
@@ -435,3 +438,156 @@ def test_boundary_utility_functions():
     assert stream == StreamInConstant(constant=1.0, name="stream")
     assert not stream == StreamInConstant(constant=1.0, name="test")
     assert not stream == noslip
+
+
+def test_linear_bouzidi_halfway_equals_bounce_back():
+    stencil = LBStencil(Stencil.D2Q9)
+    results = []
+    for wall, moving_wall in ((NoSlip(), UBB((0.05, 0))),
+                              (NoSlipLinearBouzidi(), UBBLinearBouzidi((0.05, 0)))):
+        dh = create_data_handling((6, 6), parallel=False)
+        dh.add_array('pdfs', values_per_cell=stencil.Q)
+        dh.cpu_arrays['pdfs'][:] = np.random.RandomState(42).rand(*dh.cpu_arrays['pdfs'].shape)
+        lb_method = create_lb_method(lbm_config=LBMConfig(stencil=stencil, compressible=True))
+        bh = LatticeBoltzmannBoundaryHandling(lb_method, dh, 'pdfs')
+        add_box_boundary(bh, wall)
+        bh.set_boundary(moving_wall, slice_from_direction('N', 2))
+        bh()
+        results.append(dh.cpu_arrays['pdfs'].copy())
+
+    np.testing.assert_allclose(results[0], results[1], atol=1e-15)
+
+
+def test_linear_bouzidi_off_grid_channel():
+    from lbmpy.geometry import wall_distance_from_sdf
+
+    height = 16
+    lower_wall, upper_wall = 1.3, height - 1.8
+    force = 1e-5
+    relaxation_rate = 1.4
+
+    def sdf(x, y):
+        return np.minimum(y - lower_wall, upper_wall - y)
+
+    def mask_callback(x, y):
+        return sdf(x, y) < 0
+
+    errors = []
+    for wall in (NoSlip(), NoSlipLinearBouzidi(init_wall_distance=wall_distance_from_sdf(sdf))):
+        step = LatticeBoltzmannStep(domain_size=(4, height), periodicity=(True, False), method=Method.SRT,
+                                    relaxation_rate=relaxation_rate, force=(force, 0), force_model=ForceModel.GUO,
+                                    compressible=True)
+        step.boundary_handling.set_boundary(wall, mask_callback=mask_callback)
+        step.run(4000)
+
+        y = np.arange(height) + 0.5
+        viscosity = (1 / relaxation_rate - 0.5) / 3
+        analytic = force / (2 * viscosity) * (y - lower_wall) * (upper_wall - y)
+        fluid = sdf(0, y) > 0
+        simulated = step.velocity[2, :, 0]
+        errors.append(np.max(np.abs(simulated[fluid] - analytic[fluid])) / np.max(analytic))
+
+    assert errors[1] < 0.01
+    assert errors[1] < 0.2 * errors[0]
+
+
+@pytest.mark.parametrize("streaming_pattern", ['pull', 'aa'])
+def test_merged_boundaries(streaming_pattern):
+    stencil = LBStencil(Stencil.D2Q9)
+    lb_method = create_lb_method(lbm_config=LBMConfig(stencil=stencil, compressible=True))
+
+    def velocity_profile(boundary_data):
+        boundary_data['vel_0'] = 0.01 * boundary_data.link_positions(1)
+        boundary_data['vel_1'] = 0
+
+    def boundary_setup(bh):
+        add_box_boundary(bh, NoSlip())
+        bh.set_boundary(NoSlip("obstacle"), make_slice[4:6, 4:6])
+        bh.set_boundary(UBB((0.05, 0)), make_slice[0, 1:4])
+        bh.set_boundary(UBB((0.02, 0.01), name="second inflow"), make_slice[0, 4:8])
+        bh.set_boundary(UBB(velocity_profile, dim=2), make_slice[0, 8:11])
+        bh.set_boundary(FixedDensity(1.01), make_slice[-1, 1:6])
+        bh.set_boundary(FixedDensity(0.99), make_slice[-1, 6:11])
+
+    results = []
+    for merge_boundaries in (False, True):
+        dh = create_data_handling((12, 12), parallel=False)
+        dh.add_array('pdfs', values_per_cell=stencil.Q)
+        dh.cpu_arrays['pdfs'][:] = np.random.RandomState(42).rand(*dh.cpu_arrays['pdfs'].shape)
+        bh = LatticeBoltzmannBoundaryHandling(lb_method, dh, 'pdfs', streaming_pattern=streaming_pattern,
+                                              merge_boundaries=merge_boundaries)
+        boundary_setup(bh)
+        bh(prev_timestep=Timestep.EVEN if streaming_pattern == 'aa' else Timestep.BOTH)
+
+        index_lists = next(iter(dh.iterate()))[bh._index_array_name].boundary_object_to_index_list
+        assert len(index_lists) == (3 if merge_boundaries else 7)
+        force = bh.force_on_boundary(NoSlip("obstacle"), prev_timestep=Timestep.EVEN)
+        results.append((dh.cpu_arrays['pdfs'].copy(), force))
+
+    np.testing.assert_allclose(results[0][0], results[1][0], atol=1e-15)
+    np.testing.assert_allclose(results[0][1], results[1][1], atol=1e-15)
+
+
+@pytest.mark.parametrize("index_array_order", [None, 'linear', 'morton'])
+@pytest.mark.parametrize("compact_index_arrays", [False, True])
+def test_index_array_order_and_compact_data_type(index_array_order, compact_index_arrays):
+    stencil = LBStencil(Stencil.D3Q19)
+    lb_method = create_lb_method(lbm_config=LBMConfig(stencil=stencil, compressible=True))
+
+    def sphere(x, y, z):
+        return (x - 6.2) ** 2 + (y - 5.7) ** 2 + (z - 6.1) ** 2 < 3.4 ** 2
+
+    results = []
+    for options in ({}, dict(index_array_order=index_array_order, compact_index_arrays=compact_index_arrays)):
+        dh = create_data_handling((12, 12, 12), parallel=False)
+        dh.add_array('pdfs', values_per_cell=stencil.Q)
+        dh.cpu_arrays['pdfs'][:] = np.random.RandomState(42).rand(*dh.cpu_arrays['pdfs'].shape)
+        bh = LatticeBoltzmannBoundaryHandling(lb_method, dh, 'pdfs', **options)
+        bh.set_boundary(NoSlip(), mask_callback=sphere)
+        bh.set_boundary(UBB((0.05, 0, 0)), slice_from_direction('W', 3))
+        bh()
+        results.append(dh.cpu_arrays['pdfs'].copy())
+
+    index_lists = next(iter(dh.iterate()))[bh._index_array_name].boundary_object_to_index_list
+    for idx_arr in index_lists.values():
+        assert idx_arr.dtype.itemsize == (8 if compact_index_arrays else 16)
+        if index_array_order == 'linear':
+            linear_idx = idx_arr['x'] + 14 * (idx_arr['y'] + 14 * idx_arr['z'].astype(np.int64))
+            assert np.all(np.diff(linear_idx) >= 0)
+
+    np.testing.assert_allclose(results[0], results[1], atol=1e-15)
+
+
+def test_time_dependent_ubb():
+    domain_size = (10, 8)
+    height = domain_size[1]
+    t, y = TIME_STEP_SYMBOL, LINK_POSITION_SYMBOLS[1]
+    symbolic_velocity = 0.02 * (1 - sp.cos(2 * sp.pi * t / 20)) * 4 * y * (height - y) / height ** 2
+    current_time_step = [0]
+
+    def velocity_callback(boundary_data):
+        y_pos = (boundary_data.index_array['y'] + boundary_data.offset[1] + 0.5
+                 + 0.5 * boundary_data.link_offsets()[:, 1])
+        boundary_data['vel_0'] = [float(symbolic_velocity.subs({t: current_time_step[0], y: y_i})) for y_i in y_pos]
+        boundary_data['vel_1'] = 0
+
+    steps = [LatticeBoltzmannStep(domain_size=domain_size, relaxation_rate=1.8) for _ in range(2)]
+    for step, inflow in zip(steps, (UBB((symbolic_velocity, 0)), UBB(velocity_callback, dim=2))):
+        add_box_boundary(step.boundary_handling, NoSlip())
+        step.boundary_handling.set_boundary(inflow, make_slice[0, :])
+
+    assert steps[0].boundary_handling.time_dependent
+    assert not steps[1].boundary_handling.time_dependent
+
+    steps[0].run(7)
+    steps[0].run(6)
+    steps[1].pre_run()
+    for time_step in range(13):
+        current_time_step[0] = time_step
+        steps[1].boundary_handling.trigger_reinitialization_of_boundary_data()
+        steps[1].time_step()
+    steps[1].post_run()
+
+    assert np.max(np.abs(steps[1].velocity[:, :, 0])) > 1e-3
+    np.testing.assert_allclose(steps[0].velocity[:, :], steps[1].velocity[:, :], atol=1e-13)
+    np.testing.assert_allclose(steps[0].density[:, :], steps[1].density[:, :], atol=1e-13)
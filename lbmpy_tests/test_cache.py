@@ -0,0 +1,99 @@
+import os
+
+import sympy as sp
+
+import lbmpy.cache
+from lbmpy.cache import cache_statistics, configure_cache, tiered_cache
+from lbmpy.cumulants import discrete_cumulant
+from lbmpy.enums import Stencil
+from lbmpy.maxwellian_equilibrium import (
+    discrete_maxwellian_equilibrium, get_equilibrium_values_of_maxwell_boltzmann_function,
+    get_moments_of_discrete_maxwellian_equilibrium)
+from lbmpy.moments import discrete_moment
+from lbmpy.stencils import LBStencil
+from pystencils import fields
+
+
+def _number_of_files(directory):
+    return sum(len(files) for _, _, files in os.walk(directory))
+
+
+def test_tiered_cache_memory_and_disk(tmp_path, monkeypatch):
+    monkeypatch.setitem(lbmpy.cache._config, 'directory', str(tmp_path))
+    monkeypatch.setitem(lbmpy.cache._config, 'use_disk', True)
+    calls = []
+
+    @tiered_cache
+    def expand_square(expr, power=2):
+        calls.append(expr)
+        return sp.expand(expr ** power)
+
+    x, y = sp.symbols("x y")
+    assert expand_square(x + y) == x ** 2 + 2 * x * y + y ** 2
+    assert expand_square(x + y) == x ** 2 + 2 * x * y + y ** 2
+    assert expand_square.cache_info()[:3] == (1, 0, 1)
+
+    # another process only finds the disk tier
+    expand_square.cache_clear()
+    assert expand_square(x + y) == x ** 2 + 2 * x * y + y ** 2
+    assert expand_square.cache_info()[:3] == (0, 1, 0)
+    assert len(calls) == 1
+    assert expand_square(x + y, power=3) != expand_square(x + y)
+
+    # expressions with other atoms than plain symbols are only cached in memory
+    f = fields("f: [2D]")
+    number_of_files = _number_of_files(tmp_path)
+    expand_square(f.center + x)
+    assert _number_of_files(tmp_path) == number_of_files
+
+    expand_square.cache_clear(disk=True)
+    assert expand_square.cache_info()[:3] == (0, 0, 0)
+
+
+def test_cached_discrete_moments_and_cumulants(tmp_path, monkeypatch):
+    monkeypatch.setitem(lbmpy.cache._config, 'directory', str(tmp_path))
+    monkeypatch.setitem(lbmpy.cache._config, 'use_disk', True)
+    stencil = LBStencil(Stencil.D2Q9)
+    pdfs = tuple(sp.symbols(f"f_:{stencil.Q}"))
+
+    expected_moment = discrete_moment(pdfs, (2, 0), stencil)
+    expected_cumulant = discrete_cumulant(pdfs, (1, 1), stencil)
+    lbmpy.cache.clear_caches()
+    assert discrete_moment(list(pdfs), (2, 0), stencil) == expected_moment
+    assert discrete_cumulant(pdfs, (1, 1), stencil) == expected_cumulant
+    statistics = cache_statistics()
+    assert statistics['lbmpy.moments.discrete_moment'].disk_hits == 1
+    assert statistics['lbmpy.cumulants.discrete_cumulant'].disk_hits == 1
+
+    maxsize = cache_statistics()['lbmpy.moments.discrete_moment'].maxsize
+    configure_cache(maxsize=1)
+    try:
+        discrete_moment(pdfs, (0, 2), stencil)
+        assert cache_statistics()['lbmpy.moments.discrete_moment'].size == 1
+    finally:
+        configure_cache(maxsize=maxsize)
+
+
+def test_canonical_maxwellian_equilibrium_keys(tmp_path, monkeypatch):
+    monkeypatch.setitem(lbmpy.cache._config, 'directory', str(tmp_path))
+    monkeypatch.setitem(lbmpy.cache._config, 'use_disk', True)
+    lbmpy.cache.clear_caches()
+    stencil = LBStencil(Stencil.D2Q9)
+    x, y = sp.symbols("x y")
+    u = sp.symbols("u_:2")
+
+    equilibrium = discrete_maxwellian_equilibrium(stencil, u=u, order=4)
+    assert discrete_maxwellian_equilibrium(tuple(stencil), sp.Symbol("rho"), list(u) + [sp.Symbol("u_2")], 4) \
+        == equilibrium
+    values = get_equilibrium_values_of_maxwell_boltzmann_function([(2, 0), (1, 1)], 2, u=u)
+    assert get_equilibrium_values_of_maxwell_boltzmann_function([x * y, x * (x + y) - x * y], dim=2,
+                                                                u=list(u)) == values[::-1]
+    moments = get_moments_of_discrete_maxwellian_equilibrium(stencil, [(0, 2), (1, 0)], u=u)
+    assert get_moments_of_discrete_maxwellian_equilibrium(tuple(stencil), (x, y ** 2), u=u) == moments[::-1]
+
+    statistics = cache_statistics()
+    assert statistics['lbmpy.maxwellian_equilibrium._discrete_maxwellian_equilibrium'].misses == 1
+    assert statistics['lbmpy.maxwellian_equilibrium._equilibrium_value'][:3] == (2, 0, 2)
+    assert statistics['lbmpy.maxwellian_equilibrium._discrete_equilibrium_measure'][:3] == (2, 0, 2)
+    directories = [name for name in os.listdir(tmp_path) if name.startswith('lbmpy.maxwellian_equilibrium')]
+    assert directories == ['lbmpy.maxwellian_equilibrium']
@@ -3,13 +3,14 @@ import functools
 import pytest
 import sympy as sp
 
+import lbmpy.cache
 from lbmpy.chapman_enskog.chapman_enskog import (
     ChapmanEnskogAnalysis, LbMethodEqMoments, chapman_enskog_ansatz,
-    get_taylor_expanded_lb_equation, take_moments)
+    get_taylor_expanded_lb_equation, take_moments, _epsilon_moment_equations)
 from lbmpy.chapman_enskog.chapman_enskog_higher_order import (
     determine_higher_order_moments, get_solvability_conditions)
 from lbmpy.chapman_enskog.chapman_enskog_steady_state import (
-    SteadyStateChapmanEnskogAnalysis, SteadyStateChapmanEnskogAnalysisSRT)
+    SteadyStateChapmanEnskogAnalysis, SteadyStateChapmanEnskogAnalysisSRT, _steady_state_analysis)
 from lbmpy.creationfunctions import create_lb_method, LBMConfig
 from lbmpy.enums import Method, Stencil
 from lbmpy.forcemodels import Guo
@@ -199,3 +200,36 @@ def test_steady_state():
     momentum_eq_with_force = sp.expand(with_force.get_momentum_equation(0)[0] * rr)
     momentum_eq_without_force = sp.expand(a1.get_momentum_equation(0)[0] * rr)
     assert momentum_eq_with_force - sp.symbols("a_0", commutative=False) == momentum_eq_without_force
+
+
+def test_parallel_and_cached_analysis(tmp_path, monkeypatch):
+    monkeypatch.setitem(lbmpy.cache._config, 'directory', str(tmp_path))
+    monkeypatch.setitem(lbmpy.cache._config, 'use_disk', True)
+    _epsilon_moment_equations.cache_clear()
+
+    omega = sp.Symbol("omega")
+    method = create_lb_method(lbm_config=LBMConfig(stencil=LBStencil(Stencil.D2Q9), method=Method.SRT,
+                                                   relaxation_rate=omega, zero_centered=False))
+    sequential = ChapmanEnskogAnalysis(method)
+    assert _epsilon_moment_equations.cache_info()[:3] == (0, 0, 1)
+
+    _epsilon_moment_equations.cache_clear(disk=True)
+    parallel = ChapmanEnskogAnalysis(method, processes=2)
+    assert parallel.get_macroscopic_equations() == sequential.get_macroscopic_equations()
+    assert parallel.get_viscous_stress_tensor() == sequential.get_viscous_stress_tensor()
+
+    _epsilon_moment_equations.cache_clear()
+    cached = ChapmanEnskogAnalysis(method)
+    assert _epsilon_moment_equations.cache_info()[:3] == (0, 1, 0)
+    assert cached.get_kinematic_viscosity() == sequential.get_kinematic_viscosity()
+
+    parallel_steady_state = SteadyStateChapmanEnskogAnalysis(method, order=2, processes=2)
+    _steady_state_analysis.cache_clear(disk=True)
+    steady_state = SteadyStateChapmanEnskogAnalysis(method, order=2)
+    assert parallel_steady_state.get_momentum_equation() == steady_state.get_momentum_equation()
+
+    _steady_state_analysis.cache_clear()
+    cached_steady_state = SteadyStateChapmanEnskogAnalysis(method, order=2)
+    assert _steady_state_analysis.cache_info()[:3] == (0, 1, 0)
+    assert cached_steady_state.get_pdf_hierarchy(2) == steady_state.get_pdf_hierarchy(2)
+    assert cached_steady_state.get_momentum_equation() == steady_state.get_momentum_equation()
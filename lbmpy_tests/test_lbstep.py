@@ -98,3 +98,69 @@ def test_advanced_initialization():
 
     shear_flow_scenario = create_fully_periodic_flow(initial_velocity=init_vel, relaxation_rate=1.6)
     shear_flow_scenario.run_iterative_initialization(max_steps=20000, check_residuum_after=500)
+
+
+class _DeferredSynchronization:
+    """Has the interface of the non-blocking waLBerla communication schemes, the ghost layers are written when
+    waiting for the communication"""
+
+    def __init__(self, sync_function):
+        self._sync_function = sync_function
+
+    def __call__(self):
+        self._sync_function()
+
+    def startCommunication(self):
+        pass
+
+    def wait(self):
+        self._sync_function()
+
+
+@pytest.mark.parametrize('stencil, domain_size', [('D2Q9', (16, 10)), ('D3Q19', (8, 7, 6))])
+def test_overlap_communication(stencil, domain_size):
+    from lbmpy.boundaries import NoSlip, UBB
+    from lbmpy.lbstep import LatticeBoltzmannStep
+    from pystencils import make_slice
+    from pystencils.datahandling import SerialDataHandling
+
+    class NonBlockingDataHandling(SerialDataHandling):
+        def synchronization_function(self, *args, **kwargs):
+            return _DeferredSynchronization(super().synchronization_function(*args, **kwargs))
+
+    dim = len(domain_size)
+    periodicity = (True, False, True)[:dim]
+    steps = []
+    for overlap_communication, non_blocking in ((False, False), (True, False), (True, True)):
+        if non_blocking:
+            dh = NonBlockingDataHandling(domain_size, periodicity=periodicity, default_target=Target.CPU)
+            step = LatticeBoltzmannStep(data_handling=dh, stencil=stencil, relaxation_rate=1.8,
+                                        force=(1e-5,) + (0,) * (dim - 1), overlap_communication=True)
+        else:
+            step = LatticeBoltzmannStep(domain_size=domain_size, periodicity=periodicity,
+                                        stencil=stencil, relaxation_rate=1.8, force=(1e-5,) + (0,) * (dim - 1),
+                                        overlap_communication=overlap_communication)
+        # the blocking periodicity copies of the serial data handling keep the regular schedule
+        assert step._overlap_communication == non_blocking
+        bh = step.boundary_handling
+        bh.set_boundary(NoSlip(), slice_obj=make_slice[(slice(None), 0) + (slice(None),) * (dim - 2)])
+        bh.set_boundary(UBB((0.01,) + (0,) * (dim - 1)),
+                        slice_obj=make_slice[(slice(None), -1) + (slice(None),) * (dim - 2)])
+        obstacle = (slice(3, 5), slice(3, 5)) + (slice(2, 4),) * (dim - 2)
+        bh.set_boundary(NoSlip("obstacle"), slice_obj=make_slice[obstacle])
+        steps.append(step)
+
+    for step in steps:
+        for _ in range(3):
+            step.time_step()
+        step.run(20)
+    assert np.max(np.abs(steps[0].velocity[(slice(None),) * dim])) > 1e-3
+    for step in steps[1:]:
+        np.testing.assert_allclose(step.velocity[(slice(None),) * dim], steps[0].velocity[(slice(None),) * dim],
+                                   atol=1e-14)
+        np.testing.assert_allclose(step.density[(slice(None),) * dim], steps[0].density[(slice(None),) * dim],
+                                   atol=1e-14)
+
+    with pytest.raises(ValueError):
+        LatticeBoltzmannStep(domain_size=domain_size, stencil=stencil, time_step_order='collide_stream',
+                             overlap_communication=True)
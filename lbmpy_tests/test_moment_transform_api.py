@@ -1,13 +1,21 @@
 import pytest
 import sympy as sp
 
-from lbmpy.enums import Stencil
+import lbmpy.cache
+from lbmpy.creationfunctions import LBMConfig, create_lb_method
+from lbmpy.enums import CollisionSpace, Method, Stencil
+from lbmpy.methods import CollisionSpaceInfo
 from lbmpy.stencils import LBStencil
 from lbmpy.moments import get_default_moment_set_for_stencil
 
 from lbmpy.moment_transforms import (
     PdfsToMomentsByMatrixTransform, PdfsToMomentsByChimeraTransform,
-    PdfsToCentralMomentsByShiftMatrix, PdfsToCentralMomentsByMatrix, FastCentralMomentTransform
+    PdfsToCentralMomentsByShiftMatrix, PdfsToCentralMomentsByMatrix, FastCentralMomentTransform,
+    select_central_moment_transform, cheapest_central_moment_transform_equations
+)
+import lbmpy.moment_transforms.selection as selection
+from lbmpy.moment_transforms.selection import (
+    CENTRAL_MOMENT_TRANSFORM_CANDIDATES, _cheapest_central_moment_transform
 )
 
 transforms = [
@@ -38,3 +46,85 @@ def test_monomial_equations(transform_class):
 
     assert symbols_pre.isdisjoint(set(fw_eqs.atoms(sp.Symbol)))
     assert symbols_post.isdisjoint(set(bw_eqs.atoms(sp.Symbol)))
+
+
+@pytest.mark.parametrize('method, collision_space', [(Method.CENTRAL_MOMENT, CollisionSpace.CENTRAL_MOMENTS),
+                                                     (Method.CUMULANT, CollisionSpace.CUMULANTS)])
+def test_automatic_central_moment_transform(tmp_path, monkeypatch, method, collision_space):
+    monkeypatch.setitem(lbmpy.cache._config, 'directory', str(tmp_path))
+    monkeypatch.setitem(lbmpy.cache._config, 'use_disk', True)
+    _cheapest_central_moment_transform.cache_clear()
+
+    def collision_rule(transform_class):
+        cspace = CollisionSpaceInfo(collision_space, central_moment_transform_class=transform_class)
+        lbm_config = LBMConfig(stencil=LBStencil(Stencil.D2Q9), method=method, compressible=True,
+                               collision_space_info=cspace)
+        return create_lb_method(lbm_config=lbm_config).get_collision_rule(pre_simplification=True)
+
+    auto_rule = collision_rule('auto')
+    assert auto_rule.method.central_moment_transform_class == 'auto'
+    assert _cheapest_central_moment_transform.cache_info()[:3] == (0, 0, 1)
+    collision_rule('auto')
+    assert _cheapest_central_moment_transform.cache_info()[:3] == (1, 0, 1)
+
+    selected = [c for c in CENTRAL_MOMENT_TRANSFORM_CANDIDATES
+                if collision_rule(c).all_assignments == auto_rule.all_assignments]
+    assert selected
+
+    operation_counts = [sum(collision_rule(c).operation_count.values()) for c in CENTRAL_MOMENT_TRANSFORM_CANDIDATES]
+    assert sum(auto_rule.operation_count.values()) == min(operation_counts)
+
+
+def test_select_central_moment_transform():
+    stencil = LBStencil(Stencil.D2Q9)
+    rho = sp.symbols("rho")
+    u = sp.symbols(f"u_:{stencil.D}")
+    moment_polynomials = get_default_moment_set_for_stencil(stencil)
+    pdfs = sp.symbols(f"f_:{stencil.Q}")
+    pdfs_post = sp.symbols(f"d_:{stencil.Q}")
+
+    transform_class = select_central_moment_transform(stencil, moment_polynomials, rho, u, pdfs, pdfs_post)
+    assert transform_class in CENTRAL_MOMENT_TRANSFORM_CANDIDATES
+
+    def operation_count(c):
+        transform = c(stencil, moment_polynomials, rho, u)
+        return sum(sum(ac.operation_count.values())
+                   for ac in (transform.forward_transform(pdfs), transform.backward_transform(pdfs_post)))
+
+    assert operation_count(transform_class) == min(operation_count(c) for c in CENTRAL_MOMENT_TRANSFORM_CANDIDATES)
+
+
+def test_cheapest_central_moment_transform_equations(tmp_path, monkeypatch):
+    stencil = LBStencil(Stencil.D2Q9)
+    rho = sp.symbols("rho")
+    u = sp.symbols(f"u_:{stencil.D}")
+    moment_polynomials = get_default_moment_set_for_stencil(stencil)
+    pdfs = sp.symbols(f"f_:{stencil.Q}")
+    pdfs_post = sp.symbols(f"d_:{stencil.Q}")
+    monkeypatch.setitem(lbmpy.cache._config, 'directory', str(tmp_path))
+    _cheapest_central_moment_transform.cache_clear()
+
+    derived_classes = []
+    derive_equations = selection._derive_equations
+
+    def counting_derive_equations(transform_class, *args):
+        derived_classes.append(transform_class)
+        return derive_equations(transform_class, *args)
+
+    monkeypatch.setattr(selection, '_derive_equations', counting_derive_equations)
+
+    def equations():
+        return cheapest_central_moment_transform_equations(stencil, moment_polynomials, rho, u, pdfs, pdfs_post,
+                                                           selection_key='test')
+
+    transform, forward, backward = equations()
+    assert derived_classes == list(CENTRAL_MOMENT_TRANSFORM_CANDIDATES)
+    assert type(transform) is select_central_moment_transform(stencil, moment_polynomials, rho, u, pdfs, pdfs_post,
+                                                              selection_key='test')
+
+    # The cached decision derives the equations of the selected transform only
+    del derived_classes[:]
+    transform, cached_forward, cached_backward = equations()
+    assert derived_classes == [type(transform)]
+    assert cached_forward.all_assignments == forward.all_assignments
+    assert cached_backward.all_assignments == backward.all_assignments
@@ -1,3 +1,7 @@
+import numpy as np
+import pytest
+import sympy as sp
+
 from lbmpy.moments import *
 from lbmpy.enums import Stencil
 from lbmpy.stencils import LBStencil
@@ -101,3 +105,71 @@ def test_is_shear_moment():
     assert is_shear_moment(x * y, 2)
     assert is_shear_moment(x * y - 1, 2)
     assert is_shear_moment(x * y - x, 2)
+
+
+def test_exact_moment_matrix_and_inverse():
+    import sympy as sp
+    for stencil_name, moments in [(Stencil.D2Q9, None), (Stencil.D3Q19, None),
+                                  (Stencil.D3Q27, sorted(moments_up_to_component_order(2, dim=3)))]:
+        stencil = LBStencil(stencil_name)
+        if moments is None:
+            moments = gram_schmidt(get_default_moment_set_for_stencil(stencil), stencil)
+        m_inv = inverse_moment_matrix(moments, stencil)
+        m = moment_matrix(moments, stencil)
+        unit_vectors = [tuple(int(k == j) for k in range(stencil.Q)) for j in range(stencil.Q)]
+        reference = sp.Matrix([[discrete_moment(e, moment, stencil) for e in unit_vectors] for moment in moments])
+        assert m == reference
+        assert m * m_inv == sp.eye(stencil.Q)
+
+    # symbolic shift velocities are handled by sympy
+    u = sp.symbols("u_:2")
+    stencil = LBStencil(Stencil.D2Q9)
+    shifted = moment_matrix([(1, 0), (0, 2)], stencil, shift_velocity=u)
+    assert shifted[0, list(stencil).index((1, 0))] == 1 - u[0]
+
+
+@pytest.mark.parametrize('space', ["moment", "central moment", "cumulant"])
+def test_numeric_discrete_moments(space):
+    from lbmpy.cumulants import discrete_cumulant
+    x, y, z = MOMENT_SYMBOLS
+    stencil = LBStencil(Stencil.D3Q19)
+    moments = list(moments_up_to_component_order(2, dim=3)) + [x ** 2 + y ** 2 + z ** 2 - 1, 3 * x * y * z]
+    rng = np.random.default_rng(7)
+    pdfs = rng.uniform(0.01, 0.1, size=(2, 3, stencil.Q))
+    result = numeric_discrete_moments(pdfs, moments, stencil, space)
+    assert result.shape == (2, 3, len(moments))
+
+    cell_pdfs = [sp.Rational(f) for f in pdfs[1, 2]]
+    rho = sum(cell_pdfs)
+    velocity = [discrete_moment(cell_pdfs, e, stencil) / rho for e in [(1, 0, 0), (0, 1, 0), (0, 0, 1)]]
+    for moment, value in zip(moments, result[1, 2]):
+        if space == "moment":
+            reference = discrete_moment(cell_pdfs, moment, stencil)
+        elif space == "central moment":
+            reference = discrete_moment(cell_pdfs, moment, stencil, shift_velocity=velocity)
+        else:
+            reference = discrete_cumulant(cell_pdfs, moment, stencil)
+        assert abs(float(reference) - value) < 1e-12
+
+    with pytest.raises(ValueError):
+        numeric_discrete_moments(pdfs, moments, stencil, space="raw")
+
+
+def test_sparse_linear_combinations():
+    stencil = LBStencil(Stencil.D3Q27)
+    moments = sorted(moments_up_to_component_order(2, dim=3))
+    m = moment_matrix(moments, stencil)
+    m_inv = inverse_moment_matrix(moments, stencil)
+    rows = sparse_moment_matrix(moments, stencil)
+    assert matrix_from_sparse_rows(rows, stencil.Q) == m
+    assert matrix_from_sparse_rows(sparse_inverse_moment_matrix(moments, stencil), stencil.Q) == m_inv
+    assert sum(len(row) for row in rows) < stencil.Q ** 2
+    assert all(0 not in row.values() for row in rows)
+
+    # products skip zeros, but agree with the dense products
+    d = sp.diag(*sp.symbols(f"omega_:{stencil.Q}"))
+    d[0, 0] = 0
+    product = sparse_matrix_product(sparse_rows(m_inv), sparse_rows(d))
+    assert matrix_from_sparse_rows(product, stencil.Q) == m_inv * d
+    f = sp.symbols(f"f_:{stencil.Q}")
+    assert sparse_matrix_vector_product(rows, f) == list(m * sp.Matrix(f))
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+import sympy as sp
+
+from lbmpy.enums import Stencil
+from lbmpy.methods import (
+    NumericCollisionOperator, collision_rules_equivalent, create_srt, create_trt,
+    create_with_default_polynomial_cumulants, max_collision_rule_deviation)
+from lbmpy.methods.cumulantbased import CumulantBasedLbMethod
+from lbmpy.moments import MOMENT_SYMBOLS
+from lbmpy.simplificationfactory import create_simplification_strategy
+from lbmpy.stencils import LBStencil
+
+
+def test_numeric_collision_operator():
+    stencil = LBStencil(Stencil.D2Q9)
+    omega = sp.Symbol("omega")
+    method = create_srt(stencil, omega, compressible=True)
+    operator = NumericCollisionOperator(method.get_collision_rule())
+    assert operator.parameters == (omega,)
+
+    weights = np.array([float(w) for w in method.weights])
+    rng = np.random.default_rng(42)
+    pdfs = weights * (1 + 0.1 * rng.uniform(-1, 1, size=(4, 3, stencil.Q)))
+    post_collision = operator(pdfs, {omega: 1.8})
+    assert post_collision.shape == pdfs.shape
+    np.testing.assert_allclose(post_collision.sum(axis=-1), pdfs.sum(axis=-1))
+    np.testing.assert_allclose(operator(pdfs, {'omega': 0.0}), pdfs)
+
+    # equilibrium is a fixed point
+    np.testing.assert_allclose(operator(weights, {'omega': np.array(1.3)}), weights)
+
+    with pytest.raises(ValueError):
+        operator(pdfs)
+
+
+@pytest.mark.parametrize('stencil', [Stencil.D2Q9, Stencil.D3Q19])
+def test_collision_rule_equivalence(stencil):
+    stencil = LBStencil(stencil)
+    omega = sp.Symbol("omega")
+    srt = create_srt(stencil, omega, compressible=True)
+    trt = create_trt(stencil, omega, omega, compressible=True)
+    srt_rule = srt.get_collision_rule()
+
+    assert collision_rules_equivalent(srt_rule, trt.get_collision_rule())
+    assert collision_rules_equivalent(srt_rule, create_simplification_strategy(srt)(srt_rule))
+    assert not collision_rules_equivalent(srt_rule, create_trt(stencil, omega, sp.Symbol("omega_2"),
+                                                               compressible=True).get_collision_rule())
+    assert max_collision_rule_deviation(srt_rule, create_srt(stencil, omega).get_collision_rule()) > 1e-6
+
+
+def test_cumulant_conserved_relaxation_invariance():
+    stencil = LBStencil(Stencil.D2Q9)
+    method = create_with_default_polynomial_cumulants(stencil, [sp.Symbol("omega")], zero_centered=True)
+    rr_dict = method.relaxation_rate_dict
+    for conserved_moment in (sp.Integer(1),) + MOMENT_SYMBOLS[:stencil.D]:
+        rr_dict[conserved_moment] = sp.Symbol("test_omega")
+    changed = CumulantBasedLbMethod(stencil, method.equilibrium_distribution, rr_dict,
+                                    method.conserved_quantity_computation, zero_centered=True)
+    assert collision_rules_equivalent(method.get_collision_rule(), changed.get_collision_rule())
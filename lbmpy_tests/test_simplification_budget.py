@@ -0,0 +1,100 @@
+import signal
+import time
+import warnings
+
+import pytest
+import sympy as sp
+
+from lbmpy import LBMConfig, LBMOptimisation, Method, Stencil, create_lb_collision_rule
+from lbmpy.methods import collision_rules_equivalent
+from lbmpy.simplificationfactory import (
+    SimplificationBudgetWarning, bounded_simplification_step, bounded_simplification_strategy, expression_size)
+from lbmpy.stencils import LBStencil
+from pystencils import Assignment, AssignmentCollection
+from pystencils.simp import SimplificationStrategy, apply_to_all_assignments
+
+
+def test_expansion_beyond_size_limit_is_skipped():
+    a, b, c, d, e, x = sp.symbols("a b c d e x")
+    ac = AssignmentCollection([Assignment(x, (a + b + c) ** 40 * (d + e) ** 30)])
+    strategy = SimplificationStrategy()
+    strategy.add(apply_to_all_assignments(sp.expand))
+
+    with pytest.warns(SimplificationBudgetWarning, match="expand"):
+        result = bounded_simplification_strategy(strategy, size_limit=10000)(ac)
+    assert result.main_assignments == ac.main_assignments
+
+    renamed = apply_to_all_assignments(sp.expand)
+    renamed.__name__ = 'expand_all'
+    with pytest.warns(SimplificationBudgetWarning, match="would expand"):
+        assert bounded_simplification_step(renamed, size_limit=10000)(ac).main_assignments == ac.main_assignments
+
+    small = AssignmentCollection([Assignment(x, (a + b) * (d + e))])
+    expanded = bounded_simplification_strategy(strategy, size_limit=10000)(small)
+    assert expanded.main_assignments[0].rhs == a * d + a * e + b * d + b * e
+    assert expression_size(expanded) > expression_size(small)
+
+
+def test_step_beyond_time_limit_falls_back():
+    x = sp.Symbol("x")
+    ac = AssignmentCollection([Assignment(x, sp.Integer(1))])
+
+    def slow_rule(assignment_collection):
+        time.sleep(5)
+        return assignment_collection.copy([Assignment(x, sp.Integer(2))])
+
+    def cheap_rule(assignment_collection):
+        return assignment_collection.copy([Assignment(x, sp.Integer(3))])
+
+    start = time.perf_counter()
+    with pytest.warns(SimplificationBudgetWarning, match="slow_rule.*skipped"):
+        assert bounded_simplification_step(slow_rule, time_limit=0.1)(ac).main_assignments[0].rhs == 1
+    with pytest.warns(SimplificationBudgetWarning, match="cheaper variant 'cheap_rule'"):
+        step = bounded_simplification_step(slow_rule, time_limit=0.1, fallback=cheap_rule)
+        assert step(ac).main_assignments[0].rhs == 3
+    assert time.perf_counter() - start < 4
+
+
+class _OuterAlarm(Exception):
+    pass
+
+
+@pytest.mark.skipif(not hasattr(signal, 'setitimer'), reason="requires interval timers")
+def test_time_limit_keeps_outer_alarm():
+    x = sp.Symbol("x")
+    ac = AssignmentCollection([Assignment(x, sp.Integer(1))])
+
+    def slow_rule(assignment_collection):
+        time.sleep(2)
+        return assignment_collection
+
+    def outer_handler(signum, frame):
+        raise _OuterAlarm()
+
+    previous_handler = signal.signal(signal.SIGALRM, outer_handler)
+    try:
+        signal.setitimer(signal.ITIMER_REAL, 10)
+        with pytest.warns(SimplificationBudgetWarning, match="time limit"):
+            bounded_simplification_step(slow_rule, time_limit=0.1)(ac)
+        assert signal.getsignal(signal.SIGALRM) is outer_handler
+        assert 9 < signal.getitimer(signal.ITIMER_REAL)[0] <= 10
+
+        #   an outer alarm that is due first interrupts the step
+        signal.setitimer(signal.ITIMER_REAL, 0.1)
+        with pytest.raises(_OuterAlarm):
+            bounded_simplification_step(slow_rule, time_limit=10)(ac)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+
+def test_bounded_collision_rule():
+    lbm_config = LBMConfig(stencil=LBStencil(Stencil.D2Q9), method=Method.SRT, compressible=True)
+    reference = create_lb_collision_rule(lbm_config=lbm_config)
+
+    #   collision rules are cached on disk, hence the skipped steps do not necessarily warn again
+    lbm_optimisation = LBMOptimisation(simplification_size_limit=200, simplification_time_limit=60, cse_global=True)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', SimplificationBudgetWarning)
+        bounded = create_lb_collision_rule(lbm_config=lbm_config, lbm_optimisation=lbm_optimisation)
+    assert collision_rules_equivalent(reference, bounded)
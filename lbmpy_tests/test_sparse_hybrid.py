@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from lbmpy.boundaries import FixedDensity, NoSlip, UBB
+from lbmpy.lbstep import LatticeBoltzmannStep
+from lbmpy.sparse import HybridLatticeBoltzmannStep, select_dense_blocks
+from pystencils import make_slice
+
+
+def packed_bed_channel(domain_size):
+    """Periodic channel with walls in y, open in the left half and filled with obstacles in the right half"""
+    flag_arr = np.zeros(tuple(s + 2 for s in domain_size), dtype=np.uint16)
+    flag_arr[(slice(1, -1),) * len(domain_size)] = 1
+    flag_arr[:, 0] = flag_arr[:, -1] = 2
+    x_half = domain_size[0] // 2
+    flag_arr[x_half + 1:-2:3, 2:-2:3] = 2
+    flag_arr[x_half + 2:-2:3, 3:-2:3] = 2
+    return flag_arr
+
+
+@pytest.mark.parametrize('flag_field_boundaries', [False, True])
+@pytest.mark.parametrize('fluid_fraction_threshold, expected_dense_blocks', [(0.9, 2), (0.0, 4), (1.0, 0)])
+def test_hybrid_step_packed_bed(fluid_fraction_threshold, expected_dense_blocks, flag_field_boundaries):
+    domain_size = (16, 8)
+    flag_arr = packed_bed_channel(domain_size)
+    method_parameters = {'relaxation_rate': 1.7, 'compressible': True, 'force': (1e-4, 0)}
+    dense = LatticeBoltzmannStep(domain_size=domain_size, periodicity=True, **method_parameters)
+    wall = NoSlip()
+    for x, y in np.argwhere(flag_arr[:, 1:-1] == 2):
+        dense.boundary_handling.set_boundary(wall, slice_obj=make_slice[x:x + 1, y + 1:y + 2])
+    dense.boundary_handling.set_boundary(wall, slice_obj=make_slice[:, 0])
+    dense.boundary_handling.set_boundary(wall, slice_obj=make_slice[:, -1])
+
+    hybrid = HybridLatticeBoltzmannStep(flag_arr, fluid_flag=1, boundaries={2: wall}, block_size=(4, 8),
+                                        fluid_fraction_threshold=fluid_fraction_threshold,
+                                        flag_field_boundaries=flag_field_boundaries, **method_parameters)
+    assert np.count_nonzero(hybrid.dense_blocks) == expected_dense_blocks
+    assert (hybrid.sparse_step is None) == (expected_dense_blocks == 4)
+
+    dense.run(31)
+    hybrid.run(30)
+    hybrid.time_step()
+    assert hybrid.time_steps_run == 31
+    fluid = flag_arr[1:-1, 1:-1] == 1
+    assert np.all(np.isnan(hybrid.density[~fluid]))
+    assert np.max(np.abs(hybrid.velocity[fluid])) > 1e-3
+    np.testing.assert_allclose(hybrid.velocity[fluid], dense.velocity[:, :][fluid], atol=1e-14)
+    np.testing.assert_allclose(hybrid.density[fluid], dense.density[:, :][fluid], atol=1e-14)
+
+
+def test_hybrid_step_boundaries_with_link_data():
+    def velocity_profile(boundary_data):
+        y = boundary_data.link_positions(1)
+        boundary_data['vel_0'] = 0.002 * y * (8 - y)
+        boundary_data['vel_1'] = 0
+
+    domain_size = (16, 8)
+    flag_arr = packed_bed_channel(domain_size)
+    flag_arr[0, 1:-1], flag_arr[-1, 1:-1] = 4, 8
+    wall, inflow, outflow = NoSlip(), UBB(velocity_profile, dim=2), FixedDensity(1.0)
+    method_parameters = {'relaxation_rate': 1.7, 'compressible': True}
+    dense = LatticeBoltzmannStep(domain_size=domain_size, periodicity=False, **method_parameters)
+    for x, y in np.argwhere(flag_arr[:, 1:-1] == 2):
+        dense.boundary_handling.set_boundary(wall, slice_obj=make_slice[x:x + 1, y + 1:y + 2])
+    dense.boundary_handling.set_boundary(wall, slice_obj=make_slice[:, 0])
+    dense.boundary_handling.set_boundary(wall, slice_obj=make_slice[:, -1])
+    dense.boundary_handling.set_boundary(inflow, slice_obj=make_slice[0, 1:-1])
+    dense.boundary_handling.set_boundary(outflow, slice_obj=make_slice[-1, 1:-1])
+
+    hybrid = HybridLatticeBoltzmannStep(flag_arr, fluid_flag=1, boundaries={2: wall, 4: inflow, 8: outflow},
+                                        block_size=(4, 8), fluid_fraction_threshold=0.0, **method_parameters)
+    dense.run(20)
+    hybrid.run(20)
+    fluid = flag_arr[1:-1, 1:-1] == 1
+    assert np.max(np.abs(hybrid.velocity[fluid])) > 1e-3
+    np.testing.assert_allclose(hybrid.velocity[fluid], dense.velocity[:, :][fluid], atol=1e-14)
+    np.testing.assert_allclose(hybrid.density[fluid], dense.density[:, :][fluid], atol=1e-14)
+
+
+def test_select_dense_blocks():
+    flag_arr = packed_bed_channel((16, 8))
+    np.testing.assert_equal(select_dense_blocks(flag_arr, 1, (8, 8), 0.9), [[True], [False]])
+    with pytest.raises(ValueError):
+        select_dense_blocks(flag_arr, 1, (5, 8))
+
+
+def test_hybrid_step_ghost_layers_and_time_loop():
+    flag_arr = packed_bed_channel((16, 8))
+    method_parameters = {'relaxation_rate': 1.7, 'compressible': True, 'force': (1e-4, 0)}
+    steps = [HybridLatticeBoltzmannStep(flags, fluid_flag=1, boundaries={2: NoSlip()}, ghost_layers=ghost_layers,
+                                        block_size=(4, 8), fluid_fraction_threshold=0.9, **method_parameters)
+             for flags, ghost_layers in ((flag_arr, 1), (flag_arr, 1), (np.pad(flag_arr, 1, mode='edge'), 2))]
+    assert all(step.domain_size == (16, 8) for step in steps)
+
+    # a single warm-up time step, as in the benchmark, runs before the fixed steps of the same loop. The loop is
+    # created after an odd number of time steps
+    steps[0].time_step()
+    time_loop = steps[0].get_time_loop()
+    time_loop.run(1)
+    time_loop.run(6)
+    for step in steps[1:]:
+        for _ in range(8):
+            step.time_step()
+    fluid = flag_arr[1:-1, 1:-1] == 1
+    assert np.max(np.abs(steps[0].velocity[fluid])) > 1e-4
+    for step in steps[1:]:
+        np.testing.assert_allclose(step.velocity[fluid], steps[0].velocity[fluid], atol=1e-14)
+        np.testing.assert_allclose(step.density[fluid], steps[0].density[fluid], atol=1e-14)
+
+
+def test_hybrid_step_streaming_pattern():
+    with pytest.raises(ValueError, match="'pull'"):
+        HybridLatticeBoltzmannStep(packed_bed_channel((16, 8)), fluid_flag=1, boundaries={2: NoSlip()},
+                                   block_size=(4, 8), relaxation_rate=1.7, streaming_pattern='aa')
@@ -0,0 +1,163 @@
+import numpy as np
+import pytest
+
+from lbmpy.boundaries import FixedDensity, NeumannByCopy, NoSlip, UBB
+from lbmpy.geometry import add_box_boundary
+from lbmpy.lbstep import LatticeBoltzmannStep
+from lbmpy.sparse import SparseLatticeBoltzmannStep
+from pystencils import CreateKernelConfig, Target, make_slice
+
+
+@pytest.mark.parametrize('cell_order', [None, 'hilbert'])
+def test_sparse_step_channel_with_obstacle(cell_order):
+    method_parameters = {'relaxation_rate': 1.7, 'compressible': True}
+    dense = LatticeBoltzmannStep(domain_size=(20, 12), periodicity=False, **method_parameters)
+    bh = dense.boundary_handling
+    boundaries = {}
+    wall = NoSlip()
+    boundaries[add_box_boundary(bh, wall)] = wall
+    inflow, outflow = UBB((0.02, 0)), FixedDensity(1.0)
+    boundaries[bh.set_boundary(inflow, slice_obj=make_slice[0, :])] = inflow
+    boundaries[bh.set_boundary(outflow, slice_obj=make_slice[-1, :])] = outflow
+    obstacle = NoSlip("obstacle")
+    boundaries[bh.set_boundary(obstacle, slice_obj=make_slice[6:9, 4:7])] = obstacle
+    flag_arr = dense.data_handling.cpu_arrays[bh.flag_interface.flag_field_name].copy()
+
+    sparse = SparseLatticeBoltzmannStep(flag_arr, bh.flag_interface.domain_flag, boundaries, cell_order=cell_order,
+                                        **method_parameters)
+    assert sparse.number_of_fluid_cells == np.count_nonzero(flag_arr == bh.flag_interface.domain_flag)
+
+    dense.run(40)
+    sparse.run(40)
+    fluid = ~np.isnan(sparse.density)
+    assert np.max(np.abs(sparse.velocity[fluid])) > 1e-3
+    np.testing.assert_allclose(sparse.velocity[fluid], dense.velocity[:, :][fluid], atol=1e-14)
+    np.testing.assert_allclose(sparse.density[fluid], dense.density[:, :][fluid], atol=1e-14)
+
+
+def test_sparse_step_periodic_channel():
+    force = (1e-5, 0, 0)
+    dense = LatticeBoltzmannStep(domain_size=(8, 6, 4), periodicity=True, stencil='D3Q19', relaxation_rate=1.8,
+                                 force=force)
+    wall = NoSlip()
+    dense.boundary_handling.set_boundary(wall, slice_obj=make_slice[:, 0, :])
+    dense.boundary_handling.set_boundary(wall, slice_obj=make_slice[:, -1, :])
+    flag_arr = np.zeros((10, 8, 6), dtype=np.uint16)
+    flag_arr[1:-1, 1:-1, 1:-1] = 1
+    flag_arr[:, 0, :] = flag_arr[:, -1, :] = 2
+
+    sparse = SparseLatticeBoltzmannStep(flag_arr, fluid_flag=1, boundaries={2: wall}, stencil='D3Q19',
+                                        relaxation_rate=1.8, force=force)
+    dense.run(21)
+    sparse.run(21)
+    assert sparse.time_steps_run == 21
+    fluid = ~np.isnan(sparse.density)
+    np.testing.assert_allclose(sparse.velocity[fluid], dense.velocity[:, :, :][fluid], atol=1e-14)
+
+
+def test_sparse_step_initialization():
+    flag_arr = np.ones((6, 5), dtype=np.uint8)
+    flag_arr[:, 0] = flag_arr[:, -1] = 2
+    flag_arr[0, 1:-1] = flag_arr[-1, 1:-1] = 0
+    step = SparseLatticeBoltzmannStep(flag_arr, fluid_flag=1, boundaries={2: NoSlip()}, relaxation_rate=1.5,
+                                      compressible=True)
+    velocity = np.zeros((4, 3, 2))
+    velocity[..., 0] = 0.01
+    step.set_pdf_fields_from_macroscopic_values(density=1.1, velocity=velocity)
+    np.testing.assert_allclose(step.velocity, velocity, atol=1e-15)
+    np.testing.assert_allclose(step.density, 1.1)
+
+    with pytest.raises(NotImplementedError):
+        SparseLatticeBoltzmannStep(flag_arr, fluid_flag=1, config=CreateKernelConfig(target=Target.GPU))
+
+
+def test_sparse_step_aa_pattern():
+    dense = LatticeBoltzmannStep(domain_size=(20, 12), periodicity=False)
+    bh = dense.boundary_handling
+    boundaries = {}
+    wall = NoSlip()
+    boundaries[add_box_boundary(bh, wall)] = wall
+    inflow, outflow = UBB((0.02, 0)), FixedDensity(1.0)
+    boundaries[bh.set_boundary(inflow, slice_obj=make_slice[0, :])] = inflow
+    boundaries[bh.set_boundary(outflow, slice_obj=make_slice[-1, :])] = outflow
+    obstacle = NoSlip("obstacle")
+    boundaries[bh.set_boundary(obstacle, slice_obj=make_slice[6:9, 4:7])] = obstacle
+    flag_arr = dense.data_handling.cpu_arrays[bh.flag_interface.flag_field_name].copy()
+
+    steps = [SparseLatticeBoltzmannStep(flag_arr, bh.flag_interface.domain_flag, boundaries, relaxation_rate=1.7,
+                                        compressible=True, force=(1e-5, 0), streaming_pattern=streaming_pattern)
+             for streaming_pattern in ('pull', 'aa')]
+    assert steps[1]._pdf_arr_tmp is None
+    for time_steps in (7, 1, 20):
+        for step in steps:
+            step.run(time_steps)
+        fluid = ~np.isnan(steps[0].density)
+        assert np.max(np.abs(steps[0].velocity[fluid])) > 1e-3
+        np.testing.assert_allclose(steps[1].velocity[fluid], steps[0].velocity[fluid], atol=1e-14)
+        np.testing.assert_allclose(steps[1].density[fluid], steps[0].density[fluid], atol=1e-14)
+
+
+@pytest.mark.parametrize('streaming_pattern', ['pull', 'aa'])
+def test_sparse_step_time_loop_after_single_step(streaming_pattern):
+    flag_arr = np.ones((12, 8), dtype=np.uint16)
+    flag_arr[:, 0] = flag_arr[:, -1] = 2
+    flag_arr[0, 1:-1] = flag_arr[-1, 1:-1] = 0
+    steps = [SparseLatticeBoltzmannStep(flag_arr, fluid_flag=1, boundaries={2: NoSlip()}, relaxation_rate=1.8,
+                                        force=(1e-5, 0), streaming_pattern=streaming_pattern) for _ in range(2)]
+
+    # like the benchmark, a single warm-up time step runs before the fixed steps of the same loop. The loop is
+    # created after an odd number of time steps
+    steps[0].time_step()
+    time_loop = steps[0].get_time_loop()
+    time_loop.run(1)
+    time_loop.run(6)
+    for _ in range(8):
+        steps[1].time_step()
+    assert np.max(np.abs(steps[0].velocity)) > 1e-5
+    np.testing.assert_allclose(steps[0].velocity, steps[1].velocity, atol=1e-14)
+
+
+def test_sparse_step_mapping_file(tmp_path):
+    flag_arr = np.ones((14, 8), dtype=np.uint16)
+    flag_arr[:, 0] = flag_arr[:, -1] = 2
+    flag_arr[5:8, 3:5] = 2
+    flag_arr[0, 1:-1], flag_arr[-1, 1:-1] = 4, 0
+    boundaries = {2: NoSlip(), 4: FixedDensity(1.01)}
+    mapping_file = tmp_path / 'mapping.bin'
+
+    steps = [SparseLatticeBoltzmannStep(flag_arr, 1, boundaries, mapping_file=mapping_file, relaxation_rate=1.7)
+             for _ in range(2)]
+    assert not isinstance(steps[0].mapping.coordinates, np.memmap)
+    assert isinstance(steps[1].mapping.coordinates, np.memmap)
+    for step in steps:
+        step.run(10)
+    np.testing.assert_equal(steps[1].velocity, steps[0].velocity)
+
+    flag_arr[9, 4] = 2
+    changed = SparseLatticeBoltzmannStep(flag_arr, 1, boundaries, mapping_file=mapping_file, relaxation_rate=1.7)
+    assert changed.number_of_fluid_cells == steps[0].number_of_fluid_cells - 1
+    assert isinstance(SparseLatticeBoltzmannStep(flag_arr, 1, boundaries, mapping_file=mapping_file,
+                                                 relaxation_rate=1.7).mapping.coordinates, np.memmap)
+
+
+def test_sparse_step_mapping_file_boundary_change(tmp_path):
+    flag_arr = np.ones((14, 8), dtype=np.uint16)
+    flag_arr[:, 0] = flag_arr[:, -1] = 2
+    flag_arr[0, 1:-1], flag_arr[-1, 1:-1] = 4, 8
+    mapping_file = tmp_path / 'mapping.bin'
+    step = SparseLatticeBoltzmannStep(flag_arr, 1, {2: NoSlip(), 4: UBB((0.01, 0)), 8: FixedDensity(1.0)},
+                                      mapping_file=mapping_file, relaxation_rate=1.7)
+    saved = step.mapping.load(mapping_file)
+    assert 'boundary_8_FixedDensity_pull_1' in saved
+
+    #   a saved index array with a layout that does not match the boundary is rebuilt
+    saved['boundary_8_NeumannByCopy_pull_1'] = np.zeros(3, dtype=np.dtype([('dir', np.uint32)]))
+    step.mapping.save(mapping_file, saved)
+    boundaries = {2: NoSlip(), 4: UBB((0.01, 0)), 8: NeumannByCopy()}
+    steps = [SparseLatticeBoltzmannStep(flag_arr, 1, boundaries, mapping_file=file, relaxation_rate=1.7)
+             for file in (mapping_file, None)]
+    assert len(steps[0].mapping.load(mapping_file)['boundary_8_NeumannByCopy_pull_1'].dtype) > 1
+    for step in steps:
+        step.run(20)
+    assert np.max(np.abs(steps[1].velocity[1:-1, 1:-1])) > 1e-3
+    np.testing.assert_equal(steps[0].velocity, steps[1].velocity)
@@ -0,0 +1,160 @@
+import numpy as np
+import pytest
+
+from lbmpy.boundaries import FixedDensity
+from lbmpy.creationfunctions import LBMConfig, create_lb_method
+from lbmpy.enums import Stencil
+from lbmpy.sparse import SparseLbBoundaryMapper, SparseLbMapper
+from lbmpy.stencils import LBStencil
+from pystencils import Field
+from pystencils.field import FieldType
+
+FLUID, NO_SLIP, UBB = 1, 2, 4
+
+
+def porous_channel_flags(domain_size, porosity=0.8, seed=42):
+    """Flag array with one ghost layer, periodic in x and no-slip walls in all other directions"""
+    flag_arr = np.full(tuple(s + 2 for s in domain_size), FLUID, dtype=np.uint16)
+    for d in range(1, len(domain_size)):
+        for border in (0, -1):
+            wall = [slice(None)] * len(domain_size)
+            wall[d] = border
+            flag_arr[tuple(wall)] = NO_SLIP
+    inner = flag_arr[(slice(2, -2),) + tuple(slice(1, -1) for _ in domain_size[1:])]
+    random = np.random.RandomState(seed).rand(*inner.shape)
+    inner[random > porosity] = NO_SLIP
+    inner[random < 0.05] = UBB
+    flag_arr[0][flag_arr[0] == FLUID] = 0
+    flag_arr[-1][flag_arr[-1] == FLUID] = 0
+    return flag_arr
+
+
+def reference_index_array(mapping, ghost_layers=1):
+    stencil = mapping.stencil
+    flag_arr = mapping.flag_array
+    result = np.empty((mapping.num_fluid_cells, len(stencil) - 1), dtype=np.uint32)
+    for cell_idx, cell in enumerate(mapping.fluid_coordinates):
+        for direction_idx, direction in enumerate(stencil[1:], start=1):
+            neighbor = [c_i - d_i for c_i, d_i in zip(cell, direction)]
+            if flag_arr[tuple(neighbor)] & (FLUID | UBB):
+                pdf = mapping.cell_idx(tuple(neighbor)), direction_idx
+            elif flag_arr[tuple(neighbor)] & NO_SLIP:
+                pdf = cell_idx, stencil.index(tuple(-d_i for d_i in direction))
+            else:
+                neighbor = [(n_i - ghost_layers) % (s - 2 * ghost_layers) + ghost_layers
+                            for n_i, s in zip(neighbor, flag_arr.shape)]
+                pdf = mapping.cell_idx(tuple(neighbor)), direction_idx
+            result[cell_idx, direction_idx - 1] = pdf[0] + pdf[1] * len(mapping)
+    return result
+
+
+@pytest.mark.parametrize('cell_order', [None, 'hilbert', 'rcm'])
+@pytest.mark.parametrize('stencil, domain_size', [(Stencil.D2Q9, (20, 12)), (Stencil.D3Q19, (10, 8, 6))])
+def test_sparse_index_array(stencil, domain_size, cell_order):
+    if cell_order == 'rcm':
+        pytest.importorskip('scipy')
+    stencil = LBStencil(stencil)
+    mapping = SparseLbMapper(stencil, porous_channel_flags(domain_size), FLUID, NO_SLIP, UBB, cell_order)
+    index_arr = mapping.create_index_array()
+    assert index_arr.shape == (mapping.num_fluid_cells, stencil.Q - 1)
+    assert index_arr.dtype == np.uint32
+    np.testing.assert_equal(index_arr, reference_index_array(mapping))
+
+
+def test_sparse_index_array_missing_neighbor():
+    stencil = LBStencil(Stencil.D2Q9)
+    flag_arr = porous_channel_flags((8, 6))
+    flag_arr[3, 0] = 0
+    mapping = SparseLbMapper(stencil, flag_arr, FLUID, NO_SLIP, UBB)
+    with pytest.raises(ValueError):
+        mapping.create_index_array()
+
+
+@pytest.mark.parametrize('cell_order', ['morton', 'hilbert', 'rcm'])
+def test_sparse_cell_order_locality(cell_order):
+    if cell_order == 'rcm':
+        pytest.importorskip('scipy')
+    stencil = LBStencil(Stencil.D3Q19)
+    flag_arr = porous_channel_flags((24, 24, 24), porosity=0.6)
+    distances = []
+    for order in (None, cell_order):
+        mapping = SparseLbMapper(stencil, flag_arr, FLUID, NO_SLIP, UBB, order)
+        index_arr = mapping.create_index_array().astype(np.int64)
+        neighbor_cell_idx = index_arr % len(mapping)
+        own_cell_idx = np.arange(mapping.num_fluid_cells)[:, np.newaxis]
+        distances.append(np.mean(np.abs(neighbor_cell_idx - own_cell_idx)))
+        assert np.all(mapping.flag_array[tuple(mapping.fluid_coordinates[name] for name in 'xyz')] & FLUID)
+    assert distances[1] < distances[0]
+
+
+@pytest.mark.parametrize('stencil, domain_size', [(Stencil.D2Q9, (20, 12)), (Stencil.D3Q19, (10, 8, 6))])
+def test_sparse_boundary_index_array(stencil, domain_size):
+    method = create_lb_method(LBMConfig(stencil=LBStencil(stencil), relaxation_rate=1.7, compressible=True))
+    mapping = SparseLbMapper(method.stencil, porous_channel_flags(domain_size), FLUID, NO_SLIP, UBB)
+    pdf_field = Field.create_generic('pdfs', spatial_dimensions=1, index_shape=(method.stencil.Q,),
+                                     field_type=FieldType.CUSTOM)
+    boundary_mapper = SparseLbBoundaryMapper(FixedDensity(1.0), method, pdf_field)
+    index_arr = boundary_mapper.create_index_arr(mapping, UBB)
+    assert len(index_arr) > 0
+
+    neighbor_names = [n for n in index_arr.dtype.names if n.startswith('nidx')]
+    coordinate_names = ('x', 'y', 'z')[:method.dim]
+    for entry in index_arr:
+        cells = [mapping.coordinate(entry[name]) for name in neighbor_names]
+        fluid_cell, boundary_cell = sorted(cells, key=lambda c: mapping.flag_array[tuple(c)] != FLUID)
+        link = tuple(int(boundary_cell[n]) - int(fluid_cell[n]) for n in coordinate_names)
+        assert mapping.flag_array[tuple(fluid_cell)] == FLUID
+        assert mapping.flag_array[tuple(boundary_cell)] == UBB
+        assert link == method.stencil[entry['dir']]
+
+
+@pytest.mark.parametrize('cell_order', [None, 'hilbert'])
+def test_sparse_cell_idx_bulk(cell_order):
+    flag_arr = porous_channel_flags((10, 8, 6))
+    mapping = SparseLbMapper(LBStencil(Stencil.D3Q19), flag_arr, FLUID, NO_SLIP, UBB, cell_order=cell_order)
+    coordinates = mapping.coordinates[::-1]
+    np.testing.assert_equal(mapping.cell_idx_bulk(coordinates), np.arange(len(mapping))[::-1])
+    assert len(mapping.cell_idx_bulk(coordinates[:0])) == 0
+
+    # the lookup only stores data of the mapped cells, not of the whole flag array
+    assert all(getattr(value, 'size', 0) <= len(mapping) for name, value in vars(mapping).items()
+               if name != '_flag_arr')
+
+    unmapped = coordinates[:1].copy()
+    unmapped[0] = tuple(np.argwhere(flag_arr == NO_SLIP)[0])
+    out_of_bounds = coordinates[:1].copy()
+    out_of_bounds['x'] = flag_arr.shape[0]
+    for invalid in (unmapped, out_of_bounds):
+        with pytest.raises(IndexError):
+            mapping.cell_idx_bulk(invalid)
+
+
+def test_sparse_mapping_save_load(tmp_path):
+    method = create_lb_method(LBMConfig(stencil=LBStencil(Stencil.D3Q19), relaxation_rate=1.7))
+    flag_arr = porous_channel_flags((10, 8, 6))
+    mapping = SparseLbMapper(method.stencil, flag_arr, FLUID, NO_SLIP, UBB, cell_order='hilbert')
+    pdf_field = Field.create_generic('pdfs', spatial_dimensions=1, index_shape=(method.stencil.Q,),
+                                     field_type=FieldType.CUSTOM)
+    boundary_mapper = SparseLbBoundaryMapper(FixedDensity(1.0), method, pdf_field)
+    index_arrays = {'pull': mapping.create_index_array(), 'boundary': boundary_mapper.create_index_arr(mapping, UBB)}
+    filename = tmp_path / 'mapping.bin'
+    mapping.save(filename, index_arrays)
+
+    loaded = SparseLbMapper(method.stencil, flag_arr.copy(), FLUID, NO_SLIP, UBB, cell_order='hilbert')
+    loaded_index_arrays = loaded.load(filename)
+    assert isinstance(loaded.coordinates, np.memmap)
+    assert loaded.num_fluid_cells == mapping.num_fluid_cells
+    np.testing.assert_equal(loaded.coordinates, mapping.coordinates)
+    assert loaded.cell_idx(tuple(mapping.coordinate(7))) == 7
+    assert loaded_index_arrays.keys() == index_arrays.keys()
+    for name, arr in index_arrays.items():
+        assert loaded_index_arrays[name].dtype == arr.dtype
+        np.testing.assert_equal(loaded_index_arrays[name], arr)
+    assert loaded_index_arrays['pull'].flags.f_contiguous
+
+    changed_flags = flag_arr.copy()
+    changed_flags[5, 4, 3] = NO_SLIP if changed_flags[5, 4, 3] == FLUID else FLUID
+    for other in (SparseLbMapper(method.stencil, changed_flags, FLUID, NO_SLIP, UBB, cell_order='hilbert'),
+                  SparseLbMapper(method.stencil, flag_arr, FLUID, NO_SLIP, UBB)):
+        with pytest.raises(ValueError):
+            other.load(filename)
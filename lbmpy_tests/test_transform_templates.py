@@ -0,0 +1,56 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from lbmpy.creationfunctions import LBMConfig, create_lb_method
+from lbmpy.enums import Method, Stencil
+from lbmpy.moment_transforms import templates
+from lbmpy.stencils import LBStencil
+
+
+def collision_rule(method):
+    lbm_config = LBMConfig(stencil=LBStencil(Stencil.D2Q9), method=method, compressible=True)
+    return create_lb_method(lbm_config=lbm_config).get_collision_rule(pre_simplification=True)
+
+
+@pytest.fixture(scope='module')
+def template_directory(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('templates'))
+    assert templates.generate_templates(directory, stencils=('D2Q9',)) > 0
+    return directory
+
+
+@pytest.mark.parametrize('method', [Method.CUMULANT, Method.CENTRAL_MOMENT, Method.MRT])
+def test_templates_reproduce_derivation(template_directory, monkeypatch, method):
+    monkeypatch.setitem(templates._config, 'enabled', False)
+    derived = collision_rule(method)
+
+    monkeypatch.setattr(templates, 'TEMPLATE_DIRECTORY', template_directory)
+    monkeypatch.setitem(templates._config, 'enabled', True)
+    templates._loaded_templates.clear()
+    try:
+        from_templates = collision_rule(method)
+        assert any(template is not None for template in templates._loaded_templates.values())
+    finally:
+        templates._loaded_templates.clear()
+
+    assert from_templates.main_assignments == derived.main_assignments
+    assert from_templates.subexpressions == derived.subexpressions
+
+
+def test_shipped_templates(template_directory):
+    def load(directory, file_name):
+        with gzip.open(os.path.join(directory, file_name), 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    file_names = os.listdir(templates.TEMPLATE_DIRECTORY)
+    assert any(name.startswith('CentralMomentsToCumulantsByGeneratingFunc') for name in file_names)
+    assert all(name.endswith('.json.gz') for name in file_names)
+
+    #   the shipped D2Q9 templates equal a fresh derivation
+    derived_file_names = os.listdir(template_directory)
+    assert derived_file_names and set(derived_file_names) <= set(file_names)
+    for file_name in derived_file_names:
+        assert load(templates.TEMPLATE_DIRECTORY, file_name) == load(template_directory, file_name), file_name
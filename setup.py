@@ -89,8 +89,9 @@ setup(name='lbmpy',
       author_email='cs10-codegen@fau.de',
       url='https://i10git.cs.fau.de/pycodegen/lbmpy/',
       packages=['lbmpy'] + ['lbmpy.' + s for s in find_packages('lbmpy')],
-      install_requires=[f'pystencils>=0.4.0,<={major_version}', 'sympy>=1.5.1,<=1.11.1', 'numpy>=1.11.0'],
-      package_data={'lbmpy': ['phasefield/simplex_projection.pyx', 'phasefield/simplex_projection.c']},
+      install_requires=[f'pystencils>=0.4.0,<={major_version}', 'sympy>=1.9,<=1.11.1', 'numpy>=1.11.0'],
+      package_data={'lbmpy': ['phasefield/simplex_projection.pyx', 'phasefield/simplex_projection.c',
+                              'moment_transforms/template_data/*.json.gz']},
       ext_modules=cython_extensions("lbmpy.phasefield.simplex_projection"),
       classifiers=[
           'Development Status :: 4 - Beta',
@@ -109,6 +110,7 @@ setup(name='lbmpy',
       extras_require={
           'gpu': ['cupy'],
           'opencl': ['pyopencl'],
+          'mpi': ['mpi4py'],
           'alltrafos': ['islpy', 'py-cpuinfo'],
           'interactive': ['scipy', 'scikit-image', 'cython', 'matplotlib',
                           'ipy_table', 'imageio', 'jupyter', 'pyevtk'],